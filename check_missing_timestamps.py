@@ -4,7 +4,7 @@
 檢查各股票資料檔是否缺少時間戳記。
 
 以 baseline 股票 (預設 00631L) 的資料檔為完整樣本，對比同頻率的其他檔案，
-列出少掉哪些日期 (或時間)。
+列出少掉哪些日期 (或時間)。資料經由 kbar_store 讀取，支援 CSV/Parquet/Feather 與 Raw 月分區。
 
 用法:
     python3 check_missing_timestamps.py
@@ -15,33 +15,16 @@ from __future__ import annotations
 
 import argparse
 import os
-from typing import Iterable, List, Optional, Set, Tuple
+from typing import List, Optional, Set, Tuple
 
 import pandas as pd
 
+from src.data_initial.kbar_store import list_kbar_stock_ids, read_kbar
 
-def _detect_ts_column(columns: Iterable[str]) -> str:
-    """
-    在欄位中找出代表時間戳的欄位名稱，找不到則回傳第一個欄位。
-    """
-    candidates = ["ts", "timestamp", "datetime", "date", "time"]
-    lowered = [c.lower() for c in columns]
-    for name in candidates:
-        if name in lowered:
-            idx = lowered.index(name)
-            return list(columns)[idx]
-    return list(columns)[0]
-
-
-def _load_timestamps(path: str) -> List[pd.Timestamp]:
-    if not os.path.exists(path):
-        raise FileNotFoundError(path)
-
-    # 只讀取時間欄位即可
-    tmp_df = pd.read_csv(path, nrows=0)
-    ts_col = _detect_ts_column(tmp_df.columns)
-    df = pd.read_csv(path, usecols=[ts_col])
-    ts_series = pd.to_datetime(df[ts_col], errors="coerce").dropna()
+
+def _load_timestamps(stock_id: str, suffix: str, data_dir: str) -> List[pd.Timestamp]:
+    df = read_kbar(stock_id, suffix, data_dir)
+    ts_series = pd.Series(pd.to_datetime(df.index, errors="coerce")).dropna()
     # 如果只有日期，normalize 也不影響有時間戳的比對
     return sorted(ts_series.unique())
 
@@ -62,26 +45,23 @@ def check_all(
     baseline: str,
     limit: int = 10,
 ) -> None:
-    baseline_path = os.path.join(data_dir, f"{baseline}_{suffix}.csv")
-    print(f"載入基準檔: {baseline_path}")
-    baseline_ts = _load_timestamps(baseline_path)
+    print(f"載入基準檔: {os.path.join(data_dir, f'{baseline}_{suffix}')}")
+    baseline_ts = _load_timestamps(baseline, suffix, data_dir)
     print(f"   時間戳總數: {len(baseline_ts)}\n")
 
-    # 找出同 suffix 的其他檔案
+    # 找出同 suffix 的其他股票 (不分格式，含 Raw 月分區)
     candidates = [
-        fname
-        for fname in os.listdir(data_dir)
-        if fname.endswith(f"_{suffix}.csv") and not fname.startswith(baseline)
+        stock_id
+        for stock_id in list_kbar_stock_ids(suffix, data_dir)
+        if not stock_id.startswith(baseline)
     ]
     if not candidates:
         print("未找到其他對比檔案。")
         return
 
-    for fname in sorted(candidates):
-        target_path = os.path.join(data_dir, fname)
-        stock_id = fname.rsplit("_", 1)[0]
+    for stock_id in candidates:
         try:
-            target_ts = _load_timestamps(target_path)
+            target_ts = _load_timestamps(stock_id, suffix, data_dir)
         except Exception as exc:
             print(f"{stock_id}: 讀取失敗 -> {exc}")
             continue
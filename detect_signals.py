@@ -7,6 +7,7 @@
 4. summarize_buy_rules.py - 總結買入規則
 """
 
+import argparse
 import os
 import sys
 import time
@@ -22,11 +23,11 @@ def print_step(step_num, description):
     print(f"時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*60}")
 
-def run_validate_buy_rule():
-    """步驟1: 驗證買入規則"""
+def run_validate_buy_rule(workers=1, summary_rows=None):
+    """步驟1: 驗證買入規則 (summary_rows 提供時同時產生匯總列)"""
     print_step(1, "驗證買入規則")
     try:
-        from src.validate_buy_rule import get_stock_list, validate_buy_rule
+        from src.validate_buy_rule import get_stock_list, run_validate_buy_rules
         
         # 獲取股票列表
         stock_ids = get_stock_list()
@@ -34,17 +35,11 @@ def run_validate_buy_rule():
             print("未找到任何股票代碼，請檢查 config/stklist.cfg 文件。")
             return False
         
-        print(f"找到 {len(stock_ids)} 支股票，開始驗證買入規則...")
+        mode = "逐一" if workers == 1 else f"平行 ({workers or '全部核心'} 程序)"
+        print(f"找到 {len(stock_ids)} 支股票，開始{mode}驗證買入規則...")
         
-        # 逐一驗證每支股票
-        success_count = 0
-        for i, stock_id in enumerate(stock_ids, 1):
-            try:
-                print(f"\n處理進度: {i}/{len(stock_ids)} - {stock_id}")
-                validate_buy_rule(stock_id)
-                success_count += 1
-            except Exception as e:
-                print(f"處理股票 {stock_id} 時發生錯誤: {e}")
+        results = run_validate_buy_rules(stock_ids, max_workers=workers, summary_rows=summary_rows)
+        success_count = sum(1 for error in results.values() if error is None)
         
         print(f"\n✓ 買入規則驗證完成，成功處理 {success_count}/{len(stock_ids)} 支股票")
         return True
@@ -52,20 +47,32 @@ def run_validate_buy_rule():
         print(f"✗ 買入規則驗證失敗: {e}")
         return False
 
-def run_summarize_buy_rules():
-    """步驟2: 總結買入規則"""
+def run_summarize_buy_rules(summary_rows=None):
+    """步驟2: 總結買入規則 (沿用驗證階段產生的匯總列)"""
     print_step(2, "總結買入規則")
     try:
         from src.summarize_buy_rules import main as summarize_main
-        summarize_main()
+        summarize_main(summary_rows=summary_rows)
         print("✓ 買入規則總結完成")
         return True
     except Exception as e:
         print(f"✗ 買入規則總結失敗: {e}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="買進訊號偵測程序：股票規則檢查系統 - 子程序 2")
+    parser.add_argument('--workers', type=int, default=1, help='驗證買入規則的平行程序數 (預設: 1 逐一執行，0 代表使用全部 CPU 核心)')
+    parser.add_argument('--no-cache', action='store_true', help='停用規則結果快取，全部重新計算 (等同 RULE_CACHE=0)')
+    return parser.parse_args()
+
 def main():
     """主函數"""
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else None
+    if args.no_cache:
+        # 子程序會繼承環境變數
+        os.environ['RULE_CACHE'] = '0'
+    
     print("\n" + "="*80)
     print("股票規則檢查系統 - 買進訊號偵測程序 (detect_signals)")
     print(f"開始時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -81,10 +88,11 @@ def main():
     if not os.path.exists('Data/kbar'):
         print("⚠️  警告: 找不到 Data/kbar 目錄。請先執行 prepare_data.py 準備資料。")
     
-    # 執行步驟
+    # 執行步驟：驗證時一併產生匯總列，總結步驟不再重新載入與計算規則
+    summary_rows = {}
     steps = [
-        ("驗證買入規則", run_validate_buy_rule),
-        ("總結買入規則", run_summarize_buy_rules)
+        ("驗證買入規則", lambda: run_validate_buy_rule(workers, summary_rows)),
+        ("總結買入規則", lambda: run_summarize_buy_rules(summary_rows))
     ]
     
     success_steps = 0
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+離線用的 Shioaji 假 API (測試輔助模組，放在測試旁而非 src 內)
+提供 kbar_downloader / kbar_fetcher / kbar_collector / trading_calendar 所需的最小介面
+(login、logout、Contracts.Stocks、Contracts.Indexs、kbars)，不連網即可測試抓取流程。
+
+kbars() 依請求的日期區間產生平日 09:01~13:30 的分 K，價格由股票代碼與時間決定，
+同一區間重複請求會得到相同資料；可指定每次請求的延遲以模擬網路往返，
+並記錄請求歷程與同時進行中的最大請求數。
+
+Example:
+    >>> api = FakeShioaji(latency=0.05)
+    >>> df = get_stock_kbars('2330', start_date, end_date, api=api)
+    >>> api.max_in_flight
+"""
+
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import pandas as pd
+
+BAR_START = '09:01'
+BAR_END = '13:30'
+
+
+class FakeContract(SimpleNamespace):
+    pass
+
+
+class FakeKbars(dict):
+    """與 shioaji Kbars 相同，可用 {**kbars} 展開，也可用屬性 (kbars.ts) 讀取。"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class _ContractLookup(dict):
+    def __missing__(self, code):
+        contract = FakeContract(code=code)
+        self[code] = contract
+        return contract
+
+
+class FakeContractCategory(dict):
+    """合約分類 (如 Indexs.TSE)：以代碼取值，迭代時與 shioaji 相同回傳合約本身。"""
+
+    def __init__(self, *contracts):
+        super().__init__((contract.code, contract) for contract in contracts)
+
+    def __iter__(self):
+        return iter(self.values())
+
+
+class FakeShioaji:
+    """
+    Args:
+        latency: 每次 kbars 請求的延遲秒數
+        holidays: 視為休市的日期 (無任何 K 棒)
+        missing: 請求時丟出例外的股票代碼
+    """
+
+    def __init__(self, latency: float = 0.0, holidays=(), missing=()):
+        self.latency = latency
+        self.holidays = {pd.Timestamp(d).date() for d in holidays}
+        self.missing = set(missing)
+        self.Contracts = SimpleNamespace(
+            Stocks=_ContractLookup(),
+            Indexs=[
+                FakeContractCategory(FakeContract(code='101', name='櫃買指數')),
+                FakeContractCategory(FakeContract(code='001', name='加權指數')),
+            ],
+        )
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def login(self, *args, **kwargs):
+        return []
+
+    def logout(self):
+        return True
+
+    def kbars(self, contract, start: str, end: str):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.calls.append((contract.code, start, end, time.monotonic()))
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if contract.code in self.missing:
+                raise KeyError(contract.code)
+            return self._make_kbars(contract.code, start, end)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _make_kbars(self, code: str, start: str, end: str) -> FakeKbars:
+        days = [d for d in pd.bdate_range(start, end) if d.date() not in self.holidays]
+        index = pd.DatetimeIndex([
+            ts for day in days
+            for ts in pd.date_range(f"{day.date()} {BAR_START}", f"{day.date()} {BAR_END}", freq='min')
+        ])
+        ts = index.values.astype('datetime64[ns]').astype('int64')  # shioaji 以奈秒整數回傳時間戳
+        base = 50 + zlib.crc32(code.encode()) % 500
+        minutes = (ts // 60_000_000_000) % 100_000
+        close = (base + (minutes % 97) * 0.05).round(2)
+        return FakeKbars(
+            ts=ts.tolist(),
+            Open=close.tolist(),
+            High=(close + 0.1).round(2).tolist(),
+            Low=(close - 0.1).round(2).tolist(),
+            Close=close.tolist(),
+            Volume=((minutes % 7) + 1).tolist(),
+            Amount=(close * ((minutes % 7) + 1)).round(2).tolist(),
+        )
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試用隨機 K 線樣本 (測試輔助模組)
+以固定亂數種子產生隨機漫步的日線 OHLCV，供多個測試共用。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def make_random_kbars(n: int, seed: int = 0) -> pd.DataFrame:
+    """產生 n 根以 ts 為索引的日線 OHLCV；價格保持為正並四捨五入至小數點後兩位。"""
+    rng = np.random.default_rng(seed)
+    close = np.round(np.abs(100 + np.cumsum(rng.normal(0, 1.5, n))) + 20, 2)
+    open_ = np.round(close + rng.normal(0, 0.8, n), 2)
+    high = np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 1, n)), 2)
+    low = np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 1, n)), 2)
+    volume = rng.integers(100, 5000, n)
+    return pd.DataFrame(
+        {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+        index=pd.bdate_range('2022-01-03', periods=n, name='ts'),
+    )
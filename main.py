@@ -9,6 +9,7 @@
 4. summarize_buy_rules.py - 總結買入規則
 """
 
+import argparse
 import os
 import sys
 import time
@@ -48,11 +49,11 @@ def run_append_indicator():
         print(f"[x] 技術指標添加失敗: {e}")
         return False
 
-def run_validate_buy_rule():
-    """步驟3: 驗證買入規則"""
+def run_validate_buy_rule(workers=1, summary_rows=None):
+    """步驟3: 驗證買入規則 (summary_rows 提供時同時產生匯總列)"""
     print_step(3, "驗證買入規則")
     try:
-        from src.validate_buy_rule import get_stock_list, validate_buy_rule
+        from src.validate_buy_rule import get_stock_list, run_validate_buy_rules
         
         # 獲取股票列表
         stock_ids = get_stock_list()
@@ -60,17 +61,11 @@ def run_validate_buy_rule():
             print("未找到任何股票代碼，請檢查 config/stklist.cfg 文件。")
             return False
         
-        print(f"找到 {len(stock_ids)} 支股票，開始驗證買入規則...")
+        mode = "逐一" if workers == 1 else f"平行 ({workers or '全部核心'} 程序)"
+        print(f"找到 {len(stock_ids)} 支股票，開始{mode}驗證買入規則...")
         
-        # 逐一驗證每支股票
-        success_count = 0
-        for i, stock_id in enumerate(stock_ids, 1):
-            try:
-                print(f"\n處理進度: {i}/{len(stock_ids)} - {stock_id}")
-                validate_buy_rule(stock_id)
-                success_count += 1
-            except Exception as e:
-                print(f"處理股票 {stock_id} 時發生錯誤: {e}")
+        results = run_validate_buy_rules(stock_ids, max_workers=workers, summary_rows=summary_rows)
+        success_count = sum(1 for error in results.values() if error is None)
         
         print(f"\n[v] 買入規則驗證完成，成功處理 {success_count}/{len(stock_ids)} 支股票")
         return True
@@ -78,20 +73,32 @@ def run_validate_buy_rule():
         print(f"[x] 買入規則驗證失敗: {e}")
         return False
 
-def run_summarize_buy_rules():
-    """步驟4: 總結買入規則"""
+def run_summarize_buy_rules(summary_rows=None):
+    """步驟4: 總結買入規則 (沿用驗證階段產生的匯總列)"""
     print_step(4, "總結買入規則")
     try:
         from src.summarize_buy_rules import main as summarize_main
-        summarize_main()
+        summarize_main(summary_rows=summary_rows)
         print("[v] 買入規則總結完成")
         return True
     except Exception as e:
         print(f"[x] 買入規則總結失敗: {e}")
         return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="股票規則檢查系統 - 完整流程執行")
+    parser.add_argument('--workers', type=int, default=1, help='驗證買入規則的平行程序數 (預設: 1 逐一執行，0 代表使用全部 CPU 核心)')
+    parser.add_argument('--no-cache', action='store_true', help='停用規則結果快取，全部重新計算 (等同 RULE_CACHE=0)')
+    return parser.parse_args()
+
 def main():
     """主函數"""
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else None
+    if args.no_cache:
+        # 子程序會繼承環境變數
+        os.environ['RULE_CACHE'] = '0'
+    
     print("\n" + "="*80)
     print("股票規則檢查系統 - 完整流程執行")
     print(f"開始時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -104,12 +111,13 @@ def main():
     os.makedirs('output/chart', exist_ok=True)
     os.makedirs('output/buy_rules', exist_ok=True)
     
-    # 執行步驟
+    # 執行步驟：驗證時一併產生匯總列，總結步驟不再重新載入與計算規則
+    summary_rows = {}
     steps = [
         ("收集K線數據", run_kbar_collector),
         ("添加技術指標", run_append_indicator),
-        ("驗證買入規則", run_validate_buy_rule),
-        ("總結買入規則", run_summarize_buy_rules)
+        ("驗證買入規則", lambda: run_validate_buy_rule(workers, summary_rows)),
+        ("總結買入規則", lambda: run_summarize_buy_rules(summary_rows))
     ]
     
     success_steps = 0
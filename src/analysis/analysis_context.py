@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+單一股票的分析上下文
+轉折點、波段點、下降趨勢線、Supertrend 與底分型等基礎結構在
+validate_buy_rule / summarize_buy_rules 的一次執行中會被多條規則重複使用，
+AnalysisContext 以惰性計算 + 快取的方式讓每個結構每檔股票只計算一次。
+
+快取的 DataFrame 由所有規則共用，呼叫端需視為唯讀；要修改請先 copy()。
+"""
+
+from typing import Dict, Hashable, Tuple
+
+import pandas as pd
+
+from src.analysis.result_cache import data_fingerprint
+from src.baseRule.bottom_fractal_identification import identify_bottom_fractals
+from src.baseRule.supertrend import calculate_supertrends
+from src.baseRule.turning_point_identification import identify_turning_points
+from src.baseRule.wave_point_identification import check_wave_points
+from src.buyRule.long_term_descending_trendline import identify_descending_trendlines
+
+
+class AnalysisContext:
+    """
+    每檔股票一個的基礎結構快取
+
+    Args:
+        df: 已附加指標的日 K 線資料 (DatetimeIndex)，所有規則需使用同一份 df
+        stock_id: 股票代碼，僅供顯示
+
+    Example:
+        >>> ctx = AnalysisContext(df, '2330')
+        >>> check_diamond_cross(df, context=ctx)
+        >>> check_resistance_line_breakthrough(df, context=ctx)  # 不再重算轉折點
+    """
+
+    def __init__(self, df: pd.DataFrame, stock_id: str = ''):
+        self.df = df
+        self.stock_id = stock_id
+        self._cache: Dict[Tuple[Hashable, ...], object] = {}
+
+    def _get(self, key: Tuple[Hashable, ...], compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def fingerprint(self) -> str:
+        """df 內容雜湊，作為 RuleResultCache 的資料指紋。"""
+        return self._get(('fingerprint',), lambda: data_fingerprint(self.df))
+
+    @property
+    def turning_points(self) -> pd.DataFrame:
+        """轉折點 (date, turning_high_point, turning_low_point)；缺 ma5 時以收盤價 5 日均線補上。"""
+        def compute():
+            df = self.df
+            if 'ma5' not in df.columns:
+                df = df.copy()
+                df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
+            return identify_turning_points(df)
+        return self._get(('turning_points',), compute)
+
+    @property
+    def wave_points(self) -> pd.DataFrame:
+        """以轉折點計算的波段高低點 (date, wave_high_point, wave_low_point, ...)。"""
+        def compute():
+            df_reset = self.df.sort_index().reset_index()
+            date_col = df_reset.columns[0]
+            df_reset[date_col] = pd.to_datetime(df_reset[date_col], errors='coerce')
+
+            turning_points = self.turning_points.copy()
+            turning_points['date'] = pd.to_datetime(turning_points['date'], errors='coerce')
+
+            merged = pd.merge(
+                df_reset,
+                turning_points,
+                left_on=date_col,
+                right_on='date',
+                how='left',
+            )
+            merged['turning_high_point'] = merged['turning_high_point'].fillna('')
+            merged['turning_low_point'] = merged['turning_low_point'].fillna('')
+            merged.set_index(date_col, inplace=True)
+            return check_wave_points(merged)
+        return self._get(('wave_points',), compute)
+
+    def descending_trendlines(self, **kwargs) -> list:
+        """下降趨勢線 (identify_descending_trendlines 的結果)，依參數分別快取。"""
+        return self._get(
+            ('descending_trendlines',) + tuple(sorted(kwargs.items())),
+            lambda: identify_descending_trendlines(self.df.sort_index(), self.wave_points, **kwargs),
+        )
+
+    def supertrend(self, period: int, factor: float) -> pd.DataFrame:
+        """Supertrend (Supertrend, Direction)，依 (period, factor) 分別快取。"""
+        return self.supertrends([(period, factor)])[(int(period), float(factor))]
+
+    def supertrends(self, params) -> dict:
+        """
+        多組 Supertrend，回傳 {(period, factor): DataFrame}。
+
+        尚未快取的參數以 calculate_supertrends 一次批次計算 (相同 period 共用 ATR)。
+        """
+        keys = list(dict.fromkeys((int(period), float(factor)) for period, factor in params))
+        missing = [key for key in keys if ('supertrend',) + key not in self._cache]
+        if missing:
+            for key, result in calculate_supertrends(self.df, missing).items():
+                self._cache[('supertrend',) + key] = result
+        return {key: self._cache[('supertrend',) + key] for key in keys}
+
+    def bottom_fractals(self, left: int = 2, right: int = 2, tol: float = 0.0) -> pd.DataFrame:
+        """以轉折點過濾的底分型，依 (left, right, tol) 分別快取。"""
+        return self._get(
+            ('bottom_fractals', left, right, tol),
+            lambda: identify_bottom_fractals(
+                self.df,
+                left=left,
+                right=right,
+                tol=tol,
+                turning_points_df=self.turning_points,
+            ),
+        )
+
+    def rule_result(self, rule_name: str, compute, params=(), cache=None):
+        """
+        規則輸出，同一規則與參數每檔股票只計算一次。
+
+        validate_buy_rule 與匯總列共用同一個 context 時，匯總直接取用驗證階段的結果；
+        提供 cache (RuleResultCache) 時再經由磁碟快取。
+        """
+        def compute_once():
+            if cache is None:
+                return compute()
+            return cache.get_or_compute(rule_name, self.fingerprint, compute, params)
+        return self._get(('rule', rule_name, repr(params)), compute_once)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+買入規則結果的磁碟快取
+資料未更新的股票重跑 detect_signals / summarize_buy_rules 時，直接讀回上次的規則結果。
+
+快取鍵:
+- 資料指紋  : 傳給規則的 DataFrame (OHLCV 與指標欄位、索引) 內容雜湊
+- 程式指紋  : src/baseRule、src/buyRule、analysis_context、trend_analyzer 與 validate_buy_rule 原始碼雜湊，
+              規則或基礎結構的程式修改後舊結果自動失效
+- 規則名稱與參數
+
+每個結果存成 {cache_dir}/{規則}-{雜湊}.pkl，命中時更新修改時間；
+evict() 依最後使用時間刪除過期項目，總容量超過上限時再從最舊的開始刪除。
+
+設定方式 (.env):
+- RULE_CACHE=0                  停用快取 (預設啟用)
+- RULE_CACHE_DIR=...            快取目錄 (預設 output/cache/rules)
+- RULE_CACHE_MAX_AGE_DAYS=30    超過天數未使用的項目會被刪除
+- RULE_CACHE_MAX_MB=1024        快取總容量上限
+
+清除快取:
+    python -m src.analysis.result_cache --clear
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import pickle
+import time
+from functools import lru_cache
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_VERSION = 1
+CACHE_EXTENSION = '.pkl'
+DEFAULT_CACHE_DIR = 'output/cache/rules'
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_SIZE_MB = 1024
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SOURCE_PATTERNS = (
+    os.path.join('baseRule', '*.py'),
+    os.path.join('buyRule', '*.py'),
+    os.path.join('analysis', 'analysis_context.py'),
+    os.path.join('analysis', 'trend_analyzer.py'),
+    'validate_buy_rule.py',
+)
+
+
+def cache_enabled() -> bool:
+    return os.getenv('RULE_CACHE', '1').strip().lower() not in {'0', 'false', 'no'}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"無效的 {name}: {value}，改用預設值 {default}")
+        return default
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint() -> str:
+    """規則相關原始碼的雜湊 (每個程序只計算一次)。"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"v{CACHE_VERSION}".encode())
+    for pattern in _SOURCE_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(_SRC_DIR, pattern))):
+            hasher.update(os.path.relpath(path, _SRC_DIR).encode())
+            with open(path, 'rb') as f:
+                hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """DataFrame 內容 (欄位名稱、型別、索引與數值) 的雜湊。"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return hasher.hexdigest()
+
+
+class RuleResultCache:
+    """
+    規則結果快取；停用時 get_or_compute 直接呼叫 compute。
+
+    Example:
+        >>> cache = RuleResultCache()
+        >>> rule_df = cache.get_or_compute(
+        ...     'diamond_cross', data_fingerprint(df), lambda: check_diamond_cross(df))
+        >>> cache.evict()
+    """
+
+    def __init__(self, cache_dir: str = None, enabled: bool = None,
+                 max_age_days: float = None, max_size_mb: float = None):
+        self.cache_dir = cache_dir or os.getenv('RULE_CACHE_DIR', '').strip() or DEFAULT_CACHE_DIR
+        self.enabled = cache_enabled() if enabled is None else enabled
+        self.max_age_days = (
+            _env_float('RULE_CACHE_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS)
+            if max_age_days is None else max_age_days
+        )
+        self.max_size_mb = (
+            _env_float('RULE_CACHE_MAX_MB', DEFAULT_MAX_SIZE_MB)
+            if max_size_mb is None else max_size_mb
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, rule_name: str, fingerprint: str, params=()) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        for part in (code_fingerprint(), rule_name, fingerprint, repr(params)):
+            hasher.update(part.encode())
+            hasher.update(b'\0')
+        return f"{rule_name}-{hasher.hexdigest()}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_EXTENSION}")
+
+    def load(self, key: str):
+        """讀取快取項目；不存在或損毀時回傳 None。"""
+        path = self._path(key)
+        if not self.enabled or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                result = pickle.load(f)
+        except Exception as exc:
+            print(f"讀取規則快取 {path} 失敗: {exc}")
+            return None
+        # 更新修改時間作為最後使用時間，供 evict 判斷
+        os.utime(path)
+        return result
+
+    def save(self, key: str, result) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        # 先寫暫存檔再取代；平行程序同時寫入同一鍵時以後者為準
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_or_compute(self, rule_name: str, fingerprint: str, compute, params=()):
+        """命中時回傳快取結果，否則呼叫 compute() 並寫入快取。"""
+        if not self.enabled:
+            return compute()
+        key = self.make_key(rule_name, fingerprint, params)
+        result = self.load(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = compute()
+        self.save(key, result)
+        return result
+
+    def evict(self) -> int:
+        """刪除過期項目並將總容量壓在上限內，回傳刪除數量。"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, f"*{CACHE_EXTENSION}")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        removed = 0
+        expire_before = time.time() - self.max_age_days * 86400
+        total_size = sum(size for _, size, _ in entries)
+        max_size = self.max_size_mb * 1024 * 1024
+        for mtime, size, path in entries:
+            if mtime >= expire_before and total_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> int:
+        removed = 0
+        for path in glob.glob(os.path.join(self.cache_dir, f"*{CACHE_EXTENSION}")):
+            os.remove(path)
+            removed += 1
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='買入規則結果快取維護')
+    parser.add_argument('--cache-dir', default=None, help='快取目錄 (預設取 RULE_CACHE_DIR)')
+    parser.add_argument('--clear', action='store_true', help='刪除所有快取項目')
+    args = parser.parse_args()
+
+    cache = RuleResultCache(cache_dir=args.cache_dir, enabled=True)
+    if args.clear:
+        print(f"已刪除 {cache.clear()} 個快取項目: {cache.cache_dir}")
+    else:
+        print(f"已淘汰 {cache.evict()} 個快取項目: {cache.cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,21 +19,26 @@ class TrendResult:
     last_low: Optional[float]
     details: str
 
-def calculate_trend(df: pd.DataFrame, stock_id: str = "") -> TrendResult:
+def calculate_trend(df: pd.DataFrame, stock_id: str = "", context=None) -> TrendResult:
     """
     Calculates the trend status for the latest date in the dataframe.
+    Turning points are taken from context (AnalysisContext) when provided.
     """
     
     # Validation
     if df is None or df.empty:
          return TrendResult(stock_id, "", TrendType.UNKNOWN, None, None, "No data")
 
-    # Ensure ma5 exists for turning point identification
-    local_df = df.copy()
-    if 'ma5' not in local_df.columns:
-        local_df['ma5'] = local_df['Close'].rolling(window=5, min_periods=1).mean()
-        
-    tp_df = identify_turning_points(local_df)
+    if context is not None:
+        local_df = df
+        tp_df = context.turning_points
+    else:
+        # Ensure ma5 exists for turning point identification
+        local_df = df.copy()
+        if 'ma5' not in local_df.columns:
+            local_df['ma5'] = local_df['Close'].rolling(window=5, min_periods=1).mean()
+
+        tp_df = identify_turning_points(local_df)
     
     # Extract points into a single chronological list
     points = []
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import Optional
 
@@ -54,128 +55,108 @@ def identify_bottom_fractals(
         else:
             raise ValueError("缺少 datetime index 或 date 欄位")
 
-    # 建立轉折點上下文映射（若提供）
-    turning_point_context = {}  # {date: {'type': 'high' or 'low', 'date': tp_date}}
+    n = len(data)
+    dates = data.index.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    opens = data["Open"].to_numpy(dtype=float)
+    highs = data["High"].to_numpy(dtype=float)
+    lows = data["Low"].to_numpy(dtype=float)
+    closes = data["Close"].to_numpy(dtype=float)
+
+    # 每個確立日 i 的匹配結果；-1 表示未找到分型
+    matched_left = np.full(n, -1, dtype=np.int64)
+    matched_low_pos = np.full(n, -1, dtype=np.int64)
+    matched_low = np.zeros(n)
+
+    tol_factor = 1 + tol / 100.0
+    # 可變窗長：視窗總長 3~5，最低點落在左右兩根之間即可，由短到長取第一個成立的窗口
+    max_window = min(left + right + 1, 5)
+    min_window = 3
+    for window_len in range(min_window, max_window + 1):
+        ends = np.flatnonzero(matched_left[window_len - 1:] == -1) + window_len - 1
+        if len(ends) == 0:
+            continue
+        left_idx = ends - window_len + 1
+        # 中間區間（不含左右端）的位置，每列由舊到新
+        inter_idx = left_idx[:, None] + np.arange(1, window_len - 1)
+
+        inter_lows = lows[inter_idx]
+        # 與 Series.min / idxmin 相同：忽略 NaN，取第一個最低點
+        low_p = np.fmin.reduce(inter_lows, axis=1)
+        low_pos = inter_idx[np.arange(len(ends)), np.argmax(inter_lows == low_p[:, None], axis=1)]
+
+        left_high_ref = highs[left_idx]
+        # 中間區間不得突破左K高點（含開盤/最高）；中間最多 3 根，內含 K 數量限制必然成立
+        inter_high_ok = (
+            (np.fmax.reduce(highs[inter_idx], axis=1) <= left_high_ref)
+            & (np.fmax.reduce(opens[inter_idx], axis=1) <= left_high_ref)
+        )
+        is_fractal = (
+            (low_p <= lows[left_idx] * tol_factor)
+            & (low_p <= lows[ends] * tol_factor)
+            & (closes[ends] > left_high_ref)
+            & inter_high_ok
+        )
+
+        found = ends[is_fractal]
+        matched_left[found] = left_idx[is_fractal]
+        matched_low_pos[found] = low_pos[is_fractal]
+        matched_low[found] = low_p[is_fractal]
+
+    should_mark = matched_left != -1
     if turning_points_df is not None:
-        tp = turning_points_df.copy()
-        if "date" in tp.columns:
-            tp["date"] = pd.to_datetime(tp["date"], errors="coerce")
-            tp = tp.set_index("date")
-        elif not isinstance(tp.index, pd.DatetimeIndex):
-            tp.index = pd.to_datetime(tp.index, errors="coerce")
-        
-        # 收集所有轉折點並按時間排序
-        tp_list = []
-        for idx, row in tp.iterrows():
-            if row.get("turning_high_point") == "O":
-                tp_list.append((idx, "high"))
-            elif row.get("turning_low_point") == "O":
-                tp_list.append((idx, "low"))
-        tp_list.sort(key=lambda x: x[0])
-        
-        # 為每個日期建立「最近轉折點類型與日期」映射
-        last_tp_info = None
-        tp_idx = 0
-        for date in data.index:
-            # 更新到當前日期為止的最近轉折點
-            while tp_idx < len(tp_list) and tp_list[tp_idx][0] <= date:
-                last_tp_info = {"type": tp_list[tp_idx][1], "date": tp_list[tp_idx][0]}
-                tp_idx += 1
-            turning_point_context[date] = last_tp_info
-
-    # 預先建立與原始資料等長的結果，之後在確立時回填標記到「中心位置」
-    results = [
-        {
-            "date": idx.strftime("%Y-%m-%d"),
-            "bottom_fractal": "",
-            "fractal_low": 0.0,
-            "fractal_low_date": "",
-            "fractal_left_date": "",
-            "fractal_right_date": "",
-        }
-        for idx in data.index
-    ]
-
-    for i, (idx, row) in enumerate(data.iterrows()):
-        tol_factor = 1 + tol / 100.0
-        found = False
-        matched_low_p = None
-        matched_p = None
-        # 可變窗長：視窗總長 3~5，最低點落在左右兩根之間即可
-        max_window = min(left + right + 1, 5)
-        min_window = 3
-        for window_len in range(min_window, max_window + 1):
-            left_idx = i - window_len + 1
-            if left_idx < 0:
-                continue
-
-            left_high_ref = data.iloc[left_idx]["High"]
-            left_low_ref = data.iloc[left_idx]["Low"]
-            right_low_ref = data.iloc[i]["Low"]
-            confirm_close = data.iloc[i]["Close"]
-
-            inter_slice = data.iloc[left_idx + 1 : i]
-            if inter_slice.empty:
-                continue
-
-            low_p = inter_slice["Low"].min()
-            matched_p = inter_slice["Low"].idxmin()
-
-            # 中間區間（不含左右端）不得突破左K高點（含開盤/最高）
-            inter_high_ok = (
-                inter_slice["High"].max() <= left_high_ref
-                and inter_slice["Open"].max() <= left_high_ref
-            )
-            inside_mask = (inter_slice["High"] <= left_high_ref) & (inter_slice["Low"] >= left_low_ref)
-            inter_inside_ok = inside_mask.sum() <= 3
-
-            is_fractal = (
-                low_p <= left_low_ref * tol_factor
-                and low_p <= right_low_ref * tol_factor
-                and (confirm_close > left_high_ref)
-                and inter_high_ok
-                and inter_inside_ok
-            )
-            if is_fractal:
-                found = True
-                matched_low_p = low_p
-                matched_p = data.index.get_loc(matched_p)
-                break
-
-        if found:
-            # 檢查轉折點上下文（若提供）
-            current_date = data.index[i]
-            should_mark = True
-            fractal_low_date = data.index[matched_p]
-            
-            if turning_points_df is not None:
-                # 只在最近轉折點是高點時才標記底分型
-                recent_tp = turning_point_context.get(current_date)
-                if recent_tp:
-                    # 邏輯修正：
-                    # 1. 如果最近是轉折高點 -> 處於下降趨勢 -> 允許底分型 (需檢查日期不回溯)
-                    # 2. 如果最近是轉折低點 -> 處於上升趨勢 -> 通常不允許
-                    #    但在轉折低點「當天」的底分型是有效的（它就是轉折點本身）
-                    
-                    if recent_tp["type"] == "high":
-                        # 條件: 分型低點日期必須在轉折高點日期之後或當天
-                        if fractal_low_date < recent_tp["date"]:
-                            should_mark = False
-                    elif recent_tp["type"] == "low":
-                        # 條件: 只有當分型低點日期等於轉折低點日期時才允許
-                        # (即該分型就是轉折低點)
-                        if fractal_low_date != recent_tp["date"]:
-                            should_mark = False
-                else:
-                    # 無轉折點上下文，保守過濾忽略
-                    pass
-            
-            if should_mark:
-                # 標記在「成立那一天」（右窗口的末日），但記錄實際分型低點資訊
-                results[i]["bottom_fractal"] = "O"
-                results[i]["fractal_low"] = float(matched_low_p)
-                results[i]["fractal_low_date"] = data.index[matched_p].strftime("%Y-%m-%d")
-                results[i]["fractal_left_date"] = data.index[left_idx].strftime("%Y-%m-%d")
-                results[i]["fractal_right_date"] = data.index[i].strftime("%Y-%m-%d")
-
-    return pd.DataFrame(results)
+        recent_type, recent_date = _recent_turning_points(data.index, turning_points_df)
+        fractal_low_date = data.index.to_numpy(dtype="datetime64[ns]")[np.maximum(matched_low_pos, 0)]
+        # 1. 最近是轉折高點 -> 處於下降趨勢 -> 允許底分型，但分型低點日期不得早於轉折高點
+        # 2. 最近是轉折低點 -> 處於上升趨勢 -> 只允許分型低點就是該轉折低點
+        # 3. 無轉折點上下文 -> 不過濾
+        should_mark &= ~((recent_type == "high") & (fractal_low_date < recent_date))
+        should_mark &= ~((recent_type == "low") & (fractal_low_date != recent_date))
+
+    # 標記在「成立那一天」（右窗口的末日），但記錄實際分型低點資訊
+    empty = np.full(n, "", dtype=object)
+    return pd.DataFrame({
+        "date": dates,
+        "bottom_fractal": np.where(should_mark, "O", ""),
+        "fractal_low": np.where(should_mark, matched_low, 0.0),
+        "fractal_low_date": np.where(should_mark, dates[np.maximum(matched_low_pos, 0)], empty),
+        "fractal_left_date": np.where(should_mark, dates[np.maximum(matched_left, 0)], empty),
+        "fractal_right_date": np.where(should_mark, dates, empty),
+    })
+
+
+def _recent_turning_points(index: pd.DatetimeIndex, turning_points_df: pd.DataFrame):
+    """
+    每個日期「最近轉折點」的類型 ('high' / 'low' / None) 與日期。
+
+    轉折點依日期排序後以 searchsorted 對應；同一天有多筆時取排序後的最後一筆，
+    依資料順序逐日推進 (日期回溯時沿用已推進到的轉折點)。
+    """
+    tp = turning_points_df.copy()
+    if "date" in tp.columns:
+        tp["date"] = pd.to_datetime(tp["date"], errors="coerce")
+        tp = tp.set_index("date")
+    elif not isinstance(tp.index, pd.DatetimeIndex):
+        tp.index = pd.to_datetime(tp.index, errors="coerce")
+
+    # 收集所有轉折點並按時間排序 (同一列同時為高低點時視為高點)
+    is_high = tp["turning_high_point"].eq("O").to_numpy() if "turning_high_point" in tp.columns else np.zeros(len(tp), bool)
+    is_low = tp["turning_low_point"].eq("O").to_numpy() if "turning_low_point" in tp.columns else np.zeros(len(tp), bool)
+    keep = (is_high | is_low) & tp.index.notna()
+    tp_dates = tp.index[keep].to_numpy(dtype="datetime64[ns]")
+    tp_types = np.where(is_high[keep], "high", "low").astype(object)
+    order = np.argsort(tp_dates, kind="stable")
+    tp_dates, tp_types = tp_dates[order], tp_types[order]
+
+    n = len(index)
+    recent_type = np.full(n, None, dtype=object)
+    recent_date = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+    if len(tp_dates) == 0 or n == 0:
+        return recent_type, recent_date
+
+    # NaT 以最小整數表示，累積最大值即「目前為止推進到的日期」
+    reached = np.maximum.accumulate(index.to_numpy(dtype="datetime64[ns]").view(np.int64))
+    pos = np.searchsorted(tp_dates.view(np.int64), reached, side="right") - 1
+    has_tp = pos >= 0
+    recent_type[has_tp] = tp_types[pos[has_tp]]
+    recent_date[has_tp] = tp_dates[pos[has_tp]]
+    return recent_type, recent_date
@@ -23,85 +23,134 @@ def calculate_atr(df: pd.DataFrame, period: int) -> pd.Series:
     
     return rma
 
-def calculate_supertrend(df: pd.DataFrame, period: int, factor: float) -> pd.DataFrame:
+def _supertrend_pass(close, basic_upper, basic_lower, final_upper, final_lower, trend, supertrend):
     """
-    Calculate Supertrend Indicator
-    Returns DataFrame with:
-    - Supertrend: The trend line value
-    - Direction: 1 for Up, -1 for Down
+    Supertrend recurrence for one (period, factor) combination.
+    Fills final_upper / final_lower / trend / supertrend in place. Works on
+    Python lists (fast plain-Python path) or NumPy arrays (Numba path).
     """
-    # Create a copy to avoid SettingWithCopy warnings on input df
-    local_df = df.copy()
-    
-    atr = calculate_atr(local_df, period)
-    
-    hl2 = (local_df['High'] + local_df['Low']) / 2
-    
-    basic_upper = hl2 + (factor * atr)
-    basic_lower = hl2 - (factor * atr)
-    
-    final_upper = pd.Series(index=local_df.index, dtype='float64')
-    final_lower = pd.Series(index=local_df.index, dtype='float64')
-    trend = pd.Series(index=local_df.index, dtype='int64')
-    supertrend = pd.Series(index=local_df.index, dtype='float64')
-    
-    # Initialize first values
-    final_upper.iloc[0] = basic_upper.iloc[0]
-    final_lower.iloc[0] = basic_lower.iloc[0]
-    trend.iloc[0] = 1 # Assume Up initially
-    supertrend.iloc[0] = final_lower.iloc[0]
-    
-    # Iterate (Vectorization is hard for recursive Supertrend logic, looping is safer for exact logic)
-    # Using numpy arrays for speed
-    close_vals = local_df['Close'].values
-    bu_vals = basic_upper.values
-    bl_vals = basic_lower.values
-    
-    fu_vals = np.zeros(len(local_df))
-    fl_vals = np.zeros(len(local_df))
-    trend_vals = np.zeros(len(local_df))
-    st_vals = np.zeros(len(local_df))
-    
+    n = len(close)
+    if n == 0:
+        return
+
     # Init
-    fu_vals[0] = bu_vals[0]
-    fl_vals[0] = bl_vals[0]
-    trend_vals[0] = 1
-    st_vals[0] = fl_vals[0]
-    
-    for i in range(1, len(local_df)):
+    final_upper[0] = basic_upper[0]
+    final_lower[0] = basic_lower[0]
+    trend[0] = 1.0  # Assume Up initially
+    supertrend[0] = final_lower[0]
+
+    for i in range(1, n):
         # Final Upper
-        if (bu_vals[i] < fu_vals[i-1]) or (close_vals[i-1] > fu_vals[i-1]):
-            fu_vals[i] = bu_vals[i]
+        if (basic_upper[i] < final_upper[i-1]) or (close[i-1] > final_upper[i-1]):
+            final_upper[i] = basic_upper[i]
         else:
-            fu_vals[i] = fu_vals[i-1]
-            
+            final_upper[i] = final_upper[i-1]
+
         # Final Lower
-        if (bl_vals[i] > fl_vals[i-1]) or (close_vals[i-1] < fl_vals[i-1]):
-            fl_vals[i] = bl_vals[i]
+        if (basic_lower[i] > final_lower[i-1]) or (close[i-1] < final_lower[i-1]):
+            final_lower[i] = basic_lower[i]
         else:
-            fl_vals[i] = fl_vals[i-1]
-            
+            final_lower[i] = final_lower[i-1]
+
         # Trend
-        prev_trend = trend_vals[i-1]
-        if prev_trend == -1: # Down
-            if close_vals[i] > fu_vals[i-1]:
-                trend_vals[i] = 1 # Turn Up
+        if trend[i-1] == -1:  # Down
+            if close[i] > final_upper[i-1]:
+                trend[i] = 1.0  # Turn Up
             else:
-                trend_vals[i] = -1
-        else: # Up
-            if close_vals[i] < fl_vals[i-1]:
-                trend_vals[i] = -1 # Turn Down
+                trend[i] = -1.0
+        else:  # Up
+            if close[i] < final_lower[i-1]:
+                trend[i] = -1.0  # Turn Down
             else:
-                trend_vals[i] = 1
-        
+                trend[i] = 1.0
+
         # Supertrend Value
-        if trend_vals[i] == 1:
-            st_vals[i] = fl_vals[i]
+        if trend[i] == 1:
+            supertrend[i] = final_lower[i]
         else:
-            st_vals[i] = fu_vals[i]
-            
-    result = pd.DataFrame(index=local_df.index)
-    result['Supertrend'] = st_vals
-    result['Direction'] = trend_vals
-    
-    return result
+            supertrend[i] = final_upper[i]
+
+
+try:
+    from numba import njit
+except ImportError:  # optional acceleration
+    _supertrend_pass_jit = None
+else:
+    _supertrend_pass_jit = njit(cache=True)(_supertrend_pass)
+
+
+def supertrend_matrix(df: pd.DataFrame, params) -> tuple:
+    """
+    Evaluate several (period, factor) combinations in one pass over the data.
+
+    ATR is computed once per distinct period and shared by every factor that
+    uses it. The recurrence runs compiled when numba is installed, otherwise
+    as a plain-Python loop over lists.
+
+    Returns:
+        (supertrend, direction): 2-D float arrays of shape (len(params), len(df)),
+        row k belonging to params[k]; direction is 1 for Up, -1 for Down
+    """
+    params = [(int(period), float(factor)) for period, factor in params]
+    n = len(df)
+    supertrend = np.zeros((len(params), n))
+    direction = np.zeros((len(params), n))
+    if not params:
+        return supertrend, direction
+
+    hl2 = ((df['High'] + df['Low']) / 2).to_numpy(dtype=float)
+    close = df['Close'].to_numpy(dtype=float)
+    atr_by_period = {
+        period: calculate_atr(df, period).to_numpy(dtype=float)
+        for period in dict.fromkeys(period for period, _ in params)
+    }
+
+    close_list = close.tolist()
+    for k, (period, factor) in enumerate(params):
+        atr = atr_by_period[period]
+        basic_upper = hl2 + (factor * atr)
+        basic_lower = hl2 - (factor * atr)
+
+        if _supertrend_pass_jit is not None:
+            final_upper = np.zeros(n)
+            final_lower = np.zeros(n)
+            _supertrend_pass_jit(close, basic_upper, basic_lower, final_upper, final_lower,
+                                 direction[k], supertrend[k])
+            continue
+
+        final_upper = [0.0] * n
+        final_lower = [0.0] * n
+        trend = [0.0] * n
+        values = [0.0] * n
+        _supertrend_pass(close_list, basic_upper.tolist(), basic_lower.tolist(),
+                         final_upper, final_lower, trend, values)
+        direction[k] = trend
+        supertrend[k] = values
+
+    return supertrend, direction
+
+
+def calculate_supertrends(df: pd.DataFrame, params) -> dict:
+    """
+    Batch version of calculate_supertrend.
+    Returns {(period, factor): DataFrame(Supertrend, Direction)} for every combination.
+    """
+    params = list(dict.fromkeys((int(period), float(factor)) for period, factor in params))
+    supertrend, direction = supertrend_matrix(df, params)
+    results = {}
+    for k, key in enumerate(params):
+        result = pd.DataFrame(index=df.index)
+        result['Supertrend'] = supertrend[k]
+        result['Direction'] = direction[k]
+        results[key] = result
+    return results
+
+
+def calculate_supertrend(df: pd.DataFrame, period: int, factor: float) -> pd.DataFrame:
+    """
+    Calculate Supertrend Indicator
+    Returns DataFrame with:
+    - Supertrend: The trend line value
+    - Direction: 1 for Up, -1 for Down
+    """
+    return calculate_supertrends(df, [(period, factor)])[(int(period), float(factor))]
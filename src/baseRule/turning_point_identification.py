@@ -10,10 +10,12 @@
 1. 向上穿越 (Cross Up) 時：在「前一個轉折高點之後」到「本次穿越點」之間，找最低價 (Low) 為轉折低點。
 2. 向下穿越 (Cross Down) 時：在「前一個轉折低點之後」到「本次穿越點」之間，找最高價 (High) 為轉折高點。
 
-版本：v4.0
-更新日期：2026-01-15
+版本：v4.1 (線性掃描)
+更新日期：2026-10-16
 """
 
+from collections import deque
+
 import pandas as pd
 import numpy as np
 from typing import Optional, Tuple, List
@@ -55,6 +57,10 @@ def detect_cross_events(df: pd.DataFrame) -> pd.DataFrame:
 def identify_turning_points(df: pd.DataFrame, window_size: int = 5) -> pd.DataFrame:
     """
     識別股價的轉折高點和轉折低點 (區間極值法)
+
+    單次線性掃描：以單調佇列維護「前一個轉折點之後」到當前 K 棒的
+    最低價 / 最高價 (同值取最早一根)，穿越發生時直接取佇列首位，
+    不再逐日 iloc 與切片搜尋。
     
     Args:
         df: K線數據 (需包含 Close, High, Low, ma5)
@@ -66,100 +72,84 @@ def identify_turning_points(df: pd.DataFrame, window_size: int = 5) -> pd.DataFr
     # 1. 基本檢查與初始化
     if 'ma5' not in df.columns:
         raise ValueError("DataFrame必須包含'ma5'欄位")
-    
-    # 建立結果容器
-    # 用 list of dict 來存，最後再轉 DataFrame，比逐行 append 效能好
-    # 但為了配合原有回傳格式，我們最後會 merge 回去或生成新結構
-    # 這裡策略：先標記在一個 mask 上，最後生成結果
-    
+
     n = len(df)
-    turning_high_mask = [False] * n
-    turning_low_mask = [False] * n
-    
-    # 2. 檢測穿越
-    df_cross = detect_cross_events(df)
-    
+    if n == 0:
+        return pd.DataFrame()
+
+    close = df['Close'].to_numpy(dtype=float)
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
+    ma5 = df['ma5'].to_numpy(dtype=float)
+
+    # 2. 檢測穿越 (與 detect_cross_events 相同：第一根視前一天為 MA5 下方 / 上方皆可穿越)
+    close_above_ma5 = close > ma5
+    prev_above = np.empty(n, dtype=bool)
+    prev_above[1:] = close_above_ma5[:-1]
+    cross_up = close_above_ma5.copy()
+    cross_up[1:] &= ~prev_above[1:]
+    cross_down = ~close_above_ma5
+    cross_down[1:] &= prev_above[1:]
+    # 邊界保護：MA5 無值時不處理 (通常是前4天)
+    has_ma5 = ~np.isnan(ma5)
+    cross_up &= has_ma5
+    cross_down &= has_ma5
+
+    turning_high_mask = np.zeros(n, dtype=bool)
+    turning_low_mask = np.zeros(n, dtype=bool)
+
     # 3. 核心變數初始化
-    # 我們需要記錄「前一個轉折點的索引」，用來定義搜尋區間的起點
-    # 初始值設為 -1 (代表從資料最開頭開始找)
+    # 前一個轉折點的索引定義搜尋區間的起點，-1 代表從資料最開頭開始找
     last_turned_high_idx = -1
     last_turned_low_idx = -1
-    
-    # 為了處理第一筆資料前的狀態，我們需要知道第一筆是在 MA5 上方還是下方
-    # 如果第一筆就在 MA5 上方，那潛在的第一個轉折點應該是「轉折高」
-    # 反之亦然。不過根據區間極值法，我們只需等到「穿越」發生再來回溯即可。
-    
-    # 遍歷每一天
+
+    # 單調佇列：low_queue 的 Low 由前往後遞增、high_queue 的 High 遞減，
+    # 相同價格保留較早的一根，佇列首位即區間內第一個極值
+    low_queue = deque()
+    high_queue = deque()
+    low_values = low.tolist()
+    high_values = high.tolist()
+    is_cross_up = cross_up.tolist()
+    is_cross_down = cross_down.tolist()
+
     for i in range(n):
-        row = df_cross.iloc[i]
-        
-        # 邊界保護：MA5 無值時不處理 (通常是前4天)
-        if pd.isna(row['ma5']):
-            continue
-            
+        low_i = low_values[i]
+        if low_i == low_i:  # 略過 NaN，與 Series.min() 行為一致
+            while low_queue and low_values[low_queue[-1]] > low_i:
+                low_queue.pop()
+            low_queue.append(i)
+        high_i = high_values[i]
+        if high_i == high_i:
+            while high_queue and high_values[high_queue[-1]] < high_i:
+                high_queue.pop()
+            high_queue.append(i)
+
         # === 處理 向上穿越 (找轉折低) ===
-        if row['cross_up']:
-            # 定義搜尋區間 [start, end]
-            # start: 前一個轉折高點的「下一根」 (如果沒轉折高，就從資料頭開始)
-            start_idx = max(0, last_turned_high_idx + 1)
-            end_idx = i  # 包含當前這根 Cross Up K棒
-            
-            # 區間極值搜尋：找 Low 的最小值
-            # slice is [start_idx : end_idx + 1] because python slice is exclusive at end
-            interval_df = df_cross.iloc[start_idx : end_idx + 1]
-            
-            if not interval_df.empty:
-                min_low_val = interval_df['Low'].min()
-                # 找出最小值對應的 relative index
-                # idxmin() 回傳的是原有 index (可能是 DateIndex 或 IntIndex)
-                # 為了穩健，我們用 mask 找
-                # 注意：如果有多個相同最低價，通常取第一個或最後一個皆可，這裡取第一個
-                target_date_idx = interval_df[interval_df['Low'] == min_low_val].index[0]
-                
-                # 轉回整數 index (如果是依賴 iloc)
-                # 這裡稍微麻煩點，因為 df index 可能是 Date。
-                # 簡單作法：透過 interval_df 的 row number 加上 start_idx
-                # 或者直接用 get_loc 如果 index 是 unique 的
-                target_integer_idx = df_cross.index.get_loc(target_date_idx)
-                
-                # 標記轉折低點
-                turning_low_mask[target_integer_idx] = True
-                
-                # 更新狀態
-                last_turned_low_idx = target_integer_idx
-        
+        # 區間 [前一個轉折高點的下一根, 當前 K 棒] 內的最低價
+        if is_cross_up[i]:
+            while low_queue and low_queue[0] <= last_turned_high_idx:
+                low_queue.popleft()
+            if low_queue:
+                target_idx = low_queue[0]
+                turning_low_mask[target_idx] = True
+                last_turned_low_idx = target_idx
+
         # === 處理 向下穿越 (找轉折高) ===
-        elif row['cross_down']:
-            # 定義搜尋區間 [start, end]
-            # start: 前一個轉折低點的「下一根」
-            start_idx = max(0, last_turned_low_idx + 1)
-            end_idx = i
-            
-            # 區間極值搜尋：找 High 的最大值
-            interval_df = df_cross.iloc[start_idx : end_idx + 1]
-            
-            if not interval_df.empty:
-                max_high_val = interval_df['High'].max()
-                target_date_idx = interval_df[interval_df['High'] == max_high_val].index[0]
-                target_integer_idx = df_cross.index.get_loc(target_date_idx)
-                
-                # 標記轉折高點
-                turning_high_mask[target_integer_idx] = True
-                
-                # 更新狀態
-                last_turned_high_idx = target_integer_idx
+        # 區間 [前一個轉折低點的下一根, 當前 K 棒] 內的最高價
+        elif is_cross_down[i]:
+            while high_queue and high_queue[0] <= last_turned_low_idx:
+                high_queue.popleft()
+            if high_queue:
+                target_idx = high_queue[0]
+                turning_high_mask[target_idx] = True
+                last_turned_high_idx = target_idx
 
     # 4. 格式化輸出結果
-    results = []
-    for i in range(n):
-        date_str = df.index[i].strftime('%Y-%m-%d')
-        results.append({
-            'date': date_str,
-            'turning_high_point': 'O' if turning_high_mask[i] else '',
-            'turning_low_point': 'O' if turning_low_mask[i] else ''
-        })
-        
-    return pd.DataFrame(results)
+    return pd.DataFrame({
+        'date': pd.DatetimeIndex(df.index).strftime('%Y-%m-%d'),
+        'turning_high_point': np.where(turning_high_mask, 'O', ''),
+        'turning_low_point': np.where(turning_low_mask, 'O', ''),
+    })
 
 def check_turning_points(df: pd.DataFrame, window_size: int = 5) -> pd.DataFrame:
     """向後兼容的別名"""
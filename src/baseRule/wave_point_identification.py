@@ -7,7 +7,7 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 import pandas as pd
 
@@ -23,7 +23,11 @@ __all__: List[str] = [
 ]
 
 
-def check_wave_points(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
+def check_wave_points(
+    df: pd.DataFrame,
+    debug: bool = False,
+    identifier: Optional[WavingPointIdentifier] = None,
+) -> pd.DataFrame:
     """
     基於轉折點資訊產出波段高低點結果。
 
@@ -31,6 +35,9 @@ def check_wave_points(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
         df: 包含 K 線資料與 `turning_high_point`、`turning_low_point` 欄位的 DataFrame。
             索引需為日期（DatetimeIndex 或可轉為日期的索引）。
         debug: 是否啟用詳細偵錯輸出。
+        identifier: 由快照還原的 WavingPointIdentifier；提供時只處理其 last_date 之後的轉折點，
+            並沿用其狀態與未定案的標記。df 需帶有上次結果的波段標記欄位，
+            識別器 label_floor 之前的日期沿用這些標記。未提供時從頭計算整段歷史。
 
     Returns:
         DataFrame: 具備波段標記與趨勢狀態的表格。
@@ -61,7 +68,10 @@ def check_wave_points(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
         data.index = pd.to_datetime(data.index, errors="coerce")
     data = data.sort_index()
 
-    turning_points = data[turning_columns].fillna("").reset_index()
+    label_columns = []
+    if identifier is not None:
+        label_columns = [col for col in WavingPointIdentifier.LABEL_COLUMNS if col in data.columns]
+    turning_points = data[turning_columns + label_columns].fillna("").reset_index()
     index_name = data.index.name or "index"
     turning_points.rename(columns={index_name: "date"}, inplace=True)
     duplicate_date_cols = [
@@ -77,7 +87,10 @@ def check_wave_points(df: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
     turning_points = turning_points[turning_points["date"].notna()]
     turning_points["date"] = turning_points["date"].dt.strftime("%Y-%m-%d")
 
-    wave_points = identify_waving_points(data, turning_points, debug=debug)
+    if identifier is None:
+        wave_points = identify_waving_points(data, turning_points, debug=debug)
+    else:
+        wave_points = identifier.update(data, turning_points)
 
     expected_columns = [
         "date",
@@ -3,8 +3,13 @@
 """
 趨勢波偵測程式 (Waving Point Identification)
 根據轉折點識別趨勢波,並標記波段高點和波段低點
+
+標記以日期字串為鍵累積，最後一次套用到結果；波段點搜尋使用依日期排序的轉折點歷史 (bisect)，
+整個流程與 K 棒數加轉折點數成線性。轉折點歷史與未定案的標記只保留仍可能用到的部分。
 """
 
+from bisect import bisect_left, bisect_right
+
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
@@ -80,8 +85,34 @@ class PendingReversal:
 
 
 class WavingPointIdentifier:
-    """趨勢波識別器"""
-    
+    """
+    趨勢波識別器
+
+    狀態機 (TrendState、PendingReversal) 與波段點搜尋所需的轉折點歷史都保存在識別器中，
+    可逐一餵入轉折點 (feed) 或只處理新資料 (update)，並以 to_dict / from_dict 保存與還原，
+    日線或盤中更新時不必從頭重算整段歷史。
+
+    Example:
+        >>> identifier = WavingPointIdentifier()
+        >>> result = identifier.update(df, turning_points_df)      # 第一次處理全部歷史
+        >>> snapshot = identifier.to_dict()                        # 保存至已收盤的資料
+        >>> identifier = WavingPointIdentifier.from_dict(snapshot)
+        >>> result = identifier.update(new_df, new_turning_points)  # 只處理新的轉折點
+
+    盤中最後一根 K 棒尚未收盤時，其穿越事件產生的轉折點可能改變，
+    每次盤中更新都應從收盤時的快照還原後再 update。
+
+    識別器只保留仍可能被改寫的標記 (label_floor 之後的日期)；更早的標記已定案，
+    只在該次 update 的回傳結果中出現，不留在記憶體與快照內。
+    因此從快照還原後，update 的輸入需帶有上次回傳的標記欄位，label_floor 之前的列沿用輸入的標記。
+
+    目前 analysis_context 與買入規則仍以 identify_waving_points 全量計算，
+    尚無呼叫端保存或還原快照。
+    """
+
+    STATE_VERSION = 2
+    LABEL_COLUMNS = ('wave_high_point', 'wave_low_point', 'trend_type', 'pending_reversal')
+
     def __init__(self, debug: bool = False):
         """
         初始化識別器
@@ -93,6 +124,16 @@ class WavingPointIdentifier:
         self.state = TrendState()
         self.pending = PendingReversal()
         self.log_messages = []
+        # 已處理的最後一個轉折點日期，update 只處理之後的轉折點
+        self.last_date: Optional[pd.Timestamp] = None
+        # 波段點搜尋用的轉折點歷史 {'high'/'low': ([日期字串], [價格])}，依日期排序
+        self._history: Dict[str, Tuple[List[str], List[float]]] = {'high': ([], []), 'low': ([], [])}
+        # 尚未定案的標記 {日期字串: {欄位: 值}}，波段點可能回頭標記 label_floor 之後的日期
+        self.labels: Dict[str, Dict[str, str]] = {}
+        # 早於此日期 (字串) 的標記不會再變動，已移出 labels
+        self.label_floor: Optional[str] = None
+        # 本次 update 期間定案的標記，只用於組成回傳結果
+        self._settled: Dict[str, Dict[str, str]] = {}
         
     def log(self, message: str, level: str = "INFO"):
         """記錄日誌"""
@@ -115,95 +156,284 @@ class WavingPointIdentifier:
         self.log("="*80)
         self.log("開始識別趨勢波和波段點")
         self.log("="*80)
+
+        result = self.update(df, turning_points_df)
+
+        self.log("\n" + "="*80)
+        self.log("趨勢波識別完成")
+        self.log("="*80)
         
-        # 初始化結果DataFrame
-        result = turning_points_df.copy()
-        result['wave_high_point'] = ''
-        result['wave_low_point'] = ''
-        result['trend_type'] = ''
-        result['pending_reversal'] = ''
-        
+        return result
+
+    def update(self, df: pd.DataFrame, turning_points_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        處理 turning_points_df 中晚於 last_date 的轉折點，回傳整份 turning_points_df 的標記結果
+
+        Args:
+            df: 原始K線數據，提供轉折點價格 (High / Low)
+            turning_points_df: 轉折點數據 (date, turning_high_point, turning_low_point)，
+                可只包含新資料，也可為完整歷史；label_floor 之前的列沿用其既有的標記欄位
+
+        Returns:
+            turning_points_df 加上 wave_high_point、wave_low_point、trend_type、pending_reversal 欄位
+        """
+        floor = self.label_floor
         # 提取所有轉折點
         turning_points = self._extract_turning_points(df, turning_points_df)
-        
-        if not turning_points:
+        if self.last_date is not None:
+            turning_points = [tp for tp in turning_points if tp.date > self.last_date]
+
+        if not turning_points and self.last_date is None:
             self.log("警告：沒有找到任何轉折點", "WARNING")
-            return result
-        
-        self.log(f"總共找到 {len(turning_points)} 個轉折點")
-        
+        else:
+            self.log(f"總共找到 {len(turning_points)} 個轉折點")
+
         # 逐個處理轉折點
         for i, tp in enumerate(turning_points):
             self.log(f"\n{'='*60}")
             self.log(f"處理轉折點 {i+1}/{len(turning_points)}: {tp}")
-            self.log(f"當前趨勢: {self.state.current_trend.value}")
-            
-            # ✅ 先檢查待確認的反轉
-            if self.pending.active:
-                self._check_pending_reversal(tp, df, result)
-            
-            # ✅ 再檢查趨勢反轉條件（使用舊的歷史記錄）
-            self._check_trend_reversal(tp, df, result)
-            
-            # ✅ 最後更新轉折點歷史
-            if tp.point_type == 'high':
-                self.state.recent_high_points.append(tp)
-                if len(self.state.recent_high_points) > 3:
-                    self.state.recent_high_points.pop(0)
+            self.feed(tp)
+
+        result = self._label_frame(turning_points_df, floor)
+        self._settled = {}
+        return result
+
+    def feed(self, tp: TurningPoint):
+        """
+        處理一個新的轉折點
+
+        轉折點需依日期順序餵入；同一日期可同時有高點與低點 (先高後低)。
+        """
+        if self.last_date is not None and tp.date < self.last_date:
+            raise ValueError(f"轉折點需依日期順序處理：{tp} 早於 {self.last_date}")
+
+        self.log(f"當前趨勢: {self.state.current_trend.value}")
+
+        # ✅ 先檢查待確認的反轉
+        if self.pending.active:
+            self._check_pending_reversal(tp)
+
+        # ✅ 再檢查趨勢反轉條件（使用舊的歷史記錄）
+        self._check_trend_reversal(tp)
+
+        # ✅ 最後更新轉折點歷史
+        date_str = tp.date.strftime('%Y-%m-%d')
+        if tp.point_type == 'high':
+            self.state.recent_high_points.append(tp)
+            if len(self.state.recent_high_points) > 3:
+                self.state.recent_high_points.pop(0)
+        else:
+            self.state.recent_low_points.append(tp)
+            if len(self.state.recent_low_points) > 3:
+                self.state.recent_low_points.pop(0)
+        dates, prices = self._history[tp.point_type]
+        dates.append(date_str)
+        prices.append(tp.price)
+        self.last_date = tp.date
+
+        # 更新當前行的趨勢類型
+        self._set_label('trend_type', date_str, self.state.current_trend.value or '')
+        if self.pending.active:
+            self._set_label('pending_reversal', date_str, self.pending.reversal_type.value)
+
+        self._prune_history()
+
+    def _set_label(self, column: str, date_str: str, value):
+        """標記日期為 date_str 的列"""
+        if date_str is None:
+            return
+        self.labels.setdefault(date_str, {})[column] = value
+
+    def _label_frame(self, turning_points_df: pd.DataFrame, floor: Optional[str] = None) -> pd.DataFrame:
+        """
+        將標記套用到 turning_points_df (同一日期的所有列)
+
+        floor 為本次 update 開始時的 label_floor；早於 floor 的列沿用輸入既有的標記欄位。
+        """
+        result = turning_points_df.copy()
+        dates = result['date']
+        if not (dates.dtype == object or pd.api.types.is_string_dtype(dates)):
+            dates = pd.to_datetime(dates, errors='coerce').dt.strftime('%Y-%m-%d')
+        keys = dates.astype(str).to_numpy(dtype=str)
+
+        columns = {}
+        for column in self.LABEL_COLUMNS:
+            if floor is not None and column in result.columns:
+                values = result[column].fillna('').to_numpy(dtype=object, copy=True)
+                values[keys >= floor] = ''
             else:
-                self.state.recent_low_points.append(tp)
-                if len(self.state.recent_low_points) > 3:
-                    self.state.recent_low_points.pop(0)
-            
-            # 更新當前行的趨勢類型
-            date_str = tp.date.strftime('%Y-%m-%d')
-            result.loc[result['date'] == date_str, 'trend_type'] = self.state.current_trend.value or ''
-            if self.pending.active:
-                result.loc[result['date'] == date_str, 'pending_reversal'] = self.pending.reversal_type.value
-        
-        self.log("\n" + "="*80)
-        self.log("趨勢波識別完成")
-        self.log("="*80)
-        
+                values = np.full(len(result), '', dtype=object)
+            columns[column] = values
+        for pos, key in enumerate(keys.tolist()):
+            for labels in (self._settled.get(key), self.labels.get(key)):
+                for column, value in (labels or {}).items():
+                    columns[column][pos] = value
+        for column, values in columns.items():
+            result[column] = values
         return result
-    
+
+    def _prune_history(self):
+        """
+        刪除之後不會再被搜尋到的轉折點，並將不會再變動的標記移出 labels
+
+        波段點搜尋區間的起點只會是最近的轉折點、上一個波段點或等待中的搜尋起點，
+        早於這些日期的轉折點不必保留，標記也不會再被改寫。
+        """
+        candidates = [
+            point.date
+            for point in (
+                self.state.recent_high_points[:1] + self.state.recent_low_points[:1]
+                + [self.state.last_wave_high, self.state.last_wave_low]
+            )
+            if point is not None and point.date is not None and not pd.isna(point.date)
+        ]
+        if self.pending.search_range_start is not None:
+            candidates.append(self.pending.search_range_start)
+        if not candidates:
+            return
+        boundary = min(candidates).strftime('%Y-%m-%d')
+        for dates, prices in self._history.values():
+            cut = bisect_left(dates, boundary)
+            if cut:
+                del dates[:cut]
+                del prices[:cut]
+
+        if self.label_floor is None or boundary > self.label_floor:
+            self.label_floor = boundary
+            for date_str in [key for key in self.labels if key < boundary]:
+                self._settled[date_str] = self.labels.pop(date_str)
+
+    def _turning_points_between(self, point_type: str, start_str: str, end_str: str):
+        """搜尋區間 [start_str, end_str] 內的轉折高 / 低點 (日期字串, 價格)，依日期排序"""
+        dates, prices = self._history[point_type]
+        lo = bisect_left(dates, start_str)
+        hi = bisect_right(dates, end_str)
+        return zip(dates[lo:hi], prices[lo:hi])
+
     def _extract_turning_points(self, df: pd.DataFrame, turning_points_df: pd.DataFrame) -> List[TurningPoint]:
         """從DataFrame中提取轉折點列表"""
         turning_points = []
-        
-        for _, row in turning_points_df.iterrows():
-            date = pd.to_datetime(row['date'])
-            
-            # 找到對應的K線數據
-            if date not in df.index:
+        is_high = (turning_points_df['turning_high_point'] == 'O').to_numpy()
+        is_low = (turning_points_df['turning_low_point'] == 'O').to_numpy()
+        candidates = np.flatnonzero(is_high | is_low)
+        if len(candidates) == 0:
+            return turning_points
+
+        dates = pd.to_datetime(turning_points_df['date'].iloc[candidates])
+        # 找到對應的K線數據
+        bar_positions = df.index.get_indexer(dates)
+        highs = df['High'].to_numpy()
+        lows = df['Low'].to_numpy()
+
+        for pos, date, bar_pos in zip(candidates, dates, bar_positions):
+            if bar_pos < 0:
                 continue
-            
-            k_data = df.loc[date]
-            
+
             # 檢查是否為轉折高點
-            if row['turning_high_point'] == 'O':
-                tp = TurningPoint(
+            if is_high[pos]:
+                turning_points.append(TurningPoint(
                     date=date,
-                    price=float(k_data['High']),
+                    price=float(highs[bar_pos]),
                     point_type='high'
-                )
-                turning_points.append(tp)
-            
+                ))
+
             # 檢查是否為轉折低點
-            if row['turning_low_point'] == 'O':
-                tp = TurningPoint(
+            if is_low[pos]:
+                turning_points.append(TurningPoint(
                     date=date,
-                    price=float(k_data['Low']),
+                    price=float(lows[bar_pos]),
                     point_type='low'
-                )
-                turning_points.append(tp)
-        
+                ))
+
         # 按日期排序
         turning_points.sort(key=lambda x: x.date)
-        
+
         return turning_points
-    
-    def _check_trend_reversal(self, current_tp: TurningPoint, df: pd.DataFrame, result: pd.DataFrame):
+
+    def to_dict(self) -> dict:
+        """識別器狀態快照 (可直接 json.dump)"""
+        def point(p):
+            if p is None:
+                return None
+            return [p.date.isoformat() if p.date is not None else None, p.price, p.point_type]
+
+        return {
+            'version': self.STATE_VERSION,
+            'last_date': self.last_date.isoformat() if self.last_date is not None else None,
+            'state': {
+                'current_trend': self.state.current_trend.value,
+                'trend_start_date': (
+                    self.state.trend_start_date.isoformat()
+                    if self.state.trend_start_date is not None else None
+                ),
+                'last_wave_high': point(self.state.last_wave_high),
+                'last_wave_low': point(self.state.last_wave_low),
+                'recent_high_points': [point(p) for p in self.state.recent_high_points],
+                'recent_low_points': [point(p) for p in self.state.recent_low_points],
+            },
+            'pending': {
+                'active': self.pending.active,
+                'reversal_type': self.pending.reversal_type.value,
+                'trigger_point': point(self.pending.trigger_point),
+                'reference_high': point(self.pending.reference_high),
+                'reference_low': point(self.pending.reference_low),
+                'search_range_start': (
+                    self.pending.search_range_start.isoformat()
+                    if self.pending.search_range_start is not None else None
+                ),
+            },
+            'history': {
+                point_type: [list(dates), list(prices)]
+                for point_type, (dates, prices) in self._history.items()
+            },
+            'label_floor': self.label_floor,
+            'labels': {date: dict(values) for date, values in self.labels.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, debug: bool = False) -> 'WavingPointIdentifier':
+        """由 to_dict 的快照還原識別器"""
+        if data.get('version') != cls.STATE_VERSION:
+            raise ValueError(f"不支援的狀態版本: {data.get('version')}")
+
+        def timestamp(value):
+            return pd.Timestamp(value) if value is not None else None
+
+        def point(value, point_cls):
+            if value is None:
+                return None
+            date, price, point_type = value
+            return point_cls(date=timestamp(date), price=price, point_type=point_type)
+
+        identifier = cls(debug=debug)
+        identifier.last_date = timestamp(data['last_date'])
+        state = data['state']
+        identifier.state = TrendState(
+            current_trend=TrendType(state['current_trend']),
+            trend_start_date=timestamp(state['trend_start_date']),
+            last_wave_high=point(state['last_wave_high'], WavePoint),
+            last_wave_low=point(state['last_wave_low'], WavePoint),
+            recent_high_points=[point(p, TurningPoint) for p in state['recent_high_points']],
+            recent_low_points=[point(p, TurningPoint) for p in state['recent_low_points']],
+        )
+        pending = data['pending']
+        identifier.pending = PendingReversal(
+            active=pending['active'],
+            reversal_type=PendingReversalType(pending['reversal_type']),
+            trigger_point=point(pending['trigger_point'], TurningPoint),
+            reference_high=point(pending['reference_high'], TurningPoint),
+            reference_low=point(pending['reference_low'], TurningPoint),
+            search_range_start=timestamp(pending['search_range_start']),
+        )
+        identifier._history = {
+            point_type: (list(dates), list(prices))
+            for point_type, (dates, prices) in data['history'].items()
+        }
+        identifier.label_floor = data['label_floor']
+        identifier.labels = {date: dict(values) for date, values in data['labels'].items()}
+        return identifier
+
+    def _check_trend_reversal(self, current_tp: TurningPoint):
         """
         檢查趨勢反轉條件
         
@@ -214,17 +444,17 @@ class WavingPointIdentifier:
         
         # 情況1：下降趨勢中出現新高點，檢查是否突破前高
         if self.state.current_trend == TrendType.DOWN and current_tp.point_type == 'high':
-            self._check_down_to_up_reversal(current_tp, df, result)
+            self._check_down_to_up_reversal(current_tp)
         
         # 情況2：上升趨勢中出現新低點，檢查是否跌破前低
         elif self.state.current_trend == TrendType.UP and current_tp.point_type == 'low':
-            self._check_up_to_down_reversal(current_tp, df, result)
+            self._check_up_to_down_reversal(current_tp)
         
         # 情況3：無趨勢或盤整時，建立初始趨勢
         elif self.state.current_trend in [TrendType.NONE, TrendType.CONSOLIDATION]:
-            self._establish_initial_trend(current_tp, df, result)
+            self._establish_initial_trend(current_tp)
     
-    def _check_down_to_up_reversal(self, current_tp: TurningPoint, df: pd.DataFrame, result: pd.DataFrame):
+    def _check_down_to_up_reversal(self, current_tp: TurningPoint):
         """
         檢查下降趨勢 → 上升趨勢的反轉
         
@@ -270,7 +500,7 @@ class WavingPointIdentifier:
                     start_date = self.state.last_wave_high.date
                 else:
                     start_date = L1.date
-                self._mark_wave_low_point(start_date, L2.date, df, result)
+                self._mark_wave_low_point(start_date, L2)
             
             # 情境B：底底低（L2 < L1）
             else:
@@ -293,7 +523,7 @@ class WavingPointIdentifier:
                 
                 self.log(f"搜尋區間起點：{self.pending.search_range_start.strftime('%Y-%m-%d')}")
     
-    def _check_up_to_down_reversal(self, current_tp: TurningPoint, df: pd.DataFrame, result: pd.DataFrame):
+    def _check_up_to_down_reversal(self, current_tp: TurningPoint):
         """
         檢查上升趨勢 → 下降趨勢的反轉
         
@@ -339,7 +569,7 @@ class WavingPointIdentifier:
                     start_date = self.state.last_wave_low.date
                 else:
                     start_date = H1.date
-                self._mark_wave_high_point(start_date, H2.date, df, result)
+                self._mark_wave_high_point(start_date, H2)
             
             # 情境B：頭頭高（H2 > H1）
             else:
@@ -362,7 +592,7 @@ class WavingPointIdentifier:
                 
                 self.log(f"搜尋區間起點：{self.pending.search_range_start.strftime('%Y-%m-%d')}")
     
-    def _check_pending_reversal(self, current_tp: TurningPoint, df: pd.DataFrame, result: pd.DataFrame):
+    def _check_pending_reversal(self, current_tp: TurningPoint):
         """檢查等待確認的反轉狀態"""
         
         if not self.pending.active:
@@ -387,7 +617,7 @@ class WavingPointIdentifier:
                     self.state.trend_start_date = L3.date
                     
                     # 標記波段低點
-                    self._mark_wave_low_point(self.pending.search_range_start, L2.date, df, result)
+                    self._mark_wave_low_point(self.pending.search_range_start, L2)
                     
                     # 清除等待狀態
                     self.pending = PendingReversal()
@@ -418,7 +648,7 @@ class WavingPointIdentifier:
                     self.state.trend_start_date = H3.date
                     
                     # 標記波段高點
-                    self._mark_wave_high_point(self.pending.search_range_start, H2.date, df, result)
+                    self._mark_wave_high_point(self.pending.search_range_start, H2)
                     
                     # 清除等待狀態
                     self.pending = PendingReversal()
@@ -432,115 +662,95 @@ class WavingPointIdentifier:
                     self.pending = PendingReversal()
                     self.state.current_trend = TrendType.UP
     
-    def _mark_wave_low_point(self, start_date: pd.Timestamp, end_date: pd.Timestamp, 
-                             df: pd.DataFrame, result: pd.DataFrame):
+    def _mark_wave_low_point(self, start_date: pd.Timestamp, end_point: TurningPoint):
         """
         標記波段低點
         
         在搜尋區間內找出所有轉折低點，選擇價格最低者標記為波段低點
         """
+        end_date = end_point.date
         self.log(f"標記波段低點：搜尋區間 {start_date.strftime('%Y-%m-%d')} 到 {end_date.strftime('%Y-%m-%d')}")
         
-        # 提取搜尋區間
-        mask = (result['date'] >= start_date.strftime('%Y-%m-%d')) & \
-               (result['date'] <= end_date.strftime('%Y-%m-%d'))
-        period_df = result[mask]
-        
-        # 找出所有轉折低點
-        turning_lows = period_df[period_df['turning_low_point'] == 'O']
-        
+        # 提取搜尋區間內所有轉折低點
+        turning_lows = list(self._turning_points_between(
+            'low', start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        ))
+
         if len(turning_lows) == 0:
             self.log("⚠️ 區間內無轉折低點，使用區間終點", "WARNING")
             # 使用終點日期
             wave_date = end_date.strftime('%Y-%m-%d')
-            if wave_date in df.index.strftime('%Y-%m-%d'):
-                wave_price = df[df.index.strftime('%Y-%m-%d') == wave_date]['Low'].iloc[0]
-            else:
-                return
+            wave_price = end_point.price
         else:
             # 找出價格最低的轉折低點
             min_low_idx = None
             min_low_price = float('inf')
             
-            for _, row in turning_lows.iterrows():
-                date_str = row['date']
-                date_ts = pd.to_datetime(date_str)
-                if date_ts in df.index:
-                    low_price = df.loc[date_ts, 'Low']
-                    if low_price < min_low_price:
-                        min_low_price = low_price
-                        min_low_idx = date_str
+            for date_str, low_price in turning_lows:
+                if low_price < min_low_price:
+                    min_low_price = low_price
+                    min_low_idx = date_str
             
             wave_date = min_low_idx
             wave_price = min_low_price
         
         # 標記波段低點
-        result.loc[result['date'] == wave_date, 'wave_low_point'] = 'O'
+        self._set_label('wave_low_point', wave_date, 'O')
         
         # 更新狀態
         self.state.last_wave_low = WavePoint(
-            date=pd.to_datetime(wave_date),
+            date=pd.Timestamp(wave_date) if wave_date is not None else None,
             price=wave_price,
             point_type='wave_low'
         )
         
         self.log(f"✅ 波段低點已標記：{wave_date} (價格: {wave_price:.2f})")
     
-    def _mark_wave_high_point(self, start_date: pd.Timestamp, end_date: pd.Timestamp,
-                              df: pd.DataFrame, result: pd.DataFrame):
+    def _mark_wave_high_point(self, start_date: pd.Timestamp, end_point: TurningPoint):
         """
         標記波段高點
         
         在搜尋區間內找出所有轉折高點，選擇價格最高者標記為波段高點
         """
+        end_date = end_point.date
         self.log(f"標記波段高點：搜尋區間 {start_date.strftime('%Y-%m-%d')} 到 {end_date.strftime('%Y-%m-%d')}")
         
-        # 提取搜尋區間
-        mask = (result['date'] >= start_date.strftime('%Y-%m-%d')) & \
-               (result['date'] <= end_date.strftime('%Y-%m-%d'))
-        period_df = result[mask]
-        
-        # 找出所有轉折高點
-        turning_highs = period_df[period_df['turning_high_point'] == 'O']
-        
+        # 提取搜尋區間內所有轉折高點
+        turning_highs = list(self._turning_points_between(
+            'high', start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        ))
+
         if len(turning_highs) == 0:
             self.log("⚠️ 區間內無轉折高點，使用區間終點", "WARNING")
             # 使用終點日期
             wave_date = end_date.strftime('%Y-%m-%d')
-            if wave_date in df.index.strftime('%Y-%m-%d'):
-                wave_price = df[df.index.strftime('%Y-%m-%d') == wave_date]['High'].iloc[0]
-            else:
-                return
+            wave_price = end_point.price
         else:
             # 找出價格最高的轉折高點
             max_high_idx = None
             max_high_price = float('-inf')
             
-            for _, row in turning_highs.iterrows():
-                date_str = row['date']
-                date_ts = pd.to_datetime(date_str)
-                if date_ts in df.index:
-                    high_price = df.loc[date_ts, 'High']
-                    if high_price > max_high_price:
-                        max_high_price = high_price
-                        max_high_idx = date_str
+            for date_str, high_price in turning_highs:
+                if high_price > max_high_price:
+                    max_high_price = high_price
+                    max_high_idx = date_str
             
             wave_date = max_high_idx
             wave_price = max_high_price
         
         # 標記波段高點
-        result.loc[result['date'] == wave_date, 'wave_high_point'] = 'O'
+        self._set_label('wave_high_point', wave_date, 'O')
         
         # 更新狀態
         self.state.last_wave_high = WavePoint(
-            date=pd.to_datetime(wave_date),
+            date=pd.Timestamp(wave_date) if wave_date is not None else None,
             price=wave_price,
             point_type='wave_high'
         )
         
         self.log(f"✅ 波段高點已標記：{wave_date} (價格: {wave_price:.2f})")
     
-    def _establish_initial_trend(self, current_tp: TurningPoint, df: pd.DataFrame, result: pd.DataFrame):
+    def _establish_initial_trend(self, current_tp: TurningPoint):
         """建立初始趨勢或從盤整狀態判斷新趨勢"""
         if self.state.current_trend in [TrendType.NONE, TrendType.CONSOLIDATION]:
             self.log("判斷趨勢狀態")
@@ -562,7 +772,7 @@ class WavingPointIdentifier:
                         self.log(f"盤整→上升：頭頭高({prev_high.price:.2f}→{latest_high.price:.2f}) 且 底底高({prev_low.price:.2f}→{latest_low.price:.2f})")
                         # 標記前一個低點為波段低點
                         date_str = prev_low.date.strftime('%Y-%m-%d')
-                        result.loc[result['date'] == date_str, 'wave_low_point'] = 'O'
+                        self._set_label('wave_low_point', date_str, 'O')
                         self.state.last_wave_low = WavePoint(
                             date=prev_low.date,
                             price=prev_low.price,
@@ -582,7 +792,7 @@ class WavingPointIdentifier:
                         self.log(f"盤整→下降：頭頭低({prev_high.price:.2f}→{latest_high.price:.2f}) 且 底底低({prev_low.price:.2f}→{latest_low.price:.2f})")
                         # 標記前一個高點為波段高點
                         date_str = prev_high.date.strftime('%Y-%m-%d')
-                        result.loc[result['date'] == date_str, 'wave_high_point'] = 'O'
+                        self._set_label('wave_high_point', date_str, 'O')
                         self.state.last_wave_high = WavePoint(
                             date=prev_high.date,
                             price=prev_high.price,
@@ -12,6 +12,7 @@ def check_bottom_fractal_higher_low(
     left: int = 2,
     right: int = 2,
     tol: float = 0.0,
+    context=None,
 ) -> pd.DataFrame:
     """
     底分型「底底高」試單買入檢查
@@ -34,6 +35,8 @@ def check_bottom_fractal_higher_low(
         left: 分型左窗口長度（僅在 bottom_fractal_df 為 None 時使用）。
         right: 分型右窗口長度（僅在 bottom_fractal_df 為 None 時使用）。
         tol: 容忍百分比（小數），容許平低的誤差。
+        context: 可選，同一份 df 的 AnalysisContext；未提供 turning_points_df 時
+            改用其快取的轉折點與底分型。
 
     Returns:
         DataFrame 與 df 等長，包含：
@@ -77,6 +80,11 @@ def check_bottom_fractal_higher_low(
         else:
             raise ValueError("缺少 datetime index 或 date 欄位")
 
+    if context is not None and turning_points_df is None:
+        turning_points_df = context.turning_points
+        if bottom_fractal_df is None:
+            bottom_fractal_df = context.bottom_fractals(left=left, right=right, tol=tol)
+
     # 驗證或生成轉折點數據
     if turning_points_df is None:
         if "ma5" not in df_work.columns:
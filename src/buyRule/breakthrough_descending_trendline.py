@@ -17,6 +17,7 @@
 from __future__ import annotations
 
 from typing import Dict, Optional
+import numpy as np
 import pandas as pd
 
 from src.baseRule.turning_point_identification import check_turning_points
@@ -49,59 +50,57 @@ def check_breakthrough_descending_trendline(
     if "Close" not in df.columns:
         raise ValueError("DataFrame must contain 'Close' column")
 
-    volume_ma = None
-    if "Volume" in df.columns:
-        volume_ma = df["Volume"].rolling(window=20, min_periods=5).mean()
-
     all_lines = trendlines.get("all_lines", [])
 
     if len(all_lines) == 0:
         return _create_empty_results(df)
 
-    results = []
-    used_breakthrough_lines = set()
+    n_bars = len(df)
+    close_prices = df["Close"].to_numpy(dtype=float)
 
-    for i in range(len(df)):
-        date = df.index[i]
-        close_price = df.iloc[i]["Close"]
+    volume_ratios = np.zeros(n_bars)
+    if "Volume" in df.columns:
+        volume_ma = df["Volume"].rolling(window=20, min_periods=5).mean().to_numpy()
+        has_average = ~np.isnan(volume_ma) & (np.nan_to_num(volume_ma) > 0)
+        volume_ratios[has_average] = (
+            df["Volume"].to_numpy(dtype=float)[has_average] / volume_ma[has_average]
+        )
 
-        breakthrough_check = ""
-        breakthrough_type = ""
-        breakthrough_pct = 0.0
-        volume_ratio = 0.0
-        trendline_price = 0.0
-        signal_strength = 0
+    # 所有趨勢線在每根 K 線的價格 (lines × bars)，一次找出每條線的收盤向上穿越
+    intercepts = np.array([line["intercept"] for line in all_lines], dtype=float)
+    slopes = np.array([line["slope"] for line in all_lines], dtype=float)
+    line_prices = intercepts[:, None] + slopes[:, None] * np.arange(n_bars)
+
+    previous_close = close_prices[:-1]
+    previous_line = line_prices[:, :-1]
+    crosses = np.zeros((len(all_lines), n_bars), dtype=bool)
+    crosses[:, 1:] = (
+        ~np.isnan(previous_close)
+        & ~np.isnan(previous_line)
+        & (previous_close <= previous_line)
+        & ~(close_prices[1:] <= line_prices[:, 1:])
+    )
 
-        if volume_ma is not None:
-            current_volume = df.iloc[i].get("Volume", 0.0)
-            avg_volume = volume_ma.iloc[i]
-            if not pd.isna(avg_volume) and avg_volume > 0:
-                volume_ratio = current_volume / avg_volume
+    breakthrough_check = np.full(n_bars, "", dtype=object)
+    breakthrough_type = np.full(n_bars, "", dtype=object)
+    breakthrough_pct = np.zeros(n_bars)
+    trendline_price = np.zeros(n_bars)
+    signal_strength = np.zeros(n_bars, dtype=np.int64)
+    used_breakthrough_lines = set()
+    line_keys = [_build_line_key(line) for line in all_lines]
 
+    # 只有出現穿越的 K 線需要挑選最佳突破；每條線只發出一次信號
+    for i in np.flatnonzero(crosses.any(axis=0)).tolist():
+        close_price = close_prices[i]
+        volume_ratio = volume_ratios[i]
         valid_breakthroughs = []
 
-        for line in all_lines:
-            line_key = _build_line_key(line)
-            if line_key in used_breakthrough_lines:
+        for line_pos in np.flatnonzero(crosses[:, i]).tolist():
+            line = all_lines[line_pos]
+            if line_keys[line_pos] in used_breakthrough_lines:
                 continue
 
             current_line_price = line["intercept"] + line["slope"] * i
-
-            if i == 0:
-                continue
-
-            previous_line_price = line["intercept"] + line["slope"] * (i - 1)
-            previous_close_price = df.iloc[i - 1]["Close"]
-
-            if pd.isna(previous_close_price) or pd.isna(previous_line_price):
-                continue
-
-            if previous_close_price > previous_line_price:
-                continue
-
-            if close_price <= current_line_price:
-                continue
-
             pct = ((close_price - current_line_price) / current_line_price) * 100.0
 
             valid_breakthroughs.append({
@@ -115,49 +114,53 @@ def check_breakthrough_descending_trendline(
             best_breakthrough = _select_best_breakthrough(valid_breakthroughs)
 
             if best_breakthrough:
-                breakthrough_check = "O"
                 line = best_breakthrough["line"]
-                breakthrough_type = line["type"]
-                breakthrough_pct = best_breakthrough["breakthrough_pct"]
-                volume_ratio = best_breakthrough["volume_ratio"]
-                trendline_price = best_breakthrough["line_price"]
-                signal_strength = _calculate_signal_strength(
+                breakthrough_check[i] = "O"
+                breakthrough_type[i] = line["type"]
+                breakthrough_pct[i] = round(best_breakthrough["breakthrough_pct"], 2)
+                trendline_price[i] = round(best_breakthrough["line_price"], 2)
+                signal_strength[i] = _calculate_signal_strength(
                     line,
-                    breakthrough_pct,
-                    volume_ratio,
+                    best_breakthrough["breakthrough_pct"],
+                    best_breakthrough["volume_ratio"],
                 )
                 used_breakthrough_lines.add(_build_line_key(line))
 
-        results.append({
-            "date": date.strftime("%Y-%m-%d") if isinstance(date, pd.Timestamp) else str(date),
-            "breakthrough_check": breakthrough_check,
-            "breakthrough_type": breakthrough_type,
-            "breakthrough_pct": round(breakthrough_pct, 2),
-            "volume_ratio": round(volume_ratio, 2),
-            "trendline_price": round(trendline_price, 2),
-            "close_price": round(close_price, 2),
-            "signal_strength": signal_strength,
-        })
+    return pd.DataFrame({
+        "date": _format_dates(df.index),
+        "breakthrough_check": breakthrough_check,
+        "breakthrough_type": breakthrough_type,
+        "breakthrough_pct": breakthrough_pct,
+        "volume_ratio": np.round(volume_ratios, 2),
+        "trendline_price": trendline_price,
+        "close_price": np.round(close_prices, 2),
+        "signal_strength": signal_strength,
+    })
 
-    return pd.DataFrame(results)
+
+def _format_dates(index: pd.Index) -> list:
+    """索引轉為 'YYYY-MM-DD' 字串；非日期索引以 str() 表示"""
+    if isinstance(index, pd.DatetimeIndex) and not index.hasnans:
+        return index.strftime('%Y-%m-%d').tolist()
+    return [
+        date.strftime('%Y-%m-%d') if isinstance(date, pd.Timestamp) else str(date)
+        for date in index
+    ]
 
 
 def _create_empty_results(df: pd.DataFrame) -> pd.DataFrame:
     """創建空的結果DataFrame"""
-    results = []
-    for i in range(len(df)):
-        date = df.index[i]
-        results.append({
-            'date': date.strftime('%Y-%m-%d') if isinstance(date, pd.Timestamp) else str(date),
-            'breakthrough_check': '',
-            'breakthrough_type': '',
-            'breakthrough_pct': 0.0,
-            'volume_ratio': 0.0,
-            'trendline_price': 0.0,
-            'close_price': round(df.iloc[i]['Close'], 2),
-            'signal_strength': 0
-        })
-    return pd.DataFrame(results)
+    n_bars = len(df)
+    return pd.DataFrame({
+        'date': _format_dates(df.index),
+        'breakthrough_check': np.full(n_bars, '', dtype=object),
+        'breakthrough_type': np.full(n_bars, '', dtype=object),
+        'breakthrough_pct': np.zeros(n_bars),
+        'volume_ratio': np.zeros(n_bars),
+        'trendline_price': np.zeros(n_bars),
+        'close_price': np.round(df['Close'].to_numpy(dtype=float), 2),
+        'signal_strength': np.zeros(n_bars, dtype=np.int64),
+    })
 
 
 def _select_best_breakthrough(valid_breakthroughs: list) -> dict:
@@ -266,6 +269,7 @@ def check_descending_trendline(
     debug: bool = False,
     trendline_kwargs: Optional[Dict] = None,
     breakthrough_kwargs: Optional[Dict] = None,
+    context=None,
 ) -> pd.DataFrame:
     """
     一站式入口：先識別波段高點，再生成下降趨勢線並檢查突破。
@@ -277,6 +281,8 @@ def check_descending_trendline(
         debug: 是否輸出波段偵測除錯訊息。
         trendline_kwargs: 傳給 `identify_descending_trendlines` 的參數。
         breakthrough_kwargs: 傳給 `check_breakthrough_descending_trendline` 的參數。
+        context: 同一份 df 的 AnalysisContext（可選），未提供轉折點時共用其
+            轉折點、波段點與趨勢線快取。
 
     Returns:
         DataFrame: 包含突破檢查結果的表格。
@@ -285,19 +291,26 @@ def check_descending_trendline(
         return pd.DataFrame()
 
     df_sorted = df.sort_index()
+    trendline_kwargs = trendline_kwargs or {}
 
-    if turning_points_df is None or turning_points_df.empty:
-        turning_points_df = check_turning_points(df_sorted)
+    use_context = context is not None and (turning_points_df is None or turning_points_df.empty)
+    if use_context and (wave_points_df is None or wave_points_df.empty):
+        trendlines = context.descending_trendlines(**trendline_kwargs)
+    else:
+        if use_context:
+            turning_points_df = context.turning_points
 
-    if wave_points_df is None or wave_points_df.empty:
-        wave_points_df = _prepare_wave_points(df_sorted, turning_points_df, debug=debug)
+        if turning_points_df is None or turning_points_df.empty:
+            turning_points_df = check_turning_points(df_sorted)
 
-    trendline_kwargs = trendline_kwargs or {}
-    trendlines = identify_descending_trendlines(
-        df_sorted,
-        wave_points_df,
-        **trendline_kwargs,
-    )
+        if wave_points_df is None or wave_points_df.empty:
+            wave_points_df = _prepare_wave_points(df_sorted, turning_points_df, debug=debug)
+
+        trendlines = identify_descending_trendlines(
+            df_sorted,
+            wave_points_df,
+            **trendline_kwargs,
+        )
 
     breakthrough_kwargs = breakthrough_kwargs or {}
     result_df = check_breakthrough_descending_trendline(
@@ -2,7 +2,7 @@ import pandas as pd
 
 # 四海游龍規則檢查函數
 
-def check_four_seas_dragon(df: pd.DataFrame, ma_periods: list, stock_id: str) -> pd.DataFrame:
+def check_four_seas_dragon(df: pd.DataFrame, ma_periods: list, stock_id: str, context=None) -> pd.DataFrame:
     """
     四海游龍規則：與三陽開泰相同邏輯，只要滿足三陽開泰突破條件，且當天收盤價站上最後一個均線（例如60MA），則標記信號 'O'
     """
@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 from ..baseRule.turning_point_identification import identify_turning_points
 
-def check_resistance_line_breakthrough(df: pd.DataFrame, turning_points_df: pd.DataFrame = None) -> pd.DataFrame:
+def check_resistance_line_breakthrough(df: pd.DataFrame, turning_points_df: pd.DataFrame = None, context=None) -> pd.DataFrame:
     """
     壓力線突破規則檢查函數
     
@@ -19,14 +19,16 @@ def check_resistance_line_breakthrough(df: pd.DataFrame, turning_points_df: pd.D
     
     Args:
         df (pd.DataFrame): 包含K線數據的DataFrame，需要包含 'Close', 'High', 'Low' 和 'ma5' 列。
-        turning_points_df (pd.DataFrame, optional): 轉折點識別結果，如果未提供則自動計算
+        turning_points_df (pd.DataFrame, optional): 轉折點識別結果，如果未提供則取 context 快取或自動計算
+        context (AnalysisContext, optional): 同一檔股票共用的分析上下文
     
     Returns:
         pd.DataFrame: 包含 'date' 和 'resistance_line_breakthrough_check' 列的DataFrame，
                       'resistance_line_breakthrough_check' 為 'O' 表示滿足條件，'' 表示不滿足。
     """
-    results = []
-    
+    if turning_points_df is None and context is not None:
+        turning_points_df = context.turning_points
+
     # 如果未提供轉折點數據，則計算它
     if turning_points_df is None:
         # 確保有ma5欄位用於轉折點計算
@@ -34,84 +36,69 @@ def check_resistance_line_breakthrough(df: pd.DataFrame, turning_points_df: pd.D
             df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
         turning_points_df = identify_turning_points(df)
     
-    # 將轉折點數據與原始數據合併
-    df_reset = df.reset_index()
-    date_col = df_reset.columns[0]  # 獲取重置索引後的第一列名稱（通常是日期列）
-    df_with_turning_points = pd.merge(
-        df_reset, 
-        turning_points_df, 
-        left_on=df_reset[date_col].dt.strftime('%Y-%m-%d'), 
-        right_on='date', 
-        how='left'
-    )
-    df_with_turning_points.set_index(date_col, inplace=True)
-    
-    # 獲取所有轉折高點的索引位置和對應的最高價
-    turning_high_points = []
-    for i, (idx, row) in enumerate(df_with_turning_points.iterrows()):
-        if row.get('turning_high_point') == 'O':
-            turning_high_points.append({
-                'index': i,
-                'date': idx,
-                'high_price': df.loc[idx, 'High']
-            })
-    
-    # 對每個日期進行檢查
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        
-        # 初始化為不滿足條件
-        is_breakthrough = False
-        
-        # 找出當前日期之前的轉折高點
-        previous_high_points = [
-            hp for hp in turning_high_points 
-            if hp['index'] < i  # 只考慮當前日期之前的轉折高點
-        ]
-        
-        current_close = row['Close']
-        
+    high_positions, high_prices, counts = _previous_high_points(df, turning_points_df)
+    closes = df['Close'].to_numpy()
+    n = len(df)
+    is_breakthrough = np.zeros(n, dtype=bool)
+
+    if n > 1:
+        # 以 i = 1..n-1 的當日/前一日收盤價比較
+        bars = np.arange(1, n)
+        current_close = closes[1:]
+        prev_close = closes[:-1]
+        count = counts[1:]
+
         # 橫向壓力線：使用最近一個轉折高點的高點價格作為壓力
-        if previous_high_points and i > 0:
-            last_high_point = previous_high_points[-1]
-            horizontal_resistance_price = last_high_point['high_price']
-            
-            prev_close = df.iloc[i - 1]['Close']
-            if (prev_close <= horizontal_resistance_price) and (current_close > horizontal_resistance_price):
-                is_breakthrough = True
-        
-        # 斜率壓力線：需要至少兩個之前的轉折高點
-        if len(previous_high_points) >= 2:
-            recent_high_points = previous_high_points[-2:]
-            
-            # 獲取兩個高點的數據
-            point1 = recent_high_points[0]
-            point2 = recent_high_points[1]
-            
-            x1, y1 = point1['index'], point1['high_price']
-            x2, y2 = point2['index'], point2['high_price']
-            
-            # 避免除以零的情況
-            if x2 != x1:
-                # 計算壓力線在當前及前一日的價格
-                current_resistance_price = y1 + (y2 - y1) * (i - x1) / (x2 - x1)
-                
-                if i > 0:
-                    prev_row = df.iloc[i-1]
-                    prev_close = prev_row['Close']
-                    prev_resistance_price = y1 + (y2 - y1) * ((i-1) - x1) / (x2 - x1)
-                    
-                    # 突破條件：前一日收盤價在壓力線下方，當日收盤價在壓力線上方
-                    if (prev_close <= prev_resistance_price) and (current_close > current_resistance_price):
-                        is_breakthrough = True
-        
-        # 添加結果
-        if is_breakthrough:
-            results.append({'date': date, 'resistance_line_breakthrough_check': 'O'})
-        else:
-            results.append({'date': date, 'resistance_line_breakthrough_check': ''})
-    
-    return pd.DataFrame(results)
+        has_one = count >= 1
+        last = np.maximum(count - 1, 0)
+        horizontal_resistance_price = high_prices[last] if len(high_prices) else np.zeros(n - 1)
+        is_breakthrough[1:] |= (
+            has_one
+            & (prev_close <= horizontal_resistance_price)
+            & (current_close > horizontal_resistance_price)
+        )
+
+        # 斜率壓力線：需要至少兩個之前的轉折高點 (兩點位置必不同)
+        has_two = count >= 2
+        if has_two.any():
+            first = np.maximum(count - 2, 0)[has_two]
+            x1, y1 = high_positions[first], high_prices[first]
+            x2, y2 = high_positions[first + 1], high_prices[first + 1]
+            i = bars[has_two]
+            # 計算壓力線在當前及前一日的價格
+            current_resistance_price = y1 + (y2 - y1) * (i - x1) / (x2 - x1)
+            prev_resistance_price = y1 + (y2 - y1) * ((i - 1) - x1) / (x2 - x1)
+            # 突破條件：前一日收盤價在壓力線下方，當日收盤價在壓力線上方
+            is_breakthrough[i] |= (
+                (prev_close[has_two] <= prev_resistance_price)
+                & (current_close[has_two] > current_resistance_price)
+            )
+
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'resistance_line_breakthrough_check': np.where(is_breakthrough, 'O', ''),
+    })
+
+
+def _previous_high_points(df: pd.DataFrame, turning_points_df: pd.DataFrame):
+    """
+    轉折高點的位置與最高價，以及每根K棒之前的轉折高點數量。
+
+    轉折點以日期字串對應到 df 的K棒位置；第 i 根K棒之前的轉折高點為
+    high_positions[:counts[i]]，最近兩個即 counts[i] - 2、counts[i] - 1。
+
+    Returns:
+        (high_positions, high_prices, counts)
+    """
+    tp_dates = turning_points_df.loc[turning_points_df['turning_high_point'] == 'O', 'date']
+    tp_dates = pd.to_datetime(tp_dates, errors='coerce').dt.strftime('%Y-%m-%d')
+    is_high = df.index.strftime('%Y-%m-%d').isin(tp_dates)
+
+    high_positions = np.flatnonzero(is_high)
+    high_prices = df['High'].to_numpy()[high_positions]
+    # 只考慮當前日期之前 (位置 < i) 的轉折高點
+    counts = np.searchsorted(high_positions, np.arange(len(df)), side='left')
+    return high_positions, high_prices, counts
 
 
 def get_resistance_line_data(df: pd.DataFrame, turning_points_df: pd.DataFrame = None) -> pd.DataFrame:
@@ -134,74 +121,42 @@ def get_resistance_line_data(df: pd.DataFrame, turning_points_df: pd.DataFrame =
             df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
         turning_points_df = identify_turning_points(df)
     
-    # 將轉折點數據與原始數據合併
-    df_reset = df.reset_index()
-    date_col = df_reset.columns[0]
-    df_with_turning_points = pd.merge(
-        df_reset, 
-        turning_points_df, 
-        left_on=df_reset[date_col].dt.strftime('%Y-%m-%d'), 
-        right_on='date', 
-        how='left'
-    )
-    df_with_turning_points.set_index(date_col, inplace=True)
-    
-    # 獲取所有轉折高點
-    turning_high_points = []
-    for i, (idx, row) in enumerate(df_with_turning_points.iterrows()):
-        if row.get('turning_high_point') == 'O':
-            turning_high_points.append({
-                'index': i,
-                'date': idx,
-                'high_price': df.loc[idx, 'High']
-            })
-    
-    # 計算每日的壓力線價格
-    resistance_data = []
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        
-        # 找出當前日期之前的轉折高點
-        previous_high_points = [
-            hp for hp in turning_high_points 
-            if hp['index'] < i
-        ]
-        
-        # 預設輸出
-        resistance_entry = {
-            'date': date,
-            'resistance_price': np.nan,
-            'horizontal_resistance_price': np.nan,
-            'last_high_point_date': '',
-            'last_high_point_price': np.nan,
-            'point1_date': '',
-            'point1_price': np.nan,
-            'point2_date': '',
-            'point2_price': np.nan
-        }
-        
-        if previous_high_points:
-            last_high_point = previous_high_points[-1]
-            resistance_entry['horizontal_resistance_price'] = last_high_point['high_price']
-            resistance_entry['last_high_point_date'] = last_high_point['date'].strftime('%Y-%m-%d')
-            resistance_entry['last_high_point_price'] = last_high_point['high_price']
-        
-        if len(previous_high_points) >= 2:
-            # 取最近的兩個轉折高點
-            recent_high_points = previous_high_points[-2:]
-            point1 = recent_high_points[0]
-            point2 = recent_high_points[1]
-            
-            x1, y1 = point1['index'], point1['high_price']
-            x2, y2 = point2['index'], point2['high_price']
-            
-            if x2 != x1:
-                resistance_entry['resistance_price'] = y1 + (y2 - y1) * (i - x1) / (x2 - x1)
-                resistance_entry['point1_date'] = point1['date'].strftime('%Y-%m-%d')
-                resistance_entry['point1_price'] = point1['high_price']
-                resistance_entry['point2_date'] = point2['date'].strftime('%Y-%m-%d')
-                resistance_entry['point2_price'] = point2['high_price']
-        
-        resistance_data.append(resistance_entry)
-    
-    return pd.DataFrame(resistance_data)
+    high_positions, high_prices, counts = _previous_high_points(df, turning_points_df)
+    n = len(df)
+    high_dates = df.index[high_positions].strftime('%Y-%m-%d').to_numpy(dtype=object)
+    high_prices = high_prices.astype(float)
+
+    def point_columns(offset):
+        # 每根K棒之前倒數第 offset 個轉折高點的日期與價格，不存在時為 '' / NaN
+        valid = counts >= offset
+        which = np.maximum(counts - offset, 0)
+        if len(high_positions) == 0:
+            return valid, np.full(n, '', dtype=object), np.full(n, np.nan)
+        dates = np.where(valid, high_dates[which], '')
+        prices = np.where(valid, high_prices[which], np.nan)
+        return valid, dates, prices
+
+    has_one, last_dates, last_prices = point_columns(1)
+    has_two, point1_dates, point1_prices = point_columns(2)
+    _, point2_dates, point2_prices = point_columns(1)
+
+    # 兩個轉折高點所形成的壓力線價格
+    resistance_price = np.full(n, np.nan)
+    if has_two.any():
+        first = np.maximum(counts - 2, 0)[has_two]
+        x1, y1 = high_positions[first], high_prices[first]
+        x2, y2 = high_positions[first + 1], high_prices[first + 1]
+        i = np.flatnonzero(has_two)
+        resistance_price[has_two] = y1 + (y2 - y1) * (i - x1) / (x2 - x1)
+
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'resistance_price': resistance_price,
+        'horizontal_resistance_price': last_prices,
+        'last_high_point_date': last_dates,
+        'last_high_point_price': last_prices,
+        'point1_date': point1_dates,
+        'point1_price': point1_prices,
+        'point2_date': np.where(has_two, point2_dates, ''),
+        'point2_price': np.where(has_two, point2_prices, np.nan),
+    })
@@ -1,37 +1,24 @@
+import numpy as np
 import pandas as pd
 
-def check_san_yang_kai_tai(df: pd.DataFrame) -> pd.DataFrame:
-    results = []
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        close = row['Close']
-        ma5 = row['ma5']
-        ma10 = row['ma10']
-        ma20 = row['ma20']
+def check_san_yang_kai_tai(df: pd.DataFrame, context=None) -> pd.DataFrame:
+    close = df['Close']
+    prev_close = close.shift(1)
+    ma_present = df[['ma5', 'ma10', 'ma20']].notna().all(axis=1)
 
-        if pd.isna(ma5) or pd.isna(ma10) or pd.isna(ma20):
-            results.append({'date': date, 'san_yang_kai_tai_check': ''})
-            continue
-        if i > 0:
-            prev_row = df.iloc[i - 1]
-            prev_close = prev_row['Close']
-            prev_ma5 = prev_row['ma5']
-            prev_ma10 = prev_row['ma10']
-            prev_ma20 = prev_row['ma20']
-        else:
-            results.append({'date': date, 'san_yang_kai_tai_check': ''})
-            continue
-        # CROSS OVER: 當天首次突破且站上
-        crossover_ma5 = (close >= ma5 and prev_close < prev_ma5)
-        crossover_ma10 = (close >= ma10 and prev_close < prev_ma10)
-        crossover_ma20 = (close >= ma20 and prev_close < prev_ma20)
-        breakthrough_any = crossover_ma5 or crossover_ma10 or crossover_ma20
-        above_all_ma = (close >= ma5) and (close >= ma10) and (close >= ma20)
-        if breakthrough_any and above_all_ma:
-            results.append({'date': date, 'san_yang_kai_tai_check': 'O'})
-        else:
-            results.append({'date': date, 'san_yang_kai_tai_check': ''})
-    return pd.DataFrame(results)
+    # CROSS OVER: 當天首次突破且站上 (第一根 K 棒沒有前一天，shift 後為 NaN 不成立)
+    breakthrough_any = pd.Series(False, index=df.index)
+    above_all_ma = pd.Series(True, index=df.index)
+    for col in ('ma5', 'ma10', 'ma20'):
+        above = close >= df[col]
+        breakthrough_any |= above & (prev_close < df[col].shift(1))
+        above_all_ma &= above
+
+    signal = ma_present & breakthrough_any & above_all_ma
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'san_yang_kai_tai_check': np.where(signal, 'O', ''),
+    })
 
 
 def check_four_seas_dragon(df: pd.DataFrame, ma_periods: list) -> pd.DataFrame:
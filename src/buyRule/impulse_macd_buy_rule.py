@@ -16,10 +16,12 @@ Impulse MACD 買入規則
 - DataFrame 中必須已包含 ImpulseMACD, ImpulseSignal, ImpulseHistogram 欄位
 - 這些欄位由 data_initial/calculate_impulse_macd.py 預先計算
 
-版本: v1.1
-更新日期: 2025-10-29
+版本: v1.2
+更新日期: 2026-10-16
+- v1.2: 交叉判斷改以 shift 後的布林遮罩計算,輸出與 v1.1 相同
 """
 
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -40,37 +42,21 @@ def check_impulse_macd_zero_cross_buy(df: pd.DataFrame) -> pd.DataFrame:
         - date: 日期
         - impulse_macd_zero_cross_buy: 'O' 表示買入信號
     """
-    results = []
-    
     # 檢查必要欄位
     if 'ImpulseMACD' not in df.columns:
         print("⚠ DataFrame 缺少 ImpulseMACD 欄位,請先執行 append_indicator")
         return pd.DataFrame(columns=['date', 'impulse_macd_zero_cross_buy'])
     
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        
-        # 初始化為不滿足條件
-        signal = ''
-        
-        if i > 0:
-            prev_row = df.iloc[i - 1]
-            
-            curr_impulse = row.get('ImpulseMACD')
-            prev_impulse = prev_row.get('ImpulseMACD')
-            
-            # 檢查數據有效性
-            if pd.notna(curr_impulse) and pd.notna(prev_impulse):
-                # 向上穿越 0 線
-                if prev_impulse <= 0 and curr_impulse > 0:
-                    signal = 'O'
-        
-        results.append({
-            'date': date,
-            'impulse_macd_zero_cross_buy': signal
-        })
+    curr_impulse = df['ImpulseMACD']
+    prev_impulse = curr_impulse.shift(1)
     
-    return pd.DataFrame(results)
+    # 向上穿越 0 線 (NaN 比較結果為 False,第一根 K 棒 shift 後為 NaN)
+    signal = (prev_impulse <= 0) & (curr_impulse > 0)
+    
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'impulse_macd_zero_cross_buy': np.where(signal, 'O', '')
+    })
 
 
 def check_impulse_macd_signal_cross_buy(df: pd.DataFrame) -> pd.DataFrame:
@@ -88,8 +74,6 @@ def check_impulse_macd_signal_cross_buy(df: pd.DataFrame) -> pd.DataFrame:
         - date: 日期
         - impulse_macd_signal_cross_buy: 'O' 表示買入信號
     """
-    results = []
-    
     # 檢查必要欄位
     required_cols = ['ImpulseMACD', 'ImpulseSignal']
     for col in required_cols:
@@ -97,38 +81,21 @@ def check_impulse_macd_signal_cross_buy(df: pd.DataFrame) -> pd.DataFrame:
             print(f"⚠ DataFrame 缺少 {col} 欄位,請先執行 append_indicator")
             return pd.DataFrame(columns=['date', 'impulse_macd_signal_cross_buy'])
     
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        
-        # 初始化為不滿足條件
-        signal = ''
-        
-        if i > 0:
-            prev_row = df.iloc[i - 1]
-            
-            curr_macd = row.get('ImpulseMACD')
-            prev_macd = prev_row.get('ImpulseMACD')
-            curr_signal = row.get('ImpulseSignal')
-            prev_signal = prev_row.get('ImpulseSignal')
-            
-            # 檢查數據有效性
-            if (pd.notna(curr_macd) and pd.notna(prev_macd) and 
-                pd.notna(curr_signal) and pd.notna(prev_signal)):
-                
-                # 向上穿越信號線
-                if prev_macd <= prev_signal and curr_macd > curr_signal:
-                    signal = 'O'
-        
-        results.append({
-            'date': date,
-            'impulse_macd_signal_cross_buy': signal
-        })
+    curr_macd = df['ImpulseMACD']
+    curr_signal = df['ImpulseSignal']
+    
+    # 向上穿越信號線 (NaN 比較結果為 False,第一根 K 棒 shift 後為 NaN)
+    signal = (curr_macd.shift(1) <= curr_signal.shift(1)) & (curr_macd > curr_signal)
     
-    return pd.DataFrame(results)
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'impulse_macd_signal_cross_buy': np.where(signal, 'O', '')
+    })
 
 
 def check_impulse_macd_combined_buy(df: pd.DataFrame,
-                                   require_positive_histo: bool = False) -> pd.DataFrame:
+                                   require_positive_histo: bool = False,
+                                   context=None) -> pd.DataFrame:
     """
     組合 Impulse MACD 買入信號
     
@@ -142,49 +109,36 @@ def check_impulse_macd_combined_buy(df: pd.DataFrame,
     Args:
         df: 包含 Impulse MACD 相關欄位的 DataFrame
         require_positive_histo: 是否要求柱狀圖為正,預設 False
+        context: 共用的 AnalysisContext (此規則不使用基礎結構,僅保持介面一致)
         
     Returns:
         包含買入信號的 DataFrame,欄位:
         - date: 日期
         - impulse_macd_buy: 'O' 表示買入信號
     """
-    results = []
-    
     # 獲取兩種信號
     zero_cross_df = check_impulse_macd_zero_cross_buy(df)
     signal_cross_df = check_impulse_macd_signal_cross_buy(df)
     
-    # 建立日期到信號的映射
-    zero_cross_dates = set(
-        zero_cross_df[zero_cross_df['impulse_macd_zero_cross_buy'] == 'O']['date'].values
-    )
-    signal_cross_dates = set(
-        signal_cross_df[signal_cross_df['impulse_macd_signal_cross_buy'] == 'O']['date'].values
-    )
-    
-    # 遍歷所有日期
-    for idx, row in df.iterrows():
-        date = idx.strftime('%Y-%m-%d')
-        signal = ''
-        
-        # 檢查是否有任一信號
-        has_signal = date in zero_cross_dates or date in signal_cross_dates
-        
-        if has_signal:
-            # 如果要求柱狀圖為正,檢查條件
-            if require_positive_histo:
-                impulse_histo = row.get('ImpulseHistogram')
-                if pd.notna(impulse_histo) and impulse_histo > 0:
-                    signal = 'O'
-            else:
-                signal = 'O'
-        
-        results.append({
-            'date': date,
-            'impulse_macd_buy': signal
-        })
-    
-    return pd.DataFrame(results)
+    # 以日期比對信號 (同一日期出現多筆時一併標記)
+    dates = df.index.strftime('%Y-%m-%d')
+    zero_cross_dates = zero_cross_df.loc[zero_cross_df['impulse_macd_zero_cross_buy'] == 'O', 'date']
+    signal_cross_dates = signal_cross_df.loc[signal_cross_df['impulse_macd_signal_cross_buy'] == 'O', 'date']
+    
+    # 檢查是否有任一信號
+    has_signal = dates.isin(zero_cross_dates) | dates.isin(signal_cross_dates)
+    
+    # 如果要求柱狀圖為正,檢查條件
+    if require_positive_histo:
+        if 'ImpulseHistogram' in df.columns:
+            has_signal &= (df['ImpulseHistogram'] > 0).to_numpy()
+        else:
+            has_signal[:] = False
+    
+    return pd.DataFrame({
+        'date': dates,
+        'impulse_macd_buy': np.where(has_signal, 'O', '')
+    })
 
 
 if __name__ == '__main__':
@@ -9,6 +9,9 @@
 2. 支援斜向下降趨勢線和水平壓力線
 3. 嚴格驗證趨勢線有效性（無穿越檢查）
 
+有效性驗證以最高價的稀疏表 (sparse table) 做區間最大值剪枝，
+每組起點-終點只需 O(log n) 次查詢，較長的 lookback_days 也能快速計算。
+
 作者：Claude
 日期：2025-01-21
 """
@@ -122,18 +125,17 @@ def _collect_wave_high_points(
         - price: 價格
     """
     points: List[dict] = []
+    if "wave_high_point" not in wave_points_df.columns or "date" not in wave_points_df.columns:
+        return points
     
-    for _, row in wave_points_df.iterrows():
-        # 檢查是否為波段高點
-        if row.get("wave_high_point") != "O":
-            continue
-        
-        # 提取日期
-        date_value = row.get("date")
-        if pd.isna(date_value):
-            continue
-        
-        date_value = pd.to_datetime(date_value, errors="coerce")
+    # 只處理波段高點的列
+    wave_highs = wave_points_df.loc[wave_points_df["wave_high_point"] == "O", "date"]
+    
+    # 提取日期（逐筆解析，欄位混有字串與時間戳時也與個別 pd.to_datetime 相同）
+    dates = [pd.to_datetime(value, errors="coerce") for value in wave_highs.dropna()]
+    highs = df["High"]
+    
+    for date_value in dates:
         if pd.isna(date_value):
             continue
         
@@ -143,7 +145,7 @@ def _collect_wave_high_points(
             continue
         
         # 提取該日最高價
-        high_price = float(df.iloc[pos]["High"])
+        high_price = float(highs.iat[pos])
         
         points.append({
             "idx": pos,
@@ -179,6 +181,10 @@ def _find_diagonal_descending_lines(
     lookback_idx = max(0, last_idx - lookback_days)
     recent_start_idx = max(0, last_idx - recent_end_days)
     
+    # 最高價區間最大值表，供每組起點-終點快速驗證有效性
+    highs = df["High"].to_numpy(dtype=float)
+    range_max = _RangeMax(highs)
+
     # 篩選終點候選（必須在最近20天內）
     end_point_candidates = [p for p in wave_high_points if p["idx"] >= recent_start_idx]
     used_recent_fallback = False
@@ -230,7 +236,7 @@ def _find_diagonal_descending_lines(
             intercept = point1["price"] - slope * start_idx
             
             # 驗證趨勢線有效性（區間內無穿越）
-            if not _segment_respects_line(df, start_idx, end_idx, slope, intercept, tolerance_for_eval):
+            if not _line_clears_highs(highs, range_max, start_idx, end_idx, slope, intercept, tolerance_for_eval):
                 continue
             
             # 計算時間跨度
@@ -269,7 +275,7 @@ def _find_diagonal_descending_lines(
                 if slope > 0:
                     continue
                 intercept = fallback_start["price"] - slope * start_idx
-                if not _segment_respects_line(df, start_idx, end_idx, slope, intercept, tolerance_for_eval):
+                if not _line_clears_highs(highs, range_max, start_idx, end_idx, slope, intercept, tolerance_for_eval):
                     continue
                 days_span = _calculate_days_span(df, start_idx, end_idx)
                 line_info = {
@@ -381,18 +387,93 @@ def _segment_respects_line(
     if end_idx <= start_idx:
         return True
     
-    # 遍歷區間內所有K線
-    for i in range(start_idx, end_idx + 1):
-        high_price = df.iloc[i]["High"]
-        trendline_price = intercept + slope * i
-        
-        # 計算誤差容忍範圍
-        tolerance = trendline_price * (tolerance_pct / 100.0)
-        
-        # 檢查是否穿越（高點超過趨勢線 + 誤差）
-        if high_price > trendline_price + tolerance:
-            return False
+    highs = df["High"].to_numpy(dtype=float)
+    return not _segment_crosses_line(highs, start_idx, end_idx, slope, intercept, tolerance_pct)
+
+
+def _segment_crosses_line(
+    highs: np.ndarray,
+    start_idx: int,
+    end_idx: int,
+    slope: float,
+    intercept: float,
+    tolerance_pct: float
+) -> bool:
+    """逐根檢查 [start_idx, end_idx] 內是否有最高價穿越趨勢線 + 誤差"""
+    idx = np.arange(start_idx, end_idx + 1)
+    trendline_price = intercept + slope * idx
+    
+    # 計算誤差容忍範圍
+    tolerance = trendline_price * (tolerance_pct / 100.0)
     
+    # 檢查是否穿越（高點超過趨勢線 + 誤差）
+    return bool(np.any(highs[start_idx:end_idx + 1] > trendline_price + tolerance))
+
+
+class _RangeMax:
+    """最高價的稀疏表，O(1) 查詢任意區間最大值（忽略 NaN）"""
+
+    def __init__(self, values: np.ndarray):
+        self.levels = [np.asarray(values, dtype=float)]
+        width = 1
+        while width * 2 <= len(values):
+            prev = self.levels[-1]
+            self.levels.append(np.fmax(prev[:-width], prev[width:]))
+            width *= 2
+
+    def query(self, start: int, end: int) -> float:
+        level = int(end - start + 1).bit_length() - 1
+        table = self.levels[level]
+        return float(np.fmax(table[start], table[end - (1 << level) + 1]))
+
+
+# 區間長度小於此值時直接逐根檢查
+_EXACT_CHECK_SPAN = 16
+
+
+def _line_clears_highs(
+    highs: np.ndarray,
+    range_max: "_RangeMax",
+    start_idx: int,
+    end_idx: int,
+    slope: float,
+    intercept: float,
+    tolerance_pct: float
+) -> bool:
+    """
+    與 _segment_respects_line 結果相同的快速版本
+
+    趨勢線在子區間內的最低 / 最高值出現在兩端；子區間最高價明顯低於最低值時整段有效，
+    明顯高於最高值時必定穿越，其餘情況才二分子區間。
+    判斷保留相對 1e-9 的餘裕，落在邊界附近的子區間改以逐根檢查，確保與逐根比較的浮點結果一致。
+    """
+    if end_idx <= start_idx:
+        return True
+
+    factor = 1.0 + tolerance_pct / 100.0
+    margin = 1e-9 * max(1.0, abs(intercept), abs(slope) * end_idx)
+    stack = [(start_idx, end_idx)]
+    while stack:
+        left, right = stack.pop()
+        if right - left < _EXACT_CHECK_SPAN:
+            if _segment_crosses_line(highs, left, right, slope, intercept, tolerance_pct):
+                return False
+            continue
+
+        segment_max = range_max.query(left, right)
+        if np.isnan(segment_max):
+            continue
+        line_left = intercept + slope * left
+        line_right = intercept + slope * right
+        if segment_max <= factor * min(line_left, line_right) - margin:
+            continue
+        if segment_max > factor * max(line_left, line_right) + margin:
+            return False
+
+        mid = (left + right) // 2
+        stack.append((mid + 1, right))
+        stack.append((left, mid))
+
     return True
 
 
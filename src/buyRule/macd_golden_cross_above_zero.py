@@ -1,25 +1,23 @@
+import numpy as np
 import pandas as pd
 
-def check_macd_golden_cross_above_zero(df: pd.DataFrame) -> pd.DataFrame:
-    results = []
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        if 'MACD' not in row or 'Signal' not in row or pd.isna(row['MACD']) or pd.isna(row['Signal']):
-            results.append({'date': date, 'macd_golden_cross_above_zero_check': ''})
-            continue
-        if i > 0:
-            prev_row = df.iloc[i - 1]
-            if pd.isna(prev_row['MACD']) or pd.isna(prev_row['Signal']):
-                results.append({'date': date, 'macd_golden_cross_above_zero_check': ''})
-                continue
-            # 黃金交叉: MACD向上穿越Signal
-            golden_cross = (row['MACD'] > row['Signal']) and (prev_row['MACD'] <= prev_row['Signal'])
-            # 在零軸之上: MACD > 0
-            above_zero = row['MACD'] > 0
-            if golden_cross and above_zero:
-                results.append({'date': date, 'macd_golden_cross_above_zero_check': 'O'})
-            else:
-                results.append({'date': date, 'macd_golden_cross_above_zero_check': ''})
-        else:
-            results.append({'date': date, 'macd_golden_cross_above_zero_check': ''})
-    return pd.DataFrame(results)
\ No newline at end of file
+def check_macd_golden_cross_above_zero(df: pd.DataFrame, context=None) -> pd.DataFrame:
+    dates = df.index.strftime('%Y-%m-%d')
+    if 'MACD' not in df.columns or 'Signal' not in df.columns:
+        return pd.DataFrame({'date': dates, 'macd_golden_cross_above_zero_check': ''})
+
+    macd = df['MACD']
+    signal_line = df['Signal']
+    prev_macd = macd.shift(1)
+    prev_signal = signal_line.shift(1)
+    # 當天與前一天的 MACD/Signal 都必須存在 (第一根 K 棒 shift 後為 NaN)
+    valid = macd.notna() & signal_line.notna() & prev_macd.notna() & prev_signal.notna()
+    # 黃金交叉: MACD向上穿越Signal
+    golden_cross = (macd > signal_line) & (prev_macd <= prev_signal)
+    # 在零軸之上: MACD > 0
+    above_zero = macd > 0
+    signal = valid & golden_cross & above_zero
+    return pd.DataFrame({
+        'date': dates,
+        'macd_golden_cross_above_zero_check': np.where(signal, 'O', ''),
+    })
\ No newline at end of file
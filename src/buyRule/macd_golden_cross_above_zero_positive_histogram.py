@@ -1,27 +1,24 @@
+import numpy as np
 import pandas as pd
 
-def check_macd_golden_cross_above_zero_positive_histogram(df: pd.DataFrame) -> pd.DataFrame:
-    results = []
-    for i, (idx, row) in enumerate(df.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        if 'MACD' not in row or 'Signal' not in row or 'Histogram' not in row or pd.isna(row['MACD']) or pd.isna(row['Signal']) or pd.isna(row['Histogram']):
-            results.append({'date': date, 'macd_golden_cross_above_zero_positive_histogram_check': ''})
-            continue
-        if i > 0:
-            prev_row = df.iloc[i - 1]
-            if pd.isna(prev_row['MACD']) or pd.isna(prev_row['Signal']) or pd.isna(prev_row['Histogram']):
-                results.append({'date': date, 'macd_golden_cross_above_zero_positive_histogram_check': ''})
-                continue
-            # 黃金交叉: MACD向上穿越Signal
-            golden_cross = (row['MACD'] > row['Signal']) and (prev_row['MACD'] <= prev_row['Signal'])
-            # 在零軸之上: MACD > 0
-            above_zero = row['MACD'] > 0
-            # 柱狀體為正值: Histogram > 0
-            positive_histogram = row['Histogram'] > 0
-            if golden_cross and above_zero and positive_histogram:
-                results.append({'date': date, 'macd_golden_cross_above_zero_positive_histogram_check': 'O'})
-            else:
-                results.append({'date': date, 'macd_golden_cross_above_zero_positive_histogram_check': ''})
-        else:
-            results.append({'date': date, 'macd_golden_cross_above_zero_positive_histogram_check': ''})
-    return pd.DataFrame(results)
\ No newline at end of file
+def check_macd_golden_cross_above_zero_positive_histogram(df: pd.DataFrame, context=None) -> pd.DataFrame:
+    dates = df.index.strftime('%Y-%m-%d')
+    if 'MACD' not in df.columns or 'Signal' not in df.columns or 'Histogram' not in df.columns:
+        return pd.DataFrame({'date': dates, 'macd_golden_cross_above_zero_positive_histogram_check': ''})
+
+    columns = df[['MACD', 'Signal', 'Histogram']]
+    # 當天與前一天的 MACD/Signal/Histogram 都必須存在 (第一根 K 棒 shift 後為 NaN)
+    valid = columns.notna().all(axis=1) & columns.shift(1).notna().all(axis=1)
+    macd = df['MACD']
+    signal_line = df['Signal']
+    # 黃金交叉: MACD向上穿越Signal
+    golden_cross = (macd > signal_line) & (macd.shift(1) <= signal_line.shift(1))
+    # 在零軸之上: MACD > 0
+    above_zero = macd > 0
+    # 柱狀體為正值: Histogram > 0
+    positive_histogram = df['Histogram'] > 0
+    signal = valid & golden_cross & above_zero & positive_histogram
+    return pd.DataFrame({
+        'date': dates,
+        'macd_golden_cross_above_zero_positive_histogram_check': np.where(signal, 'O', ''),
+    })
\ No newline at end of file
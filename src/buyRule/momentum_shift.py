@@ -12,10 +12,49 @@ Momentum Shift (動能轉移) 系統 v2.0
 3. 買進與賣出訊號偵測
 """
 
+from bisect import bisect_left
+
 import pandas as pd
 import numpy as np
 from typing import List, Optional, Tuple, Dict
 
+def _nearest_index_above(values: np.ndarray, queries: np.ndarray, lookback: int) -> np.ndarray:
+    """
+    對每個 i 找出最近的 k (i - lookback <= k < i) 使 values[k] > queries[i]，找不到為 -1。
+
+    以單調堆疊維護「之後沒有不小於它的值」的索引 (由底到頂 values 嚴格遞減)：
+    被彈出的 k 必有更近且更大的 j，因此最近的符合者一定留在堆疊中，
+    且符合者為堆疊底部的一段前綴，以二分搜尋取其最後一個即可。
+    每個索引只進出堆疊一次，總計 O(n log n)，與 lookback 無關。
+    """
+    n = len(values)
+    nearest = np.full(n, -1, dtype=np.int64)
+    stack_idx = []
+    stack_neg = []  # -values，由底到頂遞增，供 bisect 使用
+    values_list = values.tolist()
+    queries_list = queries.tolist()
+
+    for i in range(n):
+        if i > 0:
+            prev = values_list[i - 1]
+            # NaN 永遠不會符合條件，也不應彈出其他索引
+            if prev == prev:
+                while stack_neg and -stack_neg[-1] <= prev:
+                    stack_neg.pop()
+                    stack_idx.pop()
+                stack_idx.append(i - 1)
+                stack_neg.append(-prev)
+
+        query = queries_list[i]
+        if query != query or not stack_neg:
+            continue
+        pos = bisect_left(stack_neg, -query) - 1
+        if pos >= 0 and stack_idx[pos] >= i - lookback:
+            nearest[i] = stack_idx[pos]
+
+    return nearest
+
+
 def compute_momentum_shift(df: pd.DataFrame, lookback: int = 20) -> pd.DataFrame:
     """
     計算動能轉移 (Momentum Shift) 軌跡與訊號 (基於 GFVG 掃描)。
@@ -31,161 +70,79 @@ def compute_momentum_shift(df: pd.DataFrame, lookback: int = 20) -> pd.DataFrame
         return pd.DataFrame()
 
     df_calc = df.sort_index().copy()
-    
-    # 初始化結果欄位
-    df_calc['ms_level'] = np.nan
-    df_calc['ms_type'] = None  # "Bullish" or "Bearish"
-    df_calc['ms_buy_signal'] = ""
-    df_calc['ms_sell_signal'] = ""
 
-    current_ms_level = np.nan
-    current_ms_type = None  # "Bullish" (Green) or "Bearish" (Red)
-    
-    highs = df_calc['High'].values
-    lows = df_calc['Low'].values
+    highs = df_calc['High'].to_numpy(dtype=float)
+    lows = df_calc['Low'].to_numpy(dtype=float)
     closes = df_calc['Close'].values
     n = len(df_calc)
 
-    for i in range(n):
-        # 至少要有前面的 K 線才能比較
-        if i == 0:
-            continue
-            
-        current_high = highs[i]
-        current_low = lows[i]
+    # --- GFVG 邊界 K 線 ---
+    # Bearish GFVG: 最近的 k 使 Low[k] > High[curr]
+    # Bullish GFVG: 最近的 k 使 High[k] < Low[curr] (等同 -High[k] > -Low[curr])
+    bearish_ks = _nearest_index_above(lows, highs, lookback)
+    bullish_ks = _nearest_index_above(-highs, -lows, lookback)
+
+    ms_level = np.full(n, np.nan)
+    ms_type = np.full(n, None, dtype=object)
+    ms_buy_signal = np.full(n, "", dtype=object)
+    ms_sell_signal = np.full(n, "", dtype=object)
+
+    current_ms_level = np.nan
+    current_ms_type = None  # "Bullish" (Green) or "Bearish" (Red)
+
+    # 至少要有前面的 K 線才能比較，第一根維持空值
+    for i in range(1, n):
+        bearish_k = bearish_ks[i]
+        bullish_k = bullish_ks[i]
 
+        # 兩種缺口都存在時取較近者 (k 較大)，距離相同時以 Bullish 為準
         new_level = None
         new_type = None
-        found_gap = False
-
-        # --- GFVG Scanning Logic ---
-        # 往回看 k in [i-1, i-2, ... i-lookback]
-        start_scan = max(0, i - lookback)
-        
-        # 1. Check Bearish GFVG (看跌缺口)
-        # 條件: High[curr] < Low[k] (且 k 是最近的一個)
-        for k in range(i - 1, start_scan - 1, -1):
-            if lows[k] > current_high:
-                # Found the nearest boundary candle
-                # Level = (Low[boundary] + High[current]) / 2
-                new_level = (lows[k] + current_high) / 2
-                new_type = "Bearish"
-                found_gap = True
-                break # 找到最近的就停止
-
-        # 2. Check Bullish GFVG (看漲缺口)
-        # 條件: Low[curr] > High[k] (且 k 是最近的一個)
-        # 注意: 若同一個 K 線同時滿足 Bullish 和 Bearish (例如 Inside Bar 可能發生極端狀況?)
-        # 通常實體方向會決定主要缺口類型，或者後面的取代前面的。
-        # 這裡我們獨立掃描。如果 Bearish 已經找到，我們再看 Bullish。
-        # 如果都有，如何權衡？
-        # 根據定義，如果 High < Old Low 成立 (Bearish Gap)，那 Low > Old High (Bullish Gap) 
-        # 在幾何上這兩者很難對「同一根」Old Candle 成立。
-        # 但可能對「不同」的 k 成立。
-        # 邏輯上，越近的 K 線代表越近期的結構。
-        # 這裡簡單起見，若兩者都找到，取 k 比較大的 (比較近的)。
-        
-        potential_bull_level = None
-        potential_bull_k = -1
-
-        for k in range(i - 1, start_scan - 1, -1):
-            if highs[k] < current_low:
-                potential_bull_level = (highs[k] + current_low) / 2
-                potential_bull_k = k
-                break
-        
-        if potential_bull_k != -1:
-            # 如果之前已經找到 Bearish
-            if found_gap:
-                # 比較誰比較近 (k 越大越近)
-                # Bearish 的 k 在上面的迴圈變數裡，需要記錄
-                # 這裡重新整理一下邏輯架構
-                pass 
-                # 為了簡潔，我們先以「最後被掃描到的」或「優先順序」為準嗎？
-                # 讓我們用一個更嚴謹的方式：
-                # 找出 nearest Bearish k and nearest Bullish k
-                pass
-            else:
-                 new_level = potential_bull_level
-                 new_type = "Bullish"
-                 found_gap = True
-        
-        # 優化重寫掃描迴圈以處理衝突 (雖然很少見)
-        # 我們直接找 min distance
-        best_k = -1
-        
-        # Scan Bearish
-        bearish_k = -1
-        bearish_val = 0.0
-        for k in range(i - 1, start_scan - 1, -1):
-            if lows[k] > current_high:
-                bearish_k = k
-                bearish_val = (lows[k] + current_high) / 2
-                break
-        
-        # Scan Bullish
-        bullish_k = -1
-        bullish_val = 0.0
-        for k in range(i - 1, start_scan - 1, -1):
-            if highs[k] < current_low:
-                bullish_k = k
-                bullish_val = (highs[k] + current_low) / 2
-                break
-                
-        # Decide
-        if bearish_k != -1 and bullish_k != -1:
-            if bearish_k > bullish_k: # Bearish is closer
-                new_level = bearish_val
-                new_type = "Bearish"
-                found_gap = True
-            else: # Bullish is closer or equal
-                new_level = bullish_val
-                new_type = "Bullish"
-                found_gap = True
-        elif bearish_k != -1:
-            new_level = bearish_val
+        if bearish_k != -1 and bearish_k > bullish_k:
+            # Level = (Low[boundary] + High[current]) / 2
+            new_level = (lows[bearish_k] + highs[i]) / 2
             new_type = "Bearish"
-            found_gap = True
         elif bullish_k != -1:
-            new_level = bullish_val
+            new_level = (highs[bullish_k] + lows[i]) / 2
             new_type = "Bullish"
-            found_gap = True
 
-
-        # --- 3. 處理狀態更新 (Staircase) ---
+        # --- 處理狀態更新 (Staircase)：只在出現新缺口時更新 Level ---
         prev_level = current_ms_level
         prev_type = current_ms_type
 
-        if found_gap:
+        if new_type is not None:
             current_ms_level = new_level
             current_ms_type = new_type
-        
-        # --- 4. 偵測交易訊號 ---
-        # 買進: 之前是 Bearish (紅線)，今天 Close > Level
+
+        # --- 偵測交易訊號 ---
+        # 買進: 之前是 Bearish (紅線)，今天 Close > Level；訊號後只翻轉 Type，Level 維持到新缺口出現
         if prev_type == "Bearish" and not np.isnan(prev_level):
             if closes[i] > prev_level:
-                df_calc.at[df_calc.index[i], 'ms_buy_signal'] = "O"
-                current_ms_type = "Bullish" 
-                # 訊號觸發後，狀態翻轉，但 Level 數值維持直到新 Gap 出現?
-                # 依照慣例，flip type often implies looking for support now. 
-                # 但 Staircase 定義是 "Only update level when new gap found".
-                # 所以這裡只改 Type。
+                ms_buy_signal[i] = "O"
+                current_ms_type = "Bullish"
 
         # 賣出: 之前是 Bullish (綠線)，今天 Close < Level
         if prev_type == "Bullish" and not np.isnan(prev_level):
             if closes[i] < prev_level:
-                df_calc.at[df_calc.index[i], 'ms_sell_signal'] = "O"
+                ms_sell_signal[i] = "O"
                 current_ms_type = "Bearish"
 
         # 儲存當天狀態
-        df_calc.at[df_calc.index[i], 'ms_level'] = current_ms_level
-        df_calc.at[df_calc.index[i], 'ms_type'] = current_ms_type
+        ms_level[i] = current_ms_level
+        ms_type[i] = current_ms_type
+
+    df_calc['ms_level'] = ms_level
+    # 保持 object 型別 (None / 字串)，避免被推斷為字串型別
+    df_calc['ms_type'] = pd.Series(ms_type, index=df_calc.index, dtype=object)
+    df_calc['ms_buy_signal'] = ms_buy_signal
+    df_calc['ms_sell_signal'] = ms_sell_signal
 
     return df_calc
 
-def check_momentum_shift(df: pd.DataFrame) -> pd.DataFrame:
+def check_momentum_shift(df: pd.DataFrame, context=None) -> pd.DataFrame:
     """
     相容於系統現行 validate_buy_rule 的 wrapper。
+    context (AnalysisContext) 僅保持規則介面一致，未使用。
     """
     res = compute_momentum_shift(df)
     if res.empty:
@@ -148,10 +148,12 @@ def check_td_sequential_buy_rule(
     comparison_offset: int = 2,
     setup_length: int = 9,
     price_column: str = "Close",
+    context=None,
 ) -> pd.DataFrame:
     """
     Wrapper used by validate_buy_rule / summarize_buy_rules so output columns
-    follow the conventional *_check naming style.
+    follow the conventional *_check naming style. ``context`` (AnalysisContext)
+    is accepted for interface consistency and not used.
     """
     detailed_df = compute_td_sequential_signals(
         df,
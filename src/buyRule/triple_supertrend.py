@@ -1,67 +1,49 @@
+import numpy as np
 import pandas as pd
-from src.baseRule.supertrend import calculate_supertrend
+from src.baseRule.supertrend import calculate_supertrends
 
-def check_triple_supertrend(df: pd.DataFrame) -> pd.DataFrame:
+# (ATR period, factor) for the scalping, standard and major groups
+TRIPLE_SUPERTREND_PARAMS = [(10, 1.0), (11, 2.0), (12, 3.0)]
+
+
+def check_triple_supertrend(df: pd.DataFrame, context=None) -> pd.DataFrame:
     """
     Check Triple Supertrend Buy Signals
     Returns DataFrame with 3 check columns:
     - triple_supertrend_g1_check: Scalping (ATR 10, Factor 1.0) Break
     - triple_supertrend_g2_check: Standard (ATR 11, Factor 2.0) Break
     - triple_supertrend_all_check: All 3 Systems Up (Signal at the transition)
+
+    context (AnalysisContext, optional) reuses cached supertrends for the same df.
     """
-    results = []
-    
-    # Calculate 3 Supertrends
-    # Group 1: Scalping (10, 1.0)
-    st1 = calculate_supertrend(df, period=10, factor=1.0)
-    # Group 2: Standard (11, 2.0)
-    st2 = calculate_supertrend(df, period=11, factor=2.0)
-    # Group 3: Major (12, 3.0)
-    st3 = calculate_supertrend(df, period=12, factor=3.0)
+    # Calculate 3 Supertrends in one batch
+    # Group 1: Scalping (10, 1.0), Group 2: Standard (11, 2.0), Group 3: Major (12, 3.0)
+    if context is not None:
+        supertrends = context.supertrends(TRIPLE_SUPERTREND_PARAMS)
+    else:
+        supertrends = calculate_supertrends(df, TRIPLE_SUPERTREND_PARAMS)
+    st1, st2, st3 = (supertrends[params] for params in TRIPLE_SUPERTREND_PARAMS)
     
-    # Merge into a single alignment for iteration
-    # Using underlying arrays for performance is better but DataFrame iterrows is standard in this project
-    # merging all into one DF for easier row access
-    combined = pd.DataFrame({
-        'Close': df['Close'],
-        'Dir1': st1['Direction'],
-        'Dir2': st2['Direction'],
-        'Dir3': st3['Direction']
-    }, index=df.index)
-    
-    for i, (idx, row) in enumerate(combined.iterrows()):
-        date = idx.strftime('%Y-%m-%d')
-        
-        # Default empty
-        res = {
-            'date': date,
-            'triple_supertrend_g1_check': '',
-            'triple_supertrend_g2_check': '',
-            'triple_supertrend_all_check': ''
-        }
-        
-        if i == 0:
-            results.append(res)
-            continue
-            
-        prev_row = combined.iloc[i-1]
-        
-        # Signal Prioritization Logic: Only mark the strongest signal if multiple occur
-        
-        # Priority 1: All 3 Up (Transition)
-        all_now_up = (row['Dir1'] == 1) and (row['Dir2'] == 1) and (row['Dir3'] == 1)
-        any_prev_down = (prev_row['Dir1'] == -1) or (prev_row['Dir2'] == -1) or (prev_row['Dir3'] == -1)
-        
-        if all_now_up and any_prev_down:
-             res['triple_supertrend_all_check'] = 'O'
-        else:
-            # Priority 2: Group 2 Break (Standard, Trend -1 -> 1)
-            if row['Dir2'] == 1 and prev_row['Dir2'] == -1:
-                res['triple_supertrend_g2_check'] = 'O'
-            # Priority 3: Group 1 Break (Scalp, Trend -1 -> 1)
-            elif row['Dir1'] == 1 and prev_row['Dir1'] == -1:
-                res['triple_supertrend_g1_check'] = 'O'
-             
-        results.append(res)
-        
-    return pd.DataFrame(results).set_index('date', drop=False)
+    dir1 = st1['Direction'].to_numpy()
+    dir2 = st2['Direction'].to_numpy()
+    dir3 = st3['Direction'].to_numpy()
+
+    # Previous-bar directions; the first bar has no previous bar and never signals
+    prev1, prev2, prev3 = (np.concatenate(([np.nan], d[:-1])) for d in (dir1, dir2, dir3))
+
+    # Signal Prioritization Logic: Only mark the strongest signal if multiple occur
+    # Priority 1: All 3 Up (Transition)
+    all_now_up = (dir1 == 1) & (dir2 == 1) & (dir3 == 1)
+    any_prev_down = (prev1 == -1) | (prev2 == -1) | (prev3 == -1)
+    all_signal = all_now_up & any_prev_down
+    # Priority 2: Group 2 Break (Standard, Trend -1 -> 1)
+    g2_signal = ~all_signal & (dir2 == 1) & (prev2 == -1)
+    # Priority 3: Group 1 Break (Scalp, Trend -1 -> 1)
+    g1_signal = ~all_signal & ~g2_signal & (dir1 == 1) & (prev1 == -1)
+
+    return pd.DataFrame({
+        'date': df.index.strftime('%Y-%m-%d'),
+        'triple_supertrend_g1_check': np.where(g1_signal, 'O', ''),
+        'triple_supertrend_g2_check': np.where(g2_signal, 'O', ''),
+        'triple_supertrend_all_check': np.where(all_signal, 'O', ''),
+    }).set_index('date', drop=False)
@@ -3,11 +3,17 @@ import re
 
 import pandas as pd
 
-from src.data_initial.calculate_impulse_macd import calculate_impulse_macd
-from src.data_initial.calculate_kd import calculate_kd
-from src.data_initial.calculate_macd import calculate_macd
-from src.data_initial.calculate_ma import calculate_ma
+from src.data_initial.indicator_engine import append_indicators
+from src.data_initial.indicator_state import (
+    IndicatorState,
+    incremental_enabled,
+    load_state,
+    save_state,
+    state_path,
+    update_indicators,
+)
 from src.data_initial.kbar_downloader import process_kbars
+from src.data_initial.kbar_store import kbar_exists, list_kbar_stock_ids, read_kbar, write_kbar
 
 
 def _base_name(col: str) -> str:
@@ -16,18 +22,17 @@ def _base_name(col: str) -> str:
 
 
 def _rebuild_kbars_from_raw(stock_id: str, data_dir: str) -> None:
-    """如果缺 _D/_W 且有 Raw，從 Raw 重建日/週線 CSV。"""
-    raw_path = os.path.join(data_dir, f"{stock_id}_Raw.csv")
-    if not os.path.exists(raw_path):
+    """如果缺 _D/_W 且有 Raw，從 Raw 重建日/週線檔案。"""
+    if not kbar_exists(stock_id, "Raw", data_dir):
         return
 
-    need_daily = not os.path.exists(os.path.join(data_dir, f"{stock_id}_D.csv"))
-    need_weekly = not os.path.exists(os.path.join(data_dir, f"{stock_id}_W.csv"))
+    need_daily = not kbar_exists(stock_id, "D", data_dir)
+    need_weekly = not kbar_exists(stock_id, "W", data_dir)
     if not (need_daily or need_weekly):
         return
 
     try:
-        raw_df = pd.read_csv(raw_path, index_col="ts", parse_dates=True)
+        raw_df = read_kbar(stock_id, "Raw", data_dir)
     except Exception as exc:
         print(f"重建 {stock_id}: 無法讀取 Raw -> {exc}")
         return
@@ -51,21 +56,23 @@ def _rebuild_kbars_from_raw(stock_id: str, data_dir: str) -> None:
     raw_df = raw_df[required]
     daily_k, weekly_k = process_kbars(raw_df)
     if daily_k is not None and need_daily:
-        daily_k.index.name = "ts"
-        daily_path = os.path.join(data_dir, f"{stock_id}_D.csv")
-        daily_k.to_csv(daily_path)
+        daily_path = write_kbar(daily_k, stock_id, "D", data_dir)
         print(f"重建 {stock_id} 日線 -> {daily_path}")
     if weekly_k is not None and need_weekly:
-        weekly_k.index.name = "ts"
-        weekly_path = os.path.join(data_dir, f"{stock_id}_W.csv")
-        weekly_k.to_csv(weekly_path)
+        weekly_path = write_kbar(weekly_k, stock_id, "W", data_dir)
         print(f"重建 {stock_id} 週線 -> {weekly_path}")
-
-def append_indicators_to_csv(input_dir='Data/kbar', output_dir='Data/kbar'):
+
+def append_indicators_to_csv(input_dir='Data/kbar', output_dir='Data/kbar', incremental=None):
     """
-    Reads CSV files from input_dir, calculates KD, MACD, MA, and Impulse MACD, 
+    Reads kbar files (CSV/Parquet/Feather) from input_dir, calculates KD, MACD, MA, and Impulse MACD, 
     and appends them to the DataFrame, then saves the updated DataFrame back to the output_dir.
+
+    incremental=True (預設取 INDICATOR_INCREMENTAL) 時以側檔狀態只計算新增的 K 棒，
+    狀態不存在或與資料檔不一致時自動退回全量計算並重建狀態。
     """
+    if incremental is None:
+        incremental = incremental_enabled()
+
     if not os.path.exists(input_dir):
         print(f"Error: Input directory '{input_dir}' not found.")
         return
@@ -73,21 +80,16 @@ def append_indicators_to_csv(input_dir='Data/kbar', output_dir='Data/kbar'):
     os.makedirs(output_dir, exist_ok=True)
 
     # 先用 Raw 重建缺失的 D/W 檔
-    raw_stock_ids = {
-        fname[:-8]  # 去掉 _Raw.csv
-        for fname in os.listdir(input_dir)
-        if fname.endswith('_Raw.csv')
-    }
-    for stock_id in sorted(raw_stock_ids):
+    for stock_id in list_kbar_stock_ids('Raw', input_dir):
         _rebuild_kbars_from_raw(stock_id, input_dir)
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith('_D.csv') or filename.endswith('_W.csv'): # Process daily and weekly kbar files
-            file_path = os.path.join(input_dir, filename)
+    for suffix in ('D', 'W'): # Process daily and weekly kbar files
+        for stock_id in list_kbar_stock_ids(suffix, input_dir):
+            filename = f"{stock_id}_{suffix}"
             print(f"Processing {filename}...")
-
+
             try:
-                df = pd.read_csv(file_path, index_col='ts', parse_dates=True)
+                df = read_kbar(stock_id, suffix, input_dir)
 
                 # Ensure necessary columns are numeric
                 for col in ['Open', 'High', 'Low', 'Close']:
@@ -99,6 +101,16 @@ def append_indicators_to_csv(input_dir='Data/kbar', output_dir='Data/kbar'):
                     print(f"Skipping {filename}: DataFrame is empty after cleaning.")
                     continue
 
+                if incremental:
+                    state_file = state_path(stock_id, suffix, output_dir)
+                    result = update_indicators(df, load_state(state_file))
+                    if result is not None:
+                        df, state, n_rows = result
+                        output_file_path = write_kbar(df, stock_id, suffix, output_dir)
+                        save_state(state, state_file)
+                        print(f"Indicators incrementally updated ({n_rows} rows) and saved to {output_file_path}")
+                        continue
+
                 # 清除既有指標欄位（含自動加的 .1/.2 後綴）避免重複
                 indicator_bases = {
                     'RSV', '%K', '%D',
@@ -110,57 +122,31 @@ def append_indicators_to_csv(input_dir='Data/kbar', output_dir='Data/kbar'):
                 columns_to_remove = [col for col in df.columns if _base_name(col) in indicator_bases]
                 if columns_to_remove:
                     df.drop(columns=columns_to_remove, inplace=True, errors='ignore')
-
-                # Calculate KD
-                kd_df = calculate_kd(df.copy())
-                # Round KD values to two decimal places
-                kd_df['RSV'] = kd_df['RSV'].round(2)
-                kd_df['%K'] = kd_df['%K'].round(2)
-                kd_df['%D'] = kd_df['%D'].round(2)
-                df = pd.concat([df, kd_df], axis=1)
-
-                # Calculate MACD
-                macd_df = calculate_macd(df.copy())
-                # Round MACD values to two decimal places
-                macd_df['MACD'] = macd_df['MACD'].round(2)
-                macd_df['Signal'] = macd_df['Signal'].round(2)
-                macd_df['Histogram'] = macd_df['Histogram'].round(2)
-                df = pd.concat([df, macd_df], axis=1)
-
-                # Calculate MA
-                ma_df = calculate_ma(df.copy())
-                # Round MA values to two decimal places
-                for col in ma_df.columns:
-                    ma_df[col] = ma_df[col].round(2)
-                df = pd.concat([df, ma_df], axis=1)
-
-                # Calculate Impulse MACD
-                impulse_macd_df = calculate_impulse_macd(df.copy())
-                # Round Impulse MACD values to two decimal places
-                for col in impulse_macd_df.columns:
-                    impulse_macd_df[col] = impulse_macd_df[col].round(2)
-                df = pd.concat([df, impulse_macd_df], axis=1)
-
+
                 # 確保欄位名稱唯一（若原始檔仍有重複 OHLC/Volume 後綴，保留第一個）
+                # 以位置保留，避免同名欄位被一併選取 (Parquet/Feather 不允許重複欄名)
                 seen = set()
-                dedup_cols = []
-                for col in df.columns:
+                keep_indices = []
+                for idx, col in enumerate(df.columns):
                     base = _base_name(col)
                     if base in seen:
                         continue
                     seen.add(base)
-                    dedup_cols.append(col)
-                df = df[dedup_cols]
+                    keep_indices.append(idx)
+                if len(keep_indices) < len(df.columns):
+                    df = df.iloc[:, keep_indices]
+
+                # 單次計算 KD / MACD / MA / Impulse MACD (四捨五入至小數點後兩位)
+                df = append_indicators(df)
 
                 # Save the updated DataFrame
-                output_file_path = os.path.join(output_dir, filename)
-                df.to_csv(output_file_path)
+                output_file_path = write_kbar(df, stock_id, suffix, output_dir)
                 print(f"Indicators (including Impulse MACD) appended and saved to {output_file_path}")
+                if incremental:
+                    save_state(IndicatorState.from_history(df), state_path(stock_id, suffix, output_dir))
 
             except Exception as e:
                 print(f"Error processing {filename}: {e}")
-        else:
-            print(f"Skipping {filename}: Not a daily or weekly kbar CSV.")
     print("-" * 30)
 
 if __name__ == "__main__":
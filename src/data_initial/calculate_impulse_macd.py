@@ -20,8 +20,9 @@ Python 移植: 用於 StkRuleCheck 系統
 6. impulse_signal = SMA(impulse_macd, 9)
 7. impulse_histogram = impulse_macd - impulse_signal
 
-版本: v1.0
-更新日期: 2025-10-29
+版本: v1.1
+更新日期: 2026-10-16
+- v1.1: SMMA 遞推與通道判斷改以 ndarray 運算，輸出與 v1.0 完全一致
 """
 
 import pandas as pd
@@ -42,19 +43,31 @@ def calc_smma(src: pd.Series, length: int) -> pd.Series:
     Returns:
         SMMA 序列
     """
-    smma = pd.Series(index=src.index, dtype=float)
-    
     if len(src) < length:
-        return smma
-    
-    # 第一個值使用 SMA
-    smma.iloc[length - 1] = src.iloc[:length].mean()
-    
-    # 後續值使用遞推公式
-    for i in range(length, len(src)):
-        smma.iloc[i] = (smma.iloc[i - 1] * (length - 1) + src.iloc[i]) / length
+        return pd.Series(index=src.index, dtype=float)
     
-    return smma
+    # 第一個值使用 SMA (與 pandas mean 一致，忽略 NaN)
+    seed = src.iloc[:length].mean()
+    values = _smma_recurrence(src.to_numpy(dtype=float), length, seed)
+    return pd.Series(values, index=src.index)
+
+
+def _smma_recurrence(src: np.ndarray, length: int, seed: float) -> np.ndarray:
+    """
+    SMMA 遞推核心，直接在 ndarray 上運算
+
+    運算順序與 (prev * (len - 1) + src) / len 完全相同，
+    確保結果與逐筆 .iloc 寫法位元一致 (ewm 的 alpha 形式會有尾數誤差)。
+    """
+    n = len(src)
+    out = np.full(n, np.nan)
+    prev = float(seed)
+    out[length - 1] = prev
+    weight = length - 1
+    for i, value in enumerate(src[length:].tolist(), start=length):
+        prev = (prev * weight + value) / length
+        out[i] = prev
+    return out
 
 
 def calc_zlema(src: pd.Series, length: int) -> pd.Series:
@@ -82,6 +95,14 @@ def calc_zlema(src: pd.Series, length: int) -> pd.Series:
     return zlema
 
 
+def _impulse_band(mi: np.ndarray, hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    """依 mi 相對 [lo, hi] 通道的位置計算 impulse_macd 原始值"""
+    valid = ~(np.isnan(mi) | np.isnan(hi) | np.isnan(lo))
+    with np.errstate(invalid='ignore'):
+        band = np.where(mi > hi, mi - hi, np.where(mi < lo, mi - lo, 0.0))
+    return np.where(valid, band, np.nan)
+
+
 def calculate_impulse_macd(df: pd.DataFrame, 
                           length_ma: int = 34, 
                           length_signal: int = 9) -> pd.DataFrame:
@@ -111,34 +132,47 @@ def calculate_impulse_macd(df: pd.DataFrame,
         if col not in df.columns:
             raise ValueError(f"DataFrame 缺少必要欄位: {col}")
     
+    values = impulse_macd_from_arrays(
+        df['High'].to_numpy(dtype=float),
+        df['Low'].to_numpy(dtype=float),
+        df['Close'].to_numpy(dtype=float),
+        length_ma=length_ma,
+        length_signal=length_signal,
+    )
+    
+    # 添加到 DataFrame (精確到小數點後兩位)
+    for col, arr in values.items():
+        df[col] = np.round(arr, 2)
+    
+    return df
+
+
+def impulse_macd_from_arrays(high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                             length_ma: int = 34, length_signal: int = 9) -> dict:
+    """
+    Impulse MACD 陣列運算核心 (供 calculate_impulse_macd 與指標引擎共用)
+    
+    Returns:
+        dict: {'ImpulseMACD', 'ImpulseSignal', 'ImpulseHistogram'} -> 未四捨五入的 np.ndarray
+    """
+    high_series = pd.Series(high)
+    low_series = pd.Series(low)
+    
     # 計算 HLC3 (典型價格)
-    src = (df['High'] + df['Low'] + df['Close']) / 3
+    src = (high_series + low_series + pd.Series(close)) / 3
     
     # 計算高低點的 SMMA
-    hi = calc_smma(df['High'], length_ma)
-    lo = calc_smma(df['Low'], length_ma)
+    hi = calc_smma(high_series, length_ma)
+    lo = calc_smma(low_series, length_ma)
     
     # 計算中間值的 ZLEMA
     mi = calc_zlema(src, length_ma)
     
     # 計算 Impulse MACD
-    # 當 mi 超出 [lo, hi] 範圍時計算差值,否則為 0
-    impulse_macd = pd.Series(index=df.index, dtype=float)
-    
-    for i in range(len(df)):
-        if pd.notna(mi.iloc[i]) and pd.notna(hi.iloc[i]) and pd.notna(lo.iloc[i]):
-            mi_val = mi.iloc[i]
-            hi_val = hi.iloc[i]
-            lo_val = lo.iloc[i]
-            
-            if mi_val > hi_val:
-                impulse_macd.iloc[i] = mi_val - hi_val
-            elif mi_val < lo_val:
-                impulse_macd.iloc[i] = mi_val - lo_val
-            else:
-                impulse_macd.iloc[i] = 0.0
-        else:
-            impulse_macd.iloc[i] = np.nan
+    # 當 mi 超出 [lo, hi] 範圍時計算差值,否則為 0；任一值缺失則為 NaN
+    impulse_macd = pd.Series(
+        _impulse_band(mi.to_numpy(dtype=float), hi.to_numpy(dtype=float), lo.to_numpy(dtype=float))
+    )
     
     # 計算信號線 (SMA of impulse_macd)
     impulse_signal = impulse_macd.rolling(window=length_signal).mean()
@@ -146,12 +180,11 @@ def calculate_impulse_macd(df: pd.DataFrame,
     # 計算柱狀圖
     impulse_histogram = impulse_macd - impulse_signal
     
-    # 添加到 DataFrame (精確到小數點後兩位)
-    df['ImpulseMACD'] = impulse_macd.round(2)
-    df['ImpulseSignal'] = impulse_signal.round(2)
-    df['ImpulseHistogram'] = impulse_histogram.round(2)
-    
-    return df
+    return {
+        'ImpulseMACD': impulse_macd.to_numpy(),
+        'ImpulseSignal': impulse_signal.to_numpy(),
+        'ImpulseHistogram': impulse_histogram.to_numpy(),
+    }
 
 
 if __name__ == '__main__':
@@ -16,25 +16,39 @@ def calculate_kd(df, n=5, m1=3, m2=3):
     Returns:
         pd.DataFrame: DataFrame with 'RSV', '%K' and '%D' columns.
     """
-    df_copy = df.copy()
+    values = kd_from_arrays(
+        df['High'].to_numpy(dtype=float),
+        df['Low'].to_numpy(dtype=float),
+        df['Close'].to_numpy(dtype=float),
+        n=n, m1=m1, m2=m2,
+    )
+    return pd.DataFrame(values, index=df.index)
 
-    # Calculate Lowest Low (LLV) and Highest High (HHV) over n periods, including current day
-    df_copy['LLV'] = df_copy['Low'].rolling(window=n, min_periods=1).min()
-    df_copy['HHV'] = df_copy['High'].rolling(window=n, min_periods=1).max()
 
-    # Calculate RSV with proper pandas chaining and handle edge cases
-    range_hl = df_copy['HHV'] - df_copy['LLV']
-    df_copy = df_copy.assign(
-        RSV=((df_copy['Close'] - df_copy['LLV']) / range_hl.replace(0, np.nan)) * 100
-    ).fillna({'RSV': 0})
+def kd_from_arrays(high, low, close, n=5, m1=3, m2=3):
+    """
+    Array-level KD kernel shared by calculate_kd and the indicator engine.
+
+    Args:
+        high, low, close (np.ndarray): Price arrays of equal length.
+
+    Returns:
+        dict: {'RSV', '%K', '%D'} -> np.ndarray
+    """
+    # Calculate Lowest Low (LLV) and Highest High (HHV) over n periods, including current day
+    llv = pd.Series(low).rolling(window=n, min_periods=1).min().to_numpy()
+    hhv = pd.Series(high).rolling(window=n, min_periods=1).max().to_numpy()
 
+    # Calculate RSV and handle edge cases (flat range -> NaN -> 0)
+    range_hl = hhv - llv
+    range_hl = np.where(range_hl == 0, np.nan, range_hl)
+    rsv = ((close - llv) / range_hl) * 100
+    rsv = np.where(np.isnan(rsv), 0.0, rsv)
 
     # Calculate %K (m1-period SMMA of RSV)
-    # Use adjust=True for SMMA calculation
-    df_copy['%K'] = df_copy['RSV'].ewm(alpha=1/m1, adjust=False, min_periods=1).mean()
+    k = pd.Series(rsv).ewm(alpha=1/m1, adjust=False, min_periods=1).mean()
 
     # Calculate %D (m2-period SMMA of %K)
-    # Use adjust=True for SMMA calculation
-    df_copy['%D'] = df_copy['%K'].ewm(alpha=1/m2, adjust=False, min_periods=1).mean()
+    d = k.ewm(alpha=1/m2, adjust=False, min_periods=1).mean()
 
-    return df_copy[['RSV', '%K', '%D']]
+    return {'RSV': rsv, '%K': k.to_numpy(), '%D': d.to_numpy()}
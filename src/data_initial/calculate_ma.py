@@ -11,13 +11,22 @@ def calculate_ma(df, periods=[5, 10, 20, 60, 120]):
     Returns:
         pd.DataFrame: DataFrame with MA columns for each specified period (e.g., 'MA_5', 'MA_10').
     """
-    df_copy = df.copy()
-    ma_columns = []
-    for period in periods:
-        col_name = f'ma{period}'
-        df_copy[col_name] = df_copy['Close'].rolling(window=period, min_periods=1).mean()
-        ma_columns.append(col_name)
-    return df_copy[ma_columns]
+    values = ma_from_arrays(df['Close'].to_numpy(dtype=float), periods)
+    return pd.DataFrame(values, index=df.index)
+
+
+def ma_from_arrays(close, periods=[5, 10, 20, 60, 120]):
+    """
+    Array-level MA kernel shared by calculate_ma and the indicator engine.
+
+    Returns:
+        dict: {'ma5', 'ma10', ...} -> np.ndarray, in the order of periods.
+    """
+    close_series = pd.Series(close)
+    return {
+        f'ma{period}': close_series.rolling(window=period, min_periods=1).mean().to_numpy()
+        for period in periods
+    }
 
 if __name__ == "__main__":
     # Example usage (for testing purposes)
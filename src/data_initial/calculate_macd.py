@@ -11,26 +11,40 @@ def calculate_macd(df, short_period=10, long_period=20, signal_period=10):
         signal_period (int): Period for the signal line EMA (default 10).
 
     Returns:
-        pd.DataFrame: DataFrame with 'EMA_short', 'EMA_long', 'MACD', 'Signal', 'Histogram' columns.
+        pd.DataFrame: DataFrame with 'MACD', 'Signal', 'Histogram' columns.
     """
-    df_copy = df.copy()
+    values = macd_from_arrays(
+        df['Close'].to_numpy(dtype=float),
+        short_period=short_period,
+        long_period=long_period,
+        signal_period=signal_period,
+    )
+    return pd.DataFrame(values, index=df.index)
 
-    # Calculate Short-term EMA
-    df_copy['EMA_short'] = df_copy['Close'].ewm(span=short_period, adjust=False).mean()
 
-    # Calculate Long-term EMA
-    df_copy['EMA_long'] = df_copy['Close'].ewm(span=long_period, adjust=False).mean()
+def macd_from_arrays(close, short_period=10, long_period=20, signal_period=10):
+    """
+    Array-level MACD kernel shared by calculate_macd and the indicator engine.
+
+    Returns:
+        dict: {'MACD', 'Signal', 'Histogram'} -> np.ndarray
+    """
+    close_series = pd.Series(close)
+
+    # Calculate Short-term and Long-term EMA
+    ema_short = close_series.ewm(span=short_period, adjust=False).mean()
+    ema_long = close_series.ewm(span=long_period, adjust=False).mean()
 
     # Calculate MACD Line
-    df_copy['MACD'] = df_copy['EMA_short'] - df_copy['EMA_long']
+    macd = ema_short - ema_long
 
     # Calculate Signal Line
-    df_copy['Signal'] = df_copy['MACD'].ewm(span=signal_period, adjust=False).mean()
+    signal = macd.ewm(span=signal_period, adjust=False).mean()
 
     # Calculate MACD Histogram
-    df_copy['Histogram'] = df_copy['MACD'] - df_copy['Signal']
+    histogram = macd - signal
 
-    return df_copy[['MACD', 'Signal', 'Histogram']]
+    return {'MACD': macd.to_numpy(), 'Signal': signal.to_numpy(), 'Histogram': histogram.to_numpy()}
 
 if __name__ == "__main__":
     # Example usage (for testing purposes)
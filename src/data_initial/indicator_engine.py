@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標計算引擎
+一次取出 OHLCV 陣列，依序執行所有已註冊的指標核心，
+並直接寫入預先配置的輸出矩陣，取代逐一 df.copy() / concat / 去重的流程。
+
+已註冊指標 (欄位順序與既有 CSV 相同):
+- KD          : RSV, %K, %D
+- MACD        : MACD, Signal, Histogram
+- MA          : ma5, ma10, ma20, ma60, ma120
+- Impulse MACD: ImpulseMACD, ImpulseSignal, ImpulseHistogram
+
+新增指標時以 register_indicator 註冊一個接收 {欄位: ndarray} 並回傳
+{輸出欄位: ndarray} 的函數即可。
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_initial.calculate_impulse_macd import impulse_macd_from_arrays
+from src.data_initial.calculate_kd import kd_from_arrays
+from src.data_initial.calculate_ma import ma_from_arrays
+from src.data_initial.calculate_macd import macd_from_arrays
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """指標註冊資訊"""
+    name: str
+    columns: Tuple[str, ...]
+    compute: Callable[[Dict[str, np.ndarray]], Dict[str, np.ndarray]]
+
+
+_REGISTRY: List[IndicatorSpec] = []
+
+
+def register_indicator(name: str, columns, compute) -> None:
+    """註冊指標；同名指標會被取代並維持原本的順序。"""
+    spec = IndicatorSpec(name=name, columns=tuple(columns), compute=compute)
+    for i, existing in enumerate(_REGISTRY):
+        if existing.name == name:
+            _REGISTRY[i] = spec
+            return
+    _REGISTRY.append(spec)
+
+
+def registered_indicators() -> List[IndicatorSpec]:
+    return list(_REGISTRY)
+
+
+def indicator_columns() -> List[str]:
+    """回傳所有已註冊指標的輸出欄位 (依註冊順序)。"""
+    return [col for spec in _REGISTRY for col in spec.columns]
+
+
+def compute_indicators(df: pd.DataFrame, round_digits: Optional[int] = 2) -> pd.DataFrame:
+    """
+    單次計算所有已註冊指標
+
+    Args:
+        df: 含 High / Low / Close (及選用 Open / Volume) 的 K 線資料
+        round_digits: 四捨五入位數，None 表示不處理
+
+    Returns:
+        pd.DataFrame: 只含指標欄位、索引與 df 相同
+    """
+    arrays = {
+        col: df[col].to_numpy(dtype=float)
+        for col in PRICE_COLUMNS
+        if col in df.columns
+    }
+    columns = indicator_columns()
+    output = np.empty((len(df), len(columns)), dtype=float)
+
+    position = 0
+    for spec in _REGISTRY:
+        values = spec.compute(arrays)
+        for col in spec.columns:
+            output[:, position] = values[col]
+            position += 1
+
+    if round_digits is not None:
+        np.round(output, round_digits, out=output)
+
+    return pd.DataFrame(output, index=df.index, columns=columns)
+
+
+def append_indicators(df: pd.DataFrame, round_digits: Optional[int] = 2) -> pd.DataFrame:
+    """
+    將指標欄位附加到 df 之後；df 已存在的同名欄位保留原值。
+
+    Returns:
+        pd.DataFrame: df 原有欄位 + 新增的指標欄位
+    """
+    indicators = compute_indicators(df, round_digits=round_digits)
+    existing = [col for col in indicators.columns if col in df.columns]
+    if existing:
+        indicators = indicators.drop(columns=existing)
+    return pd.concat([df, indicators], axis=1)
+
+
+register_indicator(
+    'kd', ('RSV', '%K', '%D'),
+    lambda a: kd_from_arrays(a['High'], a['Low'], a['Close']),
+)
+register_indicator(
+    'macd', ('MACD', 'Signal', 'Histogram'),
+    lambda a: macd_from_arrays(a['Close']),
+)
+register_indicator(
+    'ma', ('ma5', 'ma10', 'ma20', 'ma60', 'ma120'),
+    lambda a: ma_from_arrays(a['Close'], [5, 10, 20, 60, 120]),
+)
+register_indicator(
+    'impulse_macd', ('ImpulseMACD', 'ImpulseSignal', 'ImpulseHistogram'),
+    lambda a: impulse_macd_from_arrays(a['High'], a['Low'], a['Close']),
+)
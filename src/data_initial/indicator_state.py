@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標增量計算模組
+將 KD / MACD / MA / Impulse MACD 的遞推狀態存成側檔 (sidecar)，
+新 K 棒到達時只計算新增的列，不必重算整段歷史。
+
+狀態內容:
+- EMA / SMMA 的最後值 (MACD、KD 的 %K/%D、Impulse MACD 的 ZLEMA 與 hi/lo)
+- 滾動視窗的尾端資料與補償加總 (MA、KD 的 HHV/LLV、ImpulseSignal)
+
+遞推公式逐步重現 pandas ewm(adjust=False) 與 rolling().mean() 的運算順序，
+因此增量結果與 indicator_engine 全量重算位元一致。
+這些運算順序屬於 pandas 內部實作，側檔一併記錄 pandas 版本，版本不同時視為無效並全量重算。
+
+檢查點固定停在倒數第二根 K 棒，盤中或未收完的週 K 被改寫時會一併重算。
+側檔與資料檔不一致 (歷史被修正、參數變更等) 時回傳 None，由呼叫端退回全量重算。
+
+設定方式 (.env):
+- INDICATOR_INCREMENTAL=1   append_indicator 與 kbar_collector 啟用增量模式
+"""
+
+import json
+import math
+import os
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.data_initial.indicator_engine import indicator_columns
+
+load_dotenv()
+
+STATE_VERSION = 1
+STATE_SUFFIX = '.state.json'
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# 與 indicator_engine 註冊的預設參數相同
+DEFAULT_PARAMS = {
+    'kd': {'n': 5, 'm1': 3, 'm2': 3},
+    'macd': {'short_period': 10, 'long_period': 20, 'signal_period': 10},
+    'ma': {'periods': [5, 10, 20, 60, 120]},
+    'impulse_macd': {'length_ma': 34, 'length_signal': 9},
+}
+COLUMNS = (
+    'RSV', '%K', '%D',
+    'MACD', 'Signal', 'Histogram',
+    'ma5', 'ma10', 'ma20', 'ma60', 'ma120',
+    'ImpulseMACD', 'ImpulseSignal', 'ImpulseHistogram',
+)
+
+
+def incremental_enabled() -> bool:
+    return os.getenv('INDICATOR_INCREMENTAL', '').strip().lower() in {'1', 'true', 'yes'}
+
+
+def state_path(stock_id: str, suffix: str, data_dir: str = 'Data/kbar') -> str:
+    return os.path.join(data_dir, f"{stock_id}_{suffix}{STATE_SUFFIX}")
+
+
+class _Ewm:
+    """重現 pandas ewm(adjust=False).mean() 的逐筆遞推"""
+
+    def __init__(self, span=None, alpha=None):
+        # pandas 先換算成 com 再求 alpha，照樣換算以取得相同的浮點數
+        com = (span - 1) / 2.0 if span is not None else (1.0 - alpha) / alpha
+        self.alpha = 1.0 / (1.0 + com)
+        self.weighted = None
+        self.old_wt = 1.0
+
+    def update(self, value: float) -> float:
+        if self.weighted is None:
+            self.weighted = value
+            return value
+        if self.weighted == self.weighted:
+            self.old_wt *= 1.0 - self.alpha
+            if value == value:
+                if self.weighted != value:
+                    self.weighted = self.old_wt * self.weighted + self.alpha * value
+                    self.weighted /= self.old_wt + self.alpha
+                self.old_wt = 1.0
+        elif value == value:
+            self.weighted = value
+        return self.weighted
+
+    def to_dict(self) -> dict:
+        return {'weighted': self.weighted, 'old_wt': self.old_wt}
+
+    def load(self, data: dict) -> None:
+        self.weighted = data['weighted']
+        self.old_wt = data['old_wt']
+
+
+class _RollingMean:
+    """重現 pandas rolling(window).mean() 的 Kahan 補償加總"""
+
+    def __init__(self, window: int, min_periods: int = None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque(maxlen=window)
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def update(self, value: float) -> float:
+        if len(self.values) == self.window:
+            old = self.values[0]
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.comp_remove
+                t = self.sum_x + y
+                self.comp_remove = t - self.sum_x - y
+                self.sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_ct -= 1
+        if self.prev_value is None:
+            self.prev_value = value
+        if value == value:
+            self.nobs += 1
+            y = value - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_ct += 1
+            if value == self.prev_value:
+                self.same_count += 1
+            else:
+                self.same_count = 1
+            self.prev_value = value
+        self.values.append(value)
+
+        if self.nobs >= self.min_periods and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.same_count >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+    def to_dict(self) -> dict:
+        return {
+            'values': list(self.values), 'nobs': self.nobs, 'neg_ct': self.neg_ct,
+            'sum_x': self.sum_x, 'comp_add': self.comp_add, 'comp_remove': self.comp_remove,
+            'same_count': self.same_count, 'prev_value': self.prev_value,
+        }
+
+    def load(self, data: dict) -> None:
+        self.values = deque(data['values'], maxlen=self.window)
+        self.nobs = data['nobs']
+        self.neg_ct = data['neg_ct']
+        self.sum_x = data['sum_x']
+        self.comp_add = data['comp_add']
+        self.comp_remove = data['comp_remove']
+        self.same_count = data['same_count']
+        self.prev_value = data['prev_value']
+
+
+class _RollingExtreme:
+    """rolling(window, min_periods=1).min() / .max()"""
+
+    def __init__(self, window: int, func):
+        self.values = deque(maxlen=window)
+        self.func = func
+
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        valid = [v for v in self.values if v == v]
+        return self.func(valid) if valid else math.nan
+
+
+class _Smma:
+    """calc_smma 的逐筆版本：前 length 筆取平均作為種子，之後遞推"""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.seed_values = []
+        self.prev = None
+
+    def update(self, value: float) -> float:
+        if self.prev is None:
+            self.seed_values.append(value)
+            if len(self.seed_values) < self.length:
+                return math.nan
+            self.prev = float(pd.Series(self.seed_values).mean())
+            self.seed_values = []
+            return self.prev
+        self.prev = (self.prev * (self.length - 1) + value) / self.length
+        return self.prev
+
+
+class IndicatorState:
+    """
+    指標遞推狀態 (對應 indicator_engine 的預設指標與參數)
+
+    Attributes:
+        ts: 檢查點 K 棒的時間 (ISO 字串)
+        rows: 截至檢查點已處理的列數
+        last_values: 檢查點的指標值 (未四捨五入)，用於核對資料檔
+    """
+
+    def __init__(self, params: dict = None):
+        self.params = params or DEFAULT_PARAMS
+        kd = self.params['kd']
+        macd = self.params['macd']
+        impulse = self.params['impulse_macd']
+
+        self.ts = None
+        self.rows = 0
+        self.last_values = {}
+
+        self.hhv = _RollingExtreme(kd['n'], max)
+        self.llv = _RollingExtreme(kd['n'], min)
+        self.k = _Ewm(alpha=1 / kd['m1'])
+        self.d = _Ewm(alpha=1 / kd['m2'])
+        self.ema_short = _Ewm(span=macd['short_period'])
+        self.ema_long = _Ewm(span=macd['long_period'])
+        self.signal = _Ewm(span=macd['signal_period'])
+        self.ma = {period: _RollingMean(period, min_periods=1) for period in self.params['ma']['periods']}
+        self.hi = _Smma(impulse['length_ma'])
+        self.lo = _Smma(impulse['length_ma'])
+        self.ema1 = _Ewm(span=impulse['length_ma'])
+        self.ema2 = _Ewm(span=impulse['length_ma'])
+        self.impulse_signal = _RollingMean(impulse['length_signal'])
+
+    def _step(self, high: float, low: float, close: float) -> tuple:
+        # KD
+        hhv = self.hhv.update(high)
+        llv = self.llv.update(low)
+        range_hl = hhv - llv
+        rsv = ((close - llv) / range_hl) * 100 if range_hl != 0 else math.nan
+        if rsv != rsv:
+            rsv = 0.0
+        k = self.k.update(rsv)
+        d = self.d.update(k)
+
+        # MACD
+        macd = self.ema_short.update(close) - self.ema_long.update(close)
+        signal = self.signal.update(macd)
+
+        # MA
+        ma_values = tuple(state.update(close) for state in self.ma.values())
+
+        # Impulse MACD
+        hi = self.hi.update(high)
+        lo = self.lo.update(low)
+        ema1 = self.ema1.update((high + low + close) / 3)
+        ema2 = self.ema2.update(ema1)
+        mi = ema1 + (ema1 - ema2)
+        if mi != mi or hi != hi or lo != lo:
+            impulse = math.nan
+        elif mi > hi:
+            impulse = mi - hi
+        elif mi < lo:
+            impulse = mi - lo
+        else:
+            impulse = 0.0
+        impulse_signal = self.impulse_signal.update(impulse)
+
+        return (rsv, k, d, macd, signal, macd - signal) + ma_values + \
+            (impulse, impulse_signal, impulse - impulse_signal)
+
+    def advance(self, high, low, close, index=None) -> np.ndarray:
+        """
+        依序推進狀態並回傳新增列的指標值
+
+        Args:
+            high, low, close: 新增 K 棒的價格陣列
+            index: 新增 K 棒的時間索引，最後一筆成為新的檢查點
+
+        Returns:
+            np.ndarray: shape (len(close), len(COLUMNS))，未四捨五入
+        """
+        rows = [
+            self._step(h, l, c)
+            for h, l, c in zip(np.asarray(high, dtype=float).tolist(),
+                               np.asarray(low, dtype=float).tolist(),
+                               np.asarray(close, dtype=float).tolist())
+        ]
+        if not rows:
+            return np.empty((0, len(COLUMNS)))
+        self.rows += len(rows)
+        self.last_values = dict(zip(COLUMNS, rows[-1]))
+        if index is not None:
+            self.ts = pd.Timestamp(index[-1]).isoformat()
+        return np.array(rows, dtype=float)
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame) -> 'IndicatorState':
+        """由完整資料建立狀態，檢查點為倒數第二列。"""
+        state = cls()
+        settled = df.iloc[:-1]
+        state.advance(settled['High'], settled['Low'], settled['Close'], settled.index)
+        return state
+
+    def to_dict(self) -> dict:
+        return {
+            'version': STATE_VERSION,
+            'pandas_version': pd.__version__,
+            'params': self.params,
+            'ts': self.ts,
+            'rows': self.rows,
+            'last_values': self.last_values,
+            'tails': {
+                'High': list(self.hhv.values),
+                'Low': list(self.llv.values),
+            },
+            'hi': {'prev': self.hi.prev, 'seed_values': self.hi.seed_values},
+            'lo': {'prev': self.lo.prev, 'seed_values': self.lo.seed_values},
+            'ewm': {
+                name: getattr(self, name).to_dict()
+                for name in ('k', 'd', 'ema_short', 'ema_long', 'signal', 'ema1', 'ema2')
+            },
+            'ma': {str(period): state.to_dict() for period, state in self.ma.items()},
+            'impulse_signal': self.impulse_signal.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'IndicatorState':
+        state = cls(data['params'])
+        state.ts = data['ts']
+        state.rows = data['rows']
+        state.last_values = data['last_values']
+        state.hhv.values.extend(data['tails']['High'])
+        state.llv.values.extend(data['tails']['Low'])
+        for name in ('hi', 'lo'):
+            smma = getattr(state, name)
+            smma.prev = data[name]['prev']
+            smma.seed_values = data[name]['seed_values']
+        for name, values in data['ewm'].items():
+            getattr(state, name).load(values)
+        for period, values in data['ma'].items():
+            state.ma[int(period)].load(values)
+        state.impulse_signal.load(data['impulse_signal'])
+        return state
+
+
+def load_state(path: str):
+    """讀取側檔；不存在、損毀或版本 (含 pandas 版本)/參數不符時回傳 None。"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != STATE_VERSION or data.get('params') != DEFAULT_PARAMS:
+            return None
+        if data.get('pandas_version') != pd.__version__:
+            return None
+        return IndicatorState.from_dict(data)
+    except Exception as exc:
+        print(f"讀取指標狀態 {path} 失敗: {exc}")
+        return None
+
+
+def save_state(state: IndicatorState, path: str) -> None:
+    # 與 kbar_store 相同，先寫暫存檔再取代
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state.to_dict(), f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _same_values(a, b) -> bool:
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    return a.shape == b.shape and np.array_equal(a, b, equal_nan=True)
+
+
+def _checkpoint_position(df: pd.DataFrame, values: np.ndarray, state: IndicatorState):
+    """核對側檔與資料檔，回傳檢查點所在列位置；不一致時回傳 None。"""
+    if state.ts is None or not df.index.is_unique:
+        return None
+    try:
+        position = df.index.get_loc(pd.Timestamp(state.ts))
+    except KeyError:
+        return None
+    if not isinstance(position, (int, np.integer)) or position + 1 != state.rows:
+        return None
+
+    tails = {
+        'High': state.hhv.values,
+        'Low': state.llv.values,
+        'Close': state.ma[max(state.ma)].values,
+    }
+    for col, tail in tails.items():
+        stored = values[position + 1 - len(tail):position + 1, df.columns.get_loc(col)]
+        if not _same_values(stored, list(tail)):
+            return None
+
+    stored = values[position, [df.columns.get_loc(col) for col in COLUMNS]]
+    expected = np.round([state.last_values[col] for col in COLUMNS], 2)
+    if not _same_values(stored, expected):
+        return None
+    return position
+
+
+def update_indicators(df: pd.DataFrame, state: IndicatorState):
+    """
+    以側檔狀態增量計算檢查點之後的指標列
+
+    Args:
+        df: 已附加過指標欄位的 K 線資料 (新 K 棒的指標欄位可為 NaN)
+        state: load_state 讀出的狀態，None 時直接回傳 None
+
+    Returns:
+        (df, state, n_rows): 更新後的資料、新狀態、重算的列數；
+        無法增量計算時回傳 None
+    """
+    if state is None or tuple(indicator_columns()) != COLUMNS:
+        return None
+    if not df.columns.is_unique or any(col not in df.columns for col in COLUMNS + PRICE_COLUMNS[1:4]):
+        return None
+
+    # 整份資料一次轉成浮點矩陣，避免逐欄 pandas 索引的額外開銷
+    try:
+        values = df.to_numpy(dtype=float, copy=True)
+    except (TypeError, ValueError):
+        return None
+
+    position = _checkpoint_position(df, values, state)
+    if position is None:
+        return None
+
+    start = position + 1
+    n_rows = len(df) - start
+    if n_rows == 0:
+        return df, state, 0
+
+    high = values[start:, df.columns.get_loc('High')]
+    low = values[start:, df.columns.get_loc('Low')]
+    close = values[start:, df.columns.get_loc('Close')]
+
+    # 新檢查點推進到倒數第二列，最後一列另外在副本上計算
+    head = state.advance(high[:-1], low[:-1], close[:-1], df.index[start:-1])
+    snapshot = IndicatorState.from_dict(state.to_dict())
+    tail = snapshot.advance(high[-1:], low[-1:], close[-1:])
+    new_rows = np.vstack([head, tail])
+    np.round(new_rows, 2, out=new_rows)
+
+    values[start:, [df.columns.get_loc(col) for col in COLUMNS]] = new_rows
+    updated = pd.DataFrame(values, index=df.index, columns=df.columns)
+    # 還原非浮點欄位 (如整數成交量)，輸出與全量計算相同
+    for col in df.columns[df.dtypes != np.float64]:
+        updated[col] = df[col]
+    return updated, state, n_rows
+
+
+def carry_over_indicators(new_df: pd.DataFrame, old_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    將舊檔的指標欄位帶到重新產生的 K 線資料
+
+    只保留時間與 OHLCV 皆未變動的連續前綴列，之後的列留空
+    交由 append_indicator 增量計算。
+    """
+    columns = [col for col in COLUMNS if col in old_df.columns]
+    if not columns or old_df.empty:
+        return new_df
+
+    common = min(len(new_df), len(old_df))
+    same = new_df.index[:common] == old_df.index[:common]
+    for col in PRICE_COLUMNS:
+        if col not in new_df.columns or col not in old_df.columns:
+            return new_df
+        new_values = pd.to_numeric(new_df[col].iloc[:common], errors='coerce').to_numpy(dtype=float)
+        old_values = pd.to_numeric(old_df[col].iloc[:common], errors='coerce').to_numpy(dtype=float)
+        same &= (new_values == old_values) | (np.isnan(new_values) & np.isnan(old_values))
+    mismatch = np.flatnonzero(~same)
+    prefix = int(mismatch[0]) if len(mismatch) else common
+    if prefix == 0:
+        return new_df
+
+    carried = new_df.copy()
+    for col in columns:
+        values = np.full(len(new_df), np.nan)
+        values[:prefix] = pd.to_numeric(old_df[col].iloc[:prefix], errors='coerce').to_numpy(dtype=float)
+        carried[col] = values
+    return carried
@@ -4,7 +4,22 @@ from datetime import datetime, timedelta, time
 import pandas as pd
 from dotenv import load_dotenv
 import shioaji as sj
-from src.data_initial.kbar_downloader import get_stock_kbars, process_kbars, check_market_open
+from src.data_initial.kbar_downloader import process_kbars
+from src.data_initial.indicator_state import PRICE_COLUMNS, carry_over_indicators, incremental_enabled
+from src.data_initial.kbar_fetcher import FetchJob, fetch_kbars_concurrently
+from src.data_initial.kbar_store import (
+    append_raw,
+    find_kbar_file,
+    find_raw,
+    kbar_path,
+    raw_dir,
+    read_kbar_file,
+    read_kbar_summary,
+    read_raw,
+    read_raw_summary,
+    write_kbar,
+)
+from src.data_initial.trading_calendar import CALENDAR_FILENAME, TradingCalendar
 
 def get_taiwan_time():
     return datetime.utcnow() + timedelta(hours=8)
@@ -26,21 +41,29 @@ def has_latest_closing_bar(raw_file_path, trading_date, expected_close_time):
     """
     Check whether the raw kbar file already contains the final bar for the given trading date.
     A small tolerance is allowed to account for market quirks (e.g., last trade a few minutes early).
+    raw_file_path may be the monthly partition directory or a legacy single raw file.
+    The answer normally comes from the summary sidecar; raw data is only parsed
+    when it already extends past the trading date.
     """
     if not os.path.exists(raw_file_path):
         return False
 
     try:
-        raw_data = pd.read_csv(raw_file_path, index_col='ts', parse_dates=True)
+        summary = read_raw_summary(raw_file_path)
+        if summary.last_ts is None or summary.last_ts.date() < trading_date:
+            return False
+        if summary.last_ts.date() == trading_date:
+            last_timestamp = summary.last_ts
+        else:
+            raw_data = read_raw(raw_file_path, since=trading_date)
+            day_mask = raw_data.index.date == trading_date
+            if not day_mask.any():
+                return False
+            last_timestamp = raw_data.index[day_mask].max()
     except Exception as e:
         print(f"讀取 raw 原始資料失敗：{e}")
         return False
 
-    day_mask = raw_data.index.date == trading_date
-    if not day_mask.any():
-        return False
-
-    last_timestamp = raw_data.index[day_mask].max()
     expected_close_dt = datetime.combine(trading_date, expected_close_time)
     tolerance = timedelta(minutes=CLOSING_BAR_TOLERANCE_MINUTES)
     return last_timestamp >= (expected_close_dt - tolerance)
@@ -95,30 +118,98 @@ def _was_file_updated_after_cutoff(file_path, data_date):
 
 
 def _get_last_raw_timestamp(raw_file_path):
-    """讀取 raw CSV 最後一筆時間戳，供判斷是否已含昨/今收盤資料。"""
+    """讀取 raw 檔最後一筆時間戳 (取自摘要側檔)，供判斷是否已含昨/今收盤資料。"""
     if not os.path.exists(raw_file_path):
         return None
     try:
-        raw_df = pd.read_csv(raw_file_path, index_col='ts', parse_dates=True)
+        return read_raw_summary(raw_file_path).last_ts
     except Exception:
         return None
-    if raw_df.empty:
-        return None
-    return raw_df.index.max()
 
-def collect_and_save_kbars():
+def _carry_over_indicators(new_df, stock_id, suffix, data_dir):
+    """增量模式下保留舊檔未變動列的指標欄位，讓 append_indicator 只計算新 K 棒。"""
+    if not incremental_enabled():
+        return new_df
+    old_file = find_kbar_file(stock_id, suffix, data_dir)
+    if old_file is None:
+        return new_df
+    try:
+        old_data = read_kbar_file(old_file)
+    except Exception as e:
+        print(f"讀取舊指標欄位時發生錯誤：{e}，將重新計算指標")
+        return new_df
+    return carry_over_indicators(new_df, old_data)
+
+def _recompute_kbars(df, stock_id, start_date, data_output_dir):
+    """
+    產生寫入用的日K / 週K
+
+    更新模式下只以受影響 ISO 週 (自週一起) 的 Raw 分 K 重算，
+    再接上舊檔該週之前的 K 棒；全量下載或舊檔不存在時以全部 Raw 重算。
     """
-    根據 'config/StkList.cfg' 清單收集日K和周K資料，並存成 .csv 檔。
+    if start_date is None:
+        return process_kbars(df)
+
+    first_day = min(df.index.min(), pd.Timestamp(start_date)).normalize()
+    since = first_day - timedelta(days=first_day.weekday())
+    old_frames = {}
+    for suffix in ('D', 'W'):
+        old_file = find_kbar_file(stock_id, suffix, data_output_dir)
+        if old_file is None:
+            return process_kbars(read_raw(find_raw(stock_id, data_output_dir)))
+        old_frames[suffix] = read_kbar_file(old_file)
+
+    raw_df = read_raw(find_raw(stock_id, data_output_dir), since=since)
+    daily_k, weekly_k = process_kbars(raw_df[raw_df.index >= since])
+    merged = []
+    for suffix, new_k in (('D', daily_k), ('W', weekly_k)):
+        old = old_frames[suffix]
+        kept = old.loc[old.index < since, [col for col in PRICE_COLUMNS if col in old.columns]]
+        merged.append(kept if new_k is None else pd.concat([kept, new_k]))
+    return tuple(merged)
+
+def _save_fetched_kbars(df, stock_id, start_date, data_output_dir):
+    """將新分 K 寫入 Raw 月分區，並重算受影響的日K / 週K 後寫回。"""
+    raw_path = append_raw(df, stock_id, data_output_dir, start_date=start_date)
+    print(f"原始K線數據已保存到：{raw_path}")
+
+    daily_k, weekly_k = _recompute_kbars(df, stock_id, start_date, data_output_dir)
+
+    if daily_k is not None:
+        daily_k = _carry_over_indicators(daily_k, stock_id, 'D', data_output_dir)
+        daily_file = write_kbar(daily_k, stock_id, 'D', data_output_dir)
+        print(f"日K線數據已保存到：{daily_file}")
+    else:
+        print(f"無法生成股票 {stock_id} 的日K線數據。")
+
+    if weekly_k is not None:
+        weekly_k = _carry_over_indicators(weekly_k, stock_id, 'W', data_output_dir)
+        weekly_file = write_kbar(weekly_k, stock_id, 'W', data_output_dir)
+        print(f"週K線數據已保存到：{weekly_file}")
+    else:
+        print(f"無法生成股票 {stock_id} 的週K線數據。")
+
+def collect_and_save_kbars(api=None, stk_list_path='config/StkList.cfg', data_output_dir='Data/kbar',
+                           max_workers=None, requests_per_second=None):
+    """
+    根據 'config/StkList.cfg' 清單收集日K和周K資料，並依 KBAR_STORAGE_FORMAT 存檔 (預設 .csv)。
     如果檔案已存在：
     1. 檢查最後更新日期，如果不是最新的，則補充數據到今天
     2. 如果數據早於下載總天數(540天)，則重新下載
     
     Update: 
     - 使用單一 API 連線 session
-    - 檢查市場狀態(TAIEX)避免非交易日嘗試下載
+    - 檢查市場狀態(TAIEX)避免非交易日嘗試下載；交易日曆 (trading_calendar) 已知今日狀態時不再查詢
+    - 先逐檔判斷是否需要抓取，再以 kbar_fetcher 並行送出請求
+      (KBAR_FETCH_WORKERS / KBAR_FETCH_RATE 控制並行數與每秒請求數)
+
+    Args:
+        api: 已登入的 API 物件 (例如測試用的 FakeShioaji)；未提供時自行登入/登出
+        stk_list_path (str): 股票清單檔
+        data_output_dir (str): K 線輸出目錄
+        max_workers (int): 同時進行的請求數，None 時讀取 KBAR_FETCH_WORKERS
+        requests_per_second (float): 每秒請求數上限，None 時讀取 KBAR_FETCH_RATE
     """
-    stk_list_path = 'config/StkList.cfg'
-    data_output_dir = 'Data/kbar'
     DOWNLOAD_DAYS = 540  # 下載天數
 
     # 確保輸出目錄存在
@@ -126,6 +217,7 @@ def collect_and_save_kbars():
     fetch_log_path = os.path.join(data_output_dir, FETCH_LOG_FILENAME)
     fetch_log = load_fetch_log(fetch_log_path)
     fetch_cooldown = timedelta(minutes=FETCH_COOLDOWN_MINUTES)
+    calendar = TradingCalendar.load(os.path.join(data_output_dir, CALENDAR_FILENAME))
 
     stock_ids = []
     try:
@@ -149,30 +241,32 @@ def collect_and_save_kbars():
         return
 
     # --- API Initialization ---
-    api = sj.Shioaji(simulation=True)
-    try:
-        userdata = {
-            'APIKey': os.getenv('SHIOAJI_API_KEY'),
-            'SecretKey': os.getenv('SHIOAJI_SECRET_KEY')
-        }
-        
-        if not userdata['APIKey'] or not userdata['SecretKey']:
-            print("API金鑰未設置，請檢查.env文件")
+    local_api = api is None
+    if local_api:
+        api = sj.Shioaji(simulation=True)
+        try:
+            userdata = {
+                'APIKey': os.getenv('SHIOAJI_API_KEY'),
+                'SecretKey': os.getenv('SHIOAJI_SECRET_KEY')
+            }
+            
+            if not userdata['APIKey'] or not userdata['SecretKey']:
+                print("API金鑰未設置，請檢查.env文件")
+                return
+            
+            api.login(
+                api_key=str(userdata["APIKey"]),
+                secret_key=str(userdata['SecretKey'])
+            )
+        except Exception as e:
+            print(f"API 登入失敗: {e}")
             return
-        
-        api.login(
-            api_key=str(userdata["APIKey"]),
-            secret_key=str(userdata['SecretKey'])
-        )
-    except Exception as e:
-        print(f"API 登入失敗: {e}")
-        return
     
-    print("API 登入成功，開始檢查市場狀態...")
+        print("API 登入成功，開始檢查市場狀態...")
 
     # --- Market Status Check ---
     today_date = get_taiwan_time().date()
-    market_open = check_market_open(api, today_date)
+    market_open = calendar.check_market_open(api, today_date)
     
     if not market_open:
         print(f"市場狀態檢查：{today_date} 為非交易日或無數據 (TAIEX)。")
@@ -181,12 +275,13 @@ def collect_and_save_kbars():
         print(f"市場狀態檢查：{today_date} 視為交易日。")
 
     
+    # 逐檔判斷完成後再一次並行抓取
+    pending_jobs = []
     try:
         for stock_id in stock_ids:
             print(f"處理股票 {stock_id} 的K線數據...")
-            daily_file = os.path.join(data_output_dir, f"{stock_id}_D.csv")
-            weekly_file = os.path.join(data_output_dir, f"{stock_id}_W.csv")
-            raw_file = os.path.join(data_output_dir, f"{stock_id}_Raw.csv")
+            daily_file = find_kbar_file(stock_id, 'D', data_output_dir) or kbar_path(stock_id, 'D', data_output_dir)
+            raw_file = find_raw(stock_id, data_output_dir) or raw_dir(stock_id, data_output_dir)
             
             start_date = None
             end_date = get_taiwan_time()
@@ -209,9 +304,7 @@ def collect_and_save_kbars():
             before_close = end_date <= market_close_dt
             before_open = end_date < market_open_dt
             today = end_date.date()
-            prev_trading_day = today - timedelta(days=1)
-            while prev_trading_day.weekday() >= 5:
-                prev_trading_day -= timedelta(days=1)
+            prev_trading_day = calendar.previous_trading_day(today)
             need_download = True
             
             last_fetch_time = fetch_log.get(stock_id)
@@ -259,9 +352,8 @@ def collect_and_save_kbars():
 
             if os.path.exists(daily_file):
                 try:
-                    # 讀取現有數據的最後日期
-                    existing_data = pd.read_csv(daily_file, index_col='ts', parse_dates=True)
-                    last_date = existing_data.index.max()
+                    # 讀取現有數據的最後日期 (取自摘要側檔，不解析整個檔案)
+                    last_date = read_kbar_summary(daily_file).last_ts
                     
                     if pd.isna(last_date):
                         need_download = True
@@ -370,54 +462,38 @@ def collect_and_save_kbars():
 
             if need_download:
                 fetch_log[stock_id] = end_date
-                save_fetch_log(fetch_log_path, fetch_log)
-                
-                # Use the shared API instance
-                df = get_stock_kbars(stock_id, start_date=start_date, end_date=end_date, api=api)
-                
-                if df is not None and not df.empty:
-                    if start_date is not None:  # 如果是更新數據
-                        # 合併新舊數據
-                        try:
-                            old_data = pd.read_csv(raw_file, index_col='ts', parse_dates=True)
-                            if not old_data.empty:
-                                df = pd.concat([old_data[old_data.index < start_date], df])
-                        except Exception as e:
-                            print(f"合併數據時發生錯誤：{e}，將使用新下載的數據")
-
-                    # 保存原始K線數據
-                    df.index.name = 'ts'
-                    df.to_csv(raw_file)
-                    print(f"原始K線數據已保存到：{raw_file}")
-
-                    daily_k, weekly_k = process_kbars(df)
-
-                    if daily_k is not None:
-                        daily_k.index.name = 'ts'
-                        daily_file = os.path.join(data_output_dir, f"{stock_id}_D.csv")
-                        daily_k.to_csv(daily_file)
-                        print(f"日K線數據已保存到：{daily_file}")
-                    else:
-                        print(f"無法生成股票 {stock_id} 的日K線數據。")
+                pending_jobs.append(FetchJob(stock_id, start_date, end_date))
+            print("-" * 30)  # 分隔線
 
-                    if weekly_k is not None:
-                        weekly_k.index.name = 'ts'
-                        weekly_k.to_csv(weekly_file)
-                        print(f"週K線數據已保存到：{weekly_file}")
-                    else:
-                        print(f"無法生成股票 {stock_id} 的週K線數據。")
+        if pending_jobs:
+            save_fetch_log(fetch_log_path, fetch_log)
+            print(f"開始抓取 {len(pending_jobs)} 檔股票的K線數據...")
+
+        # Use the shared API instance
+        fetched = fetch_kbars_concurrently(
+            api, pending_jobs, max_workers=max_workers, requests_per_second=requests_per_second
+        )
+        for i, (job, df) in enumerate(fetched, 1):
+            print(f"抓取進度: {i}/{len(pending_jobs)} - {job.stock_id}")
+            if df is not None and not df.empty:
+                calendar.record_kbars(df)
+                try:
+                    _save_fetched_kbars(df, job.stock_id, job.start_date, data_output_dir)
+                except Exception as e:
+                    print(f"保存股票 {job.stock_id} 的K線數據時發生錯誤：{e}")
+            else:
+                if market_open:
+                    print(f"無法獲取股票 {job.stock_id} 的K線數據。")
                 else:
-                    if market_open:
-                        print(f"無法獲取股票 {stock_id} 的K線數據。")
-                    else:
-                        print(f"無法獲取股票 {stock_id} 的K線數據 (今日休市或是無交易)。")
-            print("-" * 30)  # 分隔線
+                    print(f"無法獲取股票 {job.stock_id} 的K線數據 (今日休市或是無交易)。")
             
     except Exception as e:
         print(f"執行過程中發生錯誤: {e}")
     finally:
-        api.logout()
-        print("API 已登出")
+        calendar.save()
+        if local_api:
+            api.logout()
+            print("API 已登出")
 
 if __name__ == "__main__":
     collect_and_save_kbars()
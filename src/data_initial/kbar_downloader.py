@@ -8,6 +8,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
+from src.data_initial.kbar_store import write_kbar
 
 # 載入環境變數
 load_dotenv()
@@ -79,44 +80,6 @@ def get_stock_kbars(stock_id, start_date=None, end_date=None, max_retries=3, ret
                 print("已達到最大重試次數，無法獲取數據")
                 return None
 
-def check_market_open(api, date):
-    """檢查指定日期市場是否開盤 (使用加權指數 001 判斷)
-    
-    Args:
-        api (shioaji.Shioaji): 已登入的 API 物件
-        date (datetime or date): 要檢查的日期
-    
-    Returns:
-        bool: True 表示有數據(可能開盤)，False 表示無數據(休市)
-    """
-    try:
-        # 尋找加權指數 TAIEX (代碼通常為 '001')
-        # 在 Shioaji 中，指數合約通常在 api.Contracts.Indexs 下
-        taiex = None
-        for category in api.Contracts.Indexs:
-            for contract in category:
-                 if contract.code == '001':
-                     taiex = contract
-                     break
-            if taiex: break
-        
-        if not taiex:
-            print("警告：無法找到加權指數(001)合約，無法確認市場狀態，預設為開盤。")
-            return True
-
-        date_str = date.strftime('%Y-%m-%d')
-        kbars = api.kbars(taiex, start=date_str, end=date_str)
-        
-        # 檢查是否有數據
-        if kbars and hasattr(kbars, 'ts') and len(kbars.ts) > 0:
-            return True
-        else:
-            return False
-
-    except Exception as e:
-        print(f"檢查市場狀態時發生錯誤：{e}，預設為開盤。")
-        return True
-
 def process_kbars(df):
     """處理K線數據，生成日K線和週K線
 
@@ -139,7 +102,6 @@ def process_kbars(df):
         except Exception:
             return None, None
     
-    # 生成日K線：由於部分日期無交易資料，會產生缺失
     # 生成日K線：由於部分日期無交易資料，會產生缺失
     # 首先，使用現有的重採樣邏輯計算 High, Low, Close, Volume
     daily_k = df.resample('D').agg({
@@ -149,39 +111,23 @@ def process_kbars(df):
         'Volume': 'sum'
     })
 
-    # 根據成交量 > 0 的第一筆數據計算開盤價
-    def get_first_open_with_volume(group):
-        # 過濾成交量大於 0 的數據
-        entries_with_volume = group[group['Volume'] > 0]
-        if not entries_with_volume.empty:
-            # 返回第一筆有成交量數據的開盤價
-            return entries_with_volume['Open'].iloc[0]
-        else:
-            # 如果當天沒有任何成交量數據，則開盤價為 NaN
-            return pd.NA
-
-    daily_open_prices = df.groupby(df.index.date).apply(get_first_open_with_volume)
-    daily_open_prices.index = pd.to_datetime(daily_open_prices.index) # 將日期索引轉換回 datetime
-
-    # 將計算出的開盤價賦值給 daily_k DataFrame
-    daily_k['Open'] = daily_open_prices
+    # 開盤價取當日第一筆成交量 > 0 的 Open；當天沒有任何成交量時為 NaN
+    daily_k['Open'] = df.loc[df['Volume'] > 0, 'Open'].resample('D').first()
 
     daily_k = daily_k.dropna() # 刪除任何聚合值為 NaN 的行（例如，如果某天沒有數據，或開盤價沒有成交量）
     
     # 使用 ISO 年與週數分組，確保以實際有交易的日子來分組
-    weekly_k = pd.DataFrame()
-    groups = daily_k.groupby([daily_k.index.isocalendar().year, daily_k.index.isocalendar().week])
-    
-    for (year, week), group in groups:
-        # 取該週實際的第一個與最後一個交易日
-        first_trade_date = group.index.min()
-        last_trade_date = group.index.max()
-        
-        weekly_k.loc[first_trade_date, 'Open'] = group.loc[first_trade_date, 'Open']       # 週首交易日的開盤價
-        weekly_k.loc[first_trade_date, 'High'] = group['High'].max()                       # 該週最高價
-        weekly_k.loc[first_trade_date, 'Low'] = group['Low'].min()                         # 該週最低價
-        weekly_k.loc[first_trade_date, 'Close'] = group.loc[last_trade_date, 'Close']        # 週末交易日的收盤價
-        weekly_k.loc[first_trade_date, 'Volume'] = group['Volume'].sum()                     # 該週成交量總和
+    iso = daily_k.index.isocalendar()
+    weeks = [iso['year'], iso['week']]
+    weekly_k = daily_k.groupby(weeks).agg({
+        'Open': 'first',     # 週首交易日的開盤價
+        'High': 'max',       # 該週最高價
+        'Low': 'min',        # 該週最低價
+        'Close': 'last',     # 週末交易日的收盤價
+        'Volume': 'sum'      # 該週成交量總和
+    }).astype(float)
+    # 以該週實際的第一個交易日作為週K的時間戳
+    weekly_k.index = pd.DatetimeIndex(daily_k.index.to_series().groupby(weeks).min().to_numpy())
 
     weekly_k = weekly_k.dropna()
     
@@ -209,17 +155,13 @@ def save_kbars(stock_id):
         # 處理數據
         daily_k, weekly_k = process_kbars(df)
         
-        # 設定索引名稱為 'ts'，以確保 CSV 中包含正確的 Header
+        # 依 KBAR_STORAGE_FORMAT 寫入，索引名稱統一為 'ts'
         if daily_k is not None:
-            daily_k.index.name = 'ts'
-            daily_file = os.path.join(data_dir, f"{stock_id}_D.csv")
-            daily_k.to_csv(daily_file)
+            daily_file = write_kbar(daily_k, stock_id, 'D', data_dir)
             print(f"日K線數據已保存到：{daily_file}")
         
         if weekly_k is not None:
-            weekly_k.index.name = 'ts'
-            weekly_file = os.path.join(data_dir, f"{stock_id}_W.csv")
-            weekly_k.to_csv(weekly_file)
+            weekly_file = write_kbar(weekly_k, stock_id, 'W', data_dir)
             print(f"週K線數據已保存到：{weekly_file}")
     else:
         print(f"無法獲取股票 {stock_id} 的K線數據")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K 線並行抓取排程
+多檔股票共用同一個已登入的 Shioaji session，以執行緒池同時送出多個 api.kbars 請求，
+網路延遲不再隨股票數量逐一累加。
+
+所有經由排程送出的 api.kbars 呼叫 (含 get_stock_kbars 內部重試) 都會通過
+同一個每秒請求數限制器，避免超過券商的查詢頻率上限。
+
+設定方式 (.env):
+- KBAR_FETCH_WORKERS=4          同時進行的請求數 (1 為逐一抓取)
+- KBAR_FETCH_RATE=8             每秒最多送出的 api.kbars 請求數 (0 為不限制)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from src.data_initial.kbar_downloader import get_stock_kbars
+
+load_dotenv()
+
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 8.0
+
+
+def _env_number(name: str, default, cast):
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"無效的 {name}: {value}，改用預設值 {default}")
+        return default
+
+
+def get_fetch_workers() -> int:
+    return max(1, _env_number('KBAR_FETCH_WORKERS', DEFAULT_FETCH_WORKERS, int))
+
+
+def get_requests_per_second() -> float:
+    return max(0.0, _env_number('KBAR_FETCH_RATE', DEFAULT_REQUESTS_PER_SECOND, float))
+
+
+@dataclass(frozen=True)
+class FetchJob:
+    """單檔股票的抓取請求；start_date 為 None 時由 get_stock_kbars 下載完整區間。"""
+    stock_id: str
+    start_date: Optional[datetime]
+    end_date: datetime
+
+
+class RateLimiter:
+    """
+    執行緒安全的等間隔節流器：每次 acquire() 預約下一個可用時段，
+    相鄰兩次放行至少間隔 1 / requests_per_second 秒。
+    """
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class RateLimitedAPI:
+    """包裝已登入的 API 物件，api.kbars 呼叫前先取得節流器許可，其餘屬性直接轉交。"""
+
+    def __init__(self, api, limiter: RateLimiter):
+        self._api = api
+        self._limiter = limiter
+
+    def kbars(self, *args, **kwargs):
+        self._limiter.acquire()
+        return self._api.kbars(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+
+def fetch_kbars_concurrently(api, jobs: Iterable[FetchJob], max_workers: int = None,
+                             requests_per_second: float = None,
+                             fetch=get_stock_kbars) -> Iterator[Tuple[FetchJob, Optional[pd.DataFrame]]]:
+    """
+    以共用的 API session 並行抓取多檔股票的分 K。
+
+    Args:
+        api: 已登入的 shioaji.Shioaji (或相容的假物件)，由呼叫端負責登入/登出
+        jobs: FetchJob 列表
+        max_workers: 同時進行的請求數，None 時讀取 KBAR_FETCH_WORKERS
+        requests_per_second: 每秒請求數上限，None 時讀取 KBAR_FETCH_RATE
+        fetch: 抓取函數，簽名同 get_stock_kbars
+
+    Yields:
+        (job, df)：依完成順序回傳；抓取失敗時 df 為 None
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return
+    max_workers = get_fetch_workers() if max_workers is None else max(1, max_workers)
+    requests_per_second = get_requests_per_second() if requests_per_second is None else requests_per_second
+    limited_api = RateLimitedAPI(api, RateLimiter(requests_per_second))
+
+    def run(job):
+        return fetch(job.stock_id, start_date=job.start_date, end_date=job.end_date, api=limited_api)
+
+    if max_workers == 1:
+        for job in jobs:
+            try:
+                yield job, run(job)
+            except Exception as e:
+                print(f"抓取股票 {job.stock_id} 時發生錯誤：{e}")
+                yield job, None
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = {executor.submit(run, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"抓取股票 {job.stock_id} 時發生錯誤：{e}")
+                df = None
+            yield job, df
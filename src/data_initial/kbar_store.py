@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K 線資料儲存模組
+統一管理 Data/kbar 下 {stock_id}_D / _W / _Raw 檔案的讀寫
+
+支援格式:
+- csv     : 預設格式，與既有資料目錄相容
+- parquet : 欄式儲存，保留欄位型別 (需安裝 pyarrow)
+- feather : 欄式儲存，讀寫速度最快 (需安裝 pyarrow)
+
+設定方式 (.env):
+- KBAR_STORAGE_FORMAT=parquet   指定寫入格式
+- KBAR_EXPORT_CSV=1             使用欄式格式時同時匯出一份 CSV
+
+讀取時優先使用設定的格式，找不到時依序退回其他格式，
+因此尚未遷移的 CSV 目錄仍可直接使用。
+
+Raw 分 K 以月分區儲存於 {stock_id}_Raw/{YYYY-MM}.{副檔名}，
+append_raw() 只改寫新資料涉及的月份；舊版單一 {stock_id}_Raw 檔仍可讀取，
+第一次 append_raw() 時自動切分為月分區。
+
+每次寫入同時以原子方式更新摘要側檔 {檔名}.meta.json (筆數、首末時間戳與最後一日的 K 棒數)，
+read_kbar_summary() 只讀側檔即可得知資料新舊，不必解析整個檔案；
+側檔遺失或與資料檔大小/修改時間不符時退回完整讀取並重建側檔。
+
+遷移既有資料目錄:
+    python -m src.data_initial.kbar_store --to parquet --data-dir Data/kbar
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_DATA_DIR = 'Data/kbar'
+STORAGE_FORMATS = ('csv', 'parquet', 'feather')
+FILE_EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'feather': '.feather',
+}
+KBAR_SUFFIXES = ('D', 'W', 'Raw')
+INDEX_NAME = 'ts'
+META_SUFFIX = '.meta.json'
+META_VERSION = 1
+RAW_SUFFIX = 'Raw'
+RAW_PARTITION_FORMAT = '%Y-%m'
+
+
+@lru_cache(maxsize=None)
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_storage_format() -> str:
+    """讀取 KBAR_STORAGE_FORMAT 設定，無效或缺少 pyarrow 時退回 csv。"""
+    fmt = os.getenv('KBAR_STORAGE_FORMAT', 'csv').strip().lower()
+    if fmt not in STORAGE_FORMATS:
+        print(f"未知的 KBAR_STORAGE_FORMAT: {fmt}，改用 csv")
+        return 'csv'
+    if fmt != 'csv' and not _has_pyarrow():
+        print(f"{fmt} 格式需要安裝 pyarrow，改用 csv")
+        return 'csv'
+    return fmt
+
+
+def _export_csv_enabled() -> bool:
+    return os.getenv('KBAR_EXPORT_CSV', '').strip().lower() in {'1', 'true', 'yes'}
+
+
+def kbar_path(stock_id: str, suffix: str, data_dir: str = DEFAULT_DATA_DIR, fmt: str = None) -> str:
+    """回傳指定格式的檔案路徑 (不檢查是否存在)。"""
+    fmt = fmt or get_storage_format()
+    return os.path.join(data_dir, f"{stock_id}_{suffix}{FILE_EXTENSIONS[fmt]}")
+
+
+def find_kbar_file(stock_id: str, suffix: str, data_dir: str = DEFAULT_DATA_DIR):
+    """回傳已存在的檔案路徑；優先設定格式，其次其他格式，皆無時回傳 None。"""
+    preferred = get_storage_format()
+    for fmt in (preferred,) + tuple(f for f in STORAGE_FORMATS if f != preferred):
+        path = kbar_path(stock_id, suffix, data_dir, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def kbar_exists(stock_id: str, suffix: str, data_dir: str = DEFAULT_DATA_DIR) -> bool:
+    if suffix == RAW_SUFFIX:
+        return find_raw(stock_id, data_dir) is not None
+    return find_kbar_file(stock_id, suffix, data_dir) is not None
+
+
+def list_kbar_stock_ids(suffix: str, data_dir: str = DEFAULT_DATA_DIR) -> list:
+    """列出資料目錄中具有指定後綴 (D/W/Raw) 檔案的股票代碼 (不分格式)。"""
+    if not os.path.exists(data_dir):
+        return []
+    endings = tuple(f"_{suffix}{ext}" for ext in FILE_EXTENSIONS.values())
+    stock_ids = set()
+    for filename in os.listdir(data_dir):
+        for ending in endings:
+            if filename.endswith(ending):
+                stock_ids.add(filename[:-len(ending)])
+                break
+        else:
+            # Raw 月分區目錄
+            if suffix == RAW_SUFFIX and filename.endswith(f"_{RAW_SUFFIX}") and \
+                    _raw_partitions(os.path.join(data_dir, filename)):
+                stock_ids.add(filename[:-len(RAW_SUFFIX) - 1])
+    return sorted(stock_ids)
+
+
+def read_kbar_file(path: str) -> pd.DataFrame:
+    """依副檔名讀取單一 K 線檔案，回傳以 ts 為 DatetimeIndex 的 DataFrame。"""
+    if path.endswith(FILE_EXTENSIONS['parquet']):
+        df = pd.read_parquet(path)
+    elif path.endswith(FILE_EXTENSIONS['feather']):
+        df = pd.read_feather(path)
+        if INDEX_NAME in df.columns:
+            df = df.set_index(INDEX_NAME)
+    else:
+        return pd.read_csv(path, index_col=INDEX_NAME, parse_dates=True)
+
+    if not isinstance(df.index, pd.DatetimeIndex):
+        df.index = pd.to_datetime(df.index, errors='coerce')
+    df.index.name = INDEX_NAME
+    return df
+
+
+def read_kbar(stock_id: str, suffix: str, data_dir: str = DEFAULT_DATA_DIR) -> pd.DataFrame:
+    """
+    讀取 {stock_id}_{suffix} K 線資料
+
+    Raises:
+        FileNotFoundError: 任何格式的檔案都不存在
+    """
+    if suffix == RAW_SUFFIX:
+        path = find_raw(stock_id, data_dir)
+        if path is None:
+            raise FileNotFoundError(f"找不到文件: {raw_dir(stock_id, data_dir)}")
+        return read_raw(path)
+    path = find_kbar_file(stock_id, suffix, data_dir)
+    if path is None:
+        raise FileNotFoundError(
+            f"找不到文件: {kbar_path(stock_id, suffix, data_dir)}"
+        )
+    return read_kbar_file(path)
+
+
+@dataclass(frozen=True)
+class KbarSummary:
+    """K 線檔案摘要；空檔案的時間戳為 None。"""
+    rows: int
+    first_ts: Optional[pd.Timestamp]
+    last_ts: Optional[pd.Timestamp]
+    last_day_first_ts: Optional[pd.Timestamp]
+    last_day_bars: int
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'KbarSummary':
+        index = df.index
+        if not isinstance(index, pd.DatetimeIndex):
+            index = pd.to_datetime(index, errors='coerce')
+        last_ts = index.max() if len(index) else None
+        if last_ts is None or pd.isna(last_ts):
+            return cls(len(index), None, None, None, 0)
+        last_day = index[index.normalize() == last_ts.normalize()]
+        return cls(len(index), index.min(), last_ts, last_day.min(), len(last_day))
+
+    def to_dict(self) -> dict:
+        data = {'rows': self.rows, 'last_day_bars': self.last_day_bars}
+        for name in ('first_ts', 'last_ts', 'last_day_first_ts'):
+            value = getattr(self, name)
+            data[name] = None if value is None else value.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'KbarSummary':
+        timestamps = {
+            name: None if data[name] is None else pd.Timestamp(data[name])
+            for name in ('first_ts', 'last_ts', 'last_day_first_ts')
+        }
+        return cls(rows=data['rows'], last_day_bars=data['last_day_bars'], **timestamps)
+
+
+def meta_path(path: str) -> str:
+    return f"{path}{META_SUFFIX}"
+
+
+def _file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _write_meta(summary: KbarSummary, path: str, signature: dict) -> None:
+    # 側檔只是快取，寫入失敗時下次讀取會因簽章不符退回完整讀取
+    data = {'version': META_VERSION, **signature, **summary.to_dict()}
+    target = meta_path(path)
+    tmp_path = f"{target}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, target)
+    except OSError as exc:
+        print(f"寫入摘要側檔 {target} 失敗: {exc}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _load_meta(path: str, signature: dict) -> Optional[KbarSummary]:
+    """讀取側檔；不存在、損毀或與資料檔不符時回傳 None。"""
+    try:
+        with open(meta_path(path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != META_VERSION or \
+                any(data.get(key) != value for key, value in signature.items()):
+            return None
+        return KbarSummary.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def read_kbar_summary(path: str) -> KbarSummary:
+    """
+    回傳 K 線檔案摘要 (筆數、首末時間戳、最後一日 K 棒數)
+
+    側檔有效時不讀取資料檔；否則完整讀取一次並重建側檔。
+
+    Raises:
+        OSError: 資料檔不存在或無法讀取
+    """
+    signature = _file_signature(path)
+    summary = _load_meta(path, signature)
+    if summary is None:
+        summary = KbarSummary.from_frame(read_kbar_file(path))
+        # 使用讀取前的檔案簽章，讀取期間檔案若被改寫，下次會因簽章不符而重建
+        _write_meta(summary, path, signature)
+    return summary
+
+
+def _write_file(df: pd.DataFrame, path: str, fmt: str) -> None:
+    # 先寫入暫存檔再取代，避免平行讀取時讀到寫一半的檔案
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == 'parquet':
+            df.to_parquet(tmp_path)
+        elif fmt == 'feather':
+            df.reset_index().to_feather(tmp_path)
+        else:
+            df.to_csv(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _write_meta(KbarSummary.from_frame(df), path, _file_signature(path))
+
+
+def write_kbar(df: pd.DataFrame, stock_id: str, suffix: str, data_dir: str = DEFAULT_DATA_DIR,
+               fmt: str = None, export_csv: bool = None) -> str:
+    """
+    寫入 {stock_id}_{suffix} K 線資料
+
+    Args:
+        df: 以時間為索引的 K 線資料
+        fmt: 寫入格式，預設取 KBAR_STORAGE_FORMAT
+        export_csv: 欄式格式時是否同時輸出 CSV，預設取 KBAR_EXPORT_CSV
+
+    Returns:
+        str: 主要寫入的檔案路徑
+    """
+    fmt = fmt or get_storage_format()
+    if export_csv is None:
+        export_csv = _export_csv_enabled()
+
+    os.makedirs(data_dir, exist_ok=True)
+    df.index.name = INDEX_NAME
+    path = kbar_path(stock_id, suffix, data_dir, fmt)
+    _write_file(df, path, fmt)
+    if fmt != 'csv' and export_csv:
+        _write_file(df, kbar_path(stock_id, suffix, data_dir, 'csv'), 'csv')
+    return path
+
+
+def raw_dir(stock_id: str, data_dir: str = DEFAULT_DATA_DIR) -> str:
+    """Raw 月分區目錄路徑 (不檢查是否存在)。"""
+    return os.path.join(data_dir, f"{stock_id}_{RAW_SUFFIX}")
+
+
+def _raw_partitions(path: str) -> dict:
+    """回傳 {YYYY-MM: 檔案路徑} (依月份排序)；同月份有多種格式時優先設定格式。"""
+    if not os.path.isdir(path):
+        return {}
+    preferred = get_storage_format()
+    order = (preferred,) + tuple(f for f in STORAGE_FORMATS if f != preferred)
+    found = {}
+    for filename in os.listdir(path):
+        for rank, fmt in enumerate(order):
+            ext = FILE_EXTENSIONS[fmt]
+            if filename.endswith(ext):
+                month = filename[:-len(ext)]
+                if month not in found or rank < found[month][0]:
+                    found[month] = (rank, os.path.join(path, filename))
+                break
+    return {month: found[month][1] for month in sorted(found)}
+
+
+def _remove_raw_partition(path: str, month: str, keep=()) -> None:
+    """刪除某月份各格式的分區檔與側檔；keep 為要保留的格式。"""
+    for fmt, ext in FILE_EXTENSIONS.items():
+        if fmt in keep:
+            continue
+        target = os.path.join(path, f"{month}{ext}")
+        for file_path in (target, meta_path(target)):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+
+def find_raw(stock_id: str, data_dir: str = DEFAULT_DATA_DIR):
+    """回傳 Raw 的月分區目錄，或舊版單一 Raw 檔路徑；皆無時回傳 None。"""
+    path = raw_dir(stock_id, data_dir)
+    if _raw_partitions(path):
+        return path
+    return find_kbar_file(stock_id, RAW_SUFFIX, data_dir)
+
+
+def read_raw(path: str, since=None) -> pd.DataFrame:
+    """
+    讀取 find_raw() 回傳的 Raw 路徑 (月分區目錄或單一檔案)
+
+    Args:
+        since: 只讀取此時間所在月份 (含) 之後的分區；單一檔案時讀取全部後再篩選
+    """
+    if not os.path.isdir(path):
+        df = read_kbar_file(path)
+        if since is not None:
+            df = df[df.index >= pd.Timestamp(since).replace(day=1).normalize()]
+        return df
+    partitions = _raw_partitions(path)
+    if since is not None:
+        first_month = pd.Timestamp(since).strftime(RAW_PARTITION_FORMAT)
+        partitions = {month: p for month, p in partitions.items() if month >= first_month}
+    frames = [read_kbar_file(p) for p in partitions.values()]
+    if not frames:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name=INDEX_NAME))
+    df = pd.concat(frames)
+    df.index.name = INDEX_NAME
+    return df
+
+
+def read_raw_summary(path: str) -> KbarSummary:
+    """Raw 最新資料的摘要；月分區目錄時 rows / first_ts 只涵蓋最後一個分區。"""
+    if not os.path.isdir(path):
+        return read_kbar_summary(path)
+    partitions = _raw_partitions(path)
+    if not partitions:
+        return KbarSummary(0, None, None, None, 0)
+    return read_kbar_summary(partitions[max(partitions)])
+
+
+def append_raw(df: pd.DataFrame, stock_id: str, data_dir: str = DEFAULT_DATA_DIR, start_date=None,
+               fmt: str = None, export_csv: bool = None) -> str:
+    """
+    將新下載的分 K 寫入 Raw 月分區，只改寫涉及的月份
+
+    與原本「讀取整個 Raw、合併後整檔改寫」的結果相同：
+    start_date 之後的舊資料由 df 取代，start_date 為 None 時以 df 取代全部資料。
+
+    Returns:
+        str: Raw 月分區目錄
+    """
+    fmt = fmt or get_storage_format()
+    if export_csv is None:
+        export_csv = _export_csv_enabled()
+    keep = (fmt, 'csv') if export_csv else (fmt,)
+    path = raw_dir(stock_id, data_dir)
+    os.makedirs(path, exist_ok=True)
+    partitions = _raw_partitions(path)
+
+    legacy = find_kbar_file(stock_id, RAW_SUFFIX, data_dir)
+    if legacy is not None and not partitions and start_date is not None:
+        # 舊版單一 Raw 檔：與新資料合併後一次切分為月分區
+        old = read_kbar_file(legacy)
+        df = pd.concat([old[old.index < start_date], df])
+        start_date = None
+
+    if start_date is None:
+        cutoff = None
+        stale = set(partitions)
+    else:
+        cutoff = pd.Timestamp(start_date)
+        stale = {month for month in partitions if month >= cutoff.strftime(RAW_PARTITION_FORMAT)}
+
+    df.index.name = INDEX_NAME
+    months = df.index.strftime(RAW_PARTITION_FORMAT)
+    for month in sorted(stale | set(months)):
+        parts = []
+        if cutoff is not None and month in partitions:
+            old = read_kbar_file(partitions[month])
+            parts.append(old[old.index < cutoff])
+        parts.append(df[months == month])
+        combined = pd.concat(parts) if len(parts) > 1 else parts[0]
+        if combined.empty:
+            _remove_raw_partition(path, month)
+            continue
+        combined.index.name = INDEX_NAME
+        for write_fmt in keep:
+            _write_file(combined, os.path.join(path, f"{month}{FILE_EXTENSIONS[write_fmt]}"), write_fmt)
+        _remove_raw_partition(path, month, keep=keep)
+
+    if legacy is not None:
+        # 分區已涵蓋全部資料，移除舊版單一檔案
+        os.remove(legacy)
+        if os.path.exists(meta_path(legacy)):
+            os.remove(meta_path(legacy))
+    return path
+
+
+def migrate_kbar_dir(data_dir: str = DEFAULT_DATA_DIR, target_fmt: str = 'parquet',
+                     remove_source: bool = False) -> int:
+    """
+    將資料目錄中所有 K 線檔案轉換為目標格式
+
+    Args:
+        data_dir: 資料目錄
+        target_fmt: 目標格式 (csv/parquet/feather)；csv 可作為匯出用途
+        remove_source: 轉換成功後是否刪除原始格式檔案
+
+    Returns:
+        int: 轉換的檔案數量
+    """
+    if target_fmt not in STORAGE_FORMATS:
+        raise ValueError(f"不支援的格式: {target_fmt}")
+    if target_fmt != 'csv' and not _has_pyarrow():
+        raise ImportError(f"{target_fmt} 格式需要安裝 pyarrow")
+
+    def convert(source_path: str, target_path: str) -> bool:
+        # 目標檔案較新時視為已遷移
+        if os.path.exists(target_path) and \
+                os.path.getmtime(target_path) >= os.path.getmtime(source_path):
+            return False
+        try:
+            df = read_kbar_file(source_path)
+            _write_file(df, target_path, target_fmt)
+        except Exception as exc:
+            print(f"轉換 {source_path} 失敗: {exc}")
+            return False
+        print(f"已轉換 {source_path} -> {target_path}")
+        if remove_source:
+            os.remove(source_path)
+            if os.path.exists(meta_path(source_path)):
+                os.remove(meta_path(source_path))
+        return True
+
+    converted = 0
+    for suffix in KBAR_SUFFIXES:
+        for stock_id in list_kbar_stock_ids(suffix, data_dir):
+            target_path = kbar_path(stock_id, suffix, data_dir, target_fmt)
+            for fmt in STORAGE_FORMATS:
+                if fmt == target_fmt:
+                    continue
+                source_path = kbar_path(stock_id, suffix, data_dir, fmt)
+                if not os.path.exists(source_path):
+                    continue
+                if convert(source_path, target_path):
+                    converted += 1
+                    break
+
+            # Raw 月分區逐月轉換
+            if suffix != RAW_SUFFIX:
+                continue
+            path = raw_dir(stock_id, data_dir)
+            for month in _raw_partitions(path):
+                target_path = os.path.join(path, f"{month}{FILE_EXTENSIONS[target_fmt]}")
+                for fmt in STORAGE_FORMATS:
+                    source_path = os.path.join(path, f"{month}{FILE_EXTENSIONS[fmt]}")
+                    if fmt == target_fmt or not os.path.exists(source_path):
+                        continue
+                    if convert(source_path, target_path):
+                        converted += 1
+                        break
+    return converted
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="K 線資料格式遷移工具")
+    parser.add_argument('--to', dest='target_fmt', choices=STORAGE_FORMATS, default='parquet',
+                        help='目標格式 (預設: parquet；csv 可用於匯出)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='資料目錄 (預設: Data/kbar)')
+    parser.add_argument('--remove-source', action='store_true', help='轉換後刪除原始格式檔案')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    count = migrate_kbar_dir(args.data_dir, args.target_fmt, args.remove_source)
+    print(f"遷移完成，共轉換 {count} 個檔案")
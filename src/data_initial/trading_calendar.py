@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易日曆
+從抓取到的加權指數 (TAIEX, 代碼 001) 與個股分 K 學習交易日，並存成 Data/kbar/_trading_calendar.json，
+讓 kbar_collector 不必每次啟動都查詢 TAIEX，也能跨過連假正確取得前一個交易日。
+
+- 交易日 : TAIEX 或任一個股在該日有分 K (記錄 TAIEX 當日 K 棒數)
+- 休市日 : TAIEX 查詢範圍內 (今日以前) 沒有任何 K 棒的平日
+- 其餘日期視為未知；未知的平日在 previous_trading_day 中當作交易日
+
+is_trading_day / previous_trading_day / expected_bars 皆為 O(1) 查表；
+TAIEX 合約在 api.Contracts.Indexs 中的分類位置也一併快取，不必每次掃描所有指數合約。
+
+Example:
+    >>> calendar = TradingCalendar.load('Data/kbar/_trading_calendar.json')
+    >>> market_open = calendar.check_market_open(api, today)   # 已知交易日時不呼叫 API
+    >>> prev_day = calendar.previous_trading_day(today)
+    >>> calendar.record_kbars(df)                               # 從個股分 K 學習
+    >>> calendar.save()
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+import pandas as pd
+
+CALENDAR_FILENAME = '_trading_calendar.json'
+CALENDAR_VERSION = 1
+TAIEX_CODE = '001'
+HISTORY_DAYS = 540           # 首次建立日曆時向前查詢的天數，與 K 線下載天數相同
+DEFAULT_BARS_PER_DAY = 270   # 09:01 ~ 13:30 每分鐘一根
+CLOSED_CONFIRM_TIME = time(9, 30)   # 超過此時間 TAIEX 仍無資料即視為當日休市
+DAY_COMPLETE_TIME = time(13, 40)    # 此時間後當日 TAIEX K 棒數才記為 expected_bars
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class TradingCalendar:
+    """
+    Args:
+        path: 日曆檔路徑；None 時不存檔
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.trading_days: Dict[date, Optional[int]] = {}
+        self.closed_days = set()
+        self.index_category: Optional[int] = None
+        self._contracts = {}
+        self._prev = {}
+        self._covered_until: Optional[date] = None
+        self._typical_bars = DEFAULT_BARS_PER_DAY
+        self._dirty = False
+
+    # --- 讀寫 ---
+
+    @classmethod
+    def load(cls, path: str) -> 'TradingCalendar':
+        """讀取日曆檔；不存在或損毀時回傳空日曆。"""
+        calendar = cls(path)
+        if not os.path.exists(path):
+            return calendar
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CALENDAR_VERSION:
+                return calendar
+            calendar.trading_days = {
+                date.fromisoformat(day): bars for day, bars in data['trading_days'].items()
+            }
+            calendar.closed_days = {date.fromisoformat(day) for day in data['closed_days']}
+            calendar.index_category = data.get('index_category')
+        except Exception as exc:
+            print(f"讀取交易日曆 {path} 失敗: {exc}，將重新建立")
+            return cls(path)
+        calendar._rebuild()
+        return calendar
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        data = {
+            'version': CALENDAR_VERSION,
+            'trading_days': {day.isoformat(): bars for day, bars in sorted(self.trading_days.items())},
+            'closed_days': sorted(day.isoformat() for day in self.closed_days),
+            'index_category': self.index_category,
+        }
+        # 與 kbar_store 相同，先寫暫存檔再取代
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as exc:
+            print(f"寫入交易日曆 {self.path} 失敗: {exc}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _rebuild(self) -> None:
+        """重建前一交易日查表與典型 K 棒數；只在日曆內容變動時執行。"""
+        known = set(self.trading_days) | self.closed_days
+        self._prev = {}
+        if not known:
+            self._covered_until = None
+            return
+        first, last = min(known), max(known)
+        self._covered_until = last
+        previous = None
+        day = first
+        while day <= last + timedelta(days=1):
+            self._prev[day] = previous
+            if self.is_trading_day(day) is not False:
+                previous = day
+            day += timedelta(days=1)
+        counts = Counter(bars for bars in self.trading_days.values() if bars)
+        self._typical_bars = counts.most_common(1)[0][0] if counts else DEFAULT_BARS_PER_DAY
+
+    # --- 查詢 ---
+
+    def is_trading_day(self, day) -> Optional[bool]:
+        """True / False；尚未學習到的平日回傳 None。"""
+        day = _to_date(day)
+        if day in self.trading_days:
+            return True
+        if day in self.closed_days or day.weekday() >= 5:
+            return False
+        return None
+
+    def previous_trading_day(self, day) -> date:
+        """day 之前最近的交易日 (未知的平日視為交易日)；日曆涵蓋範圍外以平日推算。"""
+        day = _to_date(day)
+        if self._prev.get(day) is not None:
+            return self._prev[day]
+        candidate = day - timedelta(days=1)
+        while self.is_trading_day(candidate) is False:
+            candidate -= timedelta(days=1)
+        return candidate
+
+    def expected_bars(self, day) -> int:
+        """該日應有的分 K 數；休市日為 0，未記錄的日期以最常見的每日 K 棒數估計。"""
+        day = _to_date(day)
+        if self.is_trading_day(day) is False:
+            return 0
+        return self.trading_days.get(day) or self._typical_bars
+
+    # --- 學習 ---
+
+    def record_kbars(self, df: pd.DataFrame, closed_range=None, counts: bool = False) -> None:
+        """
+        從分 K 學習交易日
+
+        Args:
+            df: 以時間為索引的分 K
+            closed_range: (start, end) 日期區間；其中沒有 K 棒的平日記為休市 (僅用於 TAIEX)
+            counts: 是否記錄每日 K 棒數 (僅 TAIEX 的 K 棒數可作為 expected_bars 依據)
+        """
+        if df is not None and len(df.index):
+            index = pd.DatetimeIndex(df.index)
+            index = index[~index.isna()]
+            bars = pd.Series(1, index=index.normalize()).groupby(level=0).size()
+            for day, n in bars.items():
+                day = day.date()
+                if counts:
+                    self.trading_days[day] = int(n)
+                else:
+                    self.trading_days.setdefault(day, None)
+                self.closed_days.discard(day)
+        if closed_range is not None:
+            start, end = (_to_date(value) for value in closed_range)
+            for day in pd.bdate_range(start, end).date:
+                if day not in self.trading_days:
+                    self.closed_days.add(day)
+        self._dirty = True
+        self._rebuild()
+
+    # --- API ---
+
+    def find_index_contract(self, api, code: str = TAIEX_CODE):
+        """尋找指數合約；快取本程序的查詢結果與合約所在分類位置。"""
+        if code in self._contracts:
+            return self._contracts[code]
+        categories = list(api.Contracts.Indexs)
+        if self.index_category is not None and self.index_category < len(categories):
+            try:
+                contract = categories[self.index_category][code]
+                if contract is not None and contract.code == code:
+                    self._contracts[code] = contract
+                    return contract
+            except (KeyError, IndexError, TypeError, AttributeError):
+                pass
+        for position, category in enumerate(categories):
+            for contract in category:
+                if contract.code == code:
+                    self._contracts[code] = contract
+                    if self.index_category != position:
+                        self.index_category = position
+                        self._dirty = True
+                    return contract
+        return None
+
+    def check_market_open(self, api, day, now: datetime = None) -> bool:
+        """
+        指定日期是否開盤
+
+        日曆已知時直接回答；否則以一次 TAIEX 查詢補齊日曆最後涵蓋日之後到 day 的所有交易日。
+        已知為交易日但 K 棒數尚未記錄 (盤中查詢) 時，收盤後再查詢一次當日 K 棒數。
+        查詢失敗、找不到合約或查詢區間內沒有任何 K 棒時無法判斷，預設為開盤且不記錄。
+        """
+        day = _to_date(day)
+        now = now or (datetime.utcnow() + timedelta(hours=8))
+        day_complete = now >= datetime.combine(day, DAY_COMPLETE_TIME)
+        known = self.is_trading_day(day)
+        if known is not None:
+            if known and day_complete and self.trading_days[day] is None:
+                self._refresh_day_bars(api, day)
+            return known
+
+        if self._covered_until is not None and self._covered_until < day:
+            start = self._covered_until + timedelta(days=1)
+        else:
+            start = day - timedelta(days=HISTORY_DAYS)
+        df = self._taiex_kbars(api, start, day)
+        if df is None:
+            return True
+        if not (df.index.normalize() >= pd.Timestamp(start)).any():
+            # 空回應可能是暫時性的 API 問題或帳號無指數資料，不能據此把整段區間記為休市
+            print(f"警告：{start} ~ {day} 查無加權指數 K 棒，無法確認市場狀態，預設為開盤。")
+            return True
+
+        # day 當天在盤前查無資料不代表休市，超過確認時間仍無資料才記為休市；
+        # 盤中的 K 棒數不完整，收盤後才記錄
+        closed_end = day if now >= datetime.combine(day, CLOSED_CONFIRM_TIME) else day - timedelta(days=1)
+        on_day = df.index.normalize() == pd.Timestamp(day)
+        self.record_kbars(df if day_complete else df[~on_day], closed_range=(start, closed_end), counts=True)
+        if not day_complete:
+            self.record_kbars(df[on_day])
+        return day in self.trading_days
+
+    def _refresh_day_bars(self, api, day: date) -> None:
+        """收盤後補記盤中已學習為交易日、但尚無 K 棒數的日期"""
+        df = self._taiex_kbars(api, day, day)
+        if df is not None and len(df.index):
+            self.record_kbars(df, counts=True)
+
+    def _taiex_kbars(self, api, start: date, end: date):
+        """查詢 TAIEX 分 K 的時間索引；找不到合約或查詢失敗時回傳 None。"""
+        try:
+            taiex = self.find_index_contract(api)
+            if not taiex:
+                print("警告：無法找到加權指數(001)合約，無法確認市場狀態，預設為開盤。")
+                return None
+            kbars = api.kbars(taiex, start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'))
+            ts = list(kbars.ts) if kbars and hasattr(kbars, 'ts') else []
+            return pd.DataFrame(index=pd.to_datetime(ts))
+        except Exception as e:
+            print(f"檢查市場狀態時發生錯誤：{e}，預設為開盤。")
+            return None
@@ -2,6 +2,8 @@
 import os
 import importlib.util
 from src.validate_buy_rule import load_stock_data
+from src.analysis.analysis_context import AnalysisContext
+from src.analysis.result_cache import RuleResultCache
 from src.analysis.trend_analyzer import calculate_trend, TrendType
 
 def get_buy_rules():
@@ -20,39 +22,37 @@ def get_buy_rules():
         rules.append(rule_name)
     return rules
 
-def get_latest_result(df, rule_name, stock_id):
+def get_latest_result(df, rule_name, stock_id, context=None, cache=None):
     module_path = f'src.buyRule.{rule_name}'
     module = importlib.import_module(module_path)
+
+    # 同一檔股票的各規則共用轉折點等基礎結構 (呼叫端未提供時僅在此規則內共用)
+    if context is None:
+        context = AnalysisContext(df, stock_id)
     
-    # 根據不同的規則名稱調用不同的函數
+    # 根據不同的規則名稱調用不同的函數 (compute 延後執行，快取命中時不必計算)
+    params = ()
     if 'four_seas_dragon' in rule_name:
         check_func = getattr(module, f'check_{rule_name.replace("breakthrough_", "")}', None)
         if check_func is None:
             return 'Error: Function not found'
-        rule_df = check_func(df, [5,10,20,60], stock_id)
+        params = ([5, 10, 20, 60], stock_id)
+        compute = lambda: check_func(df, [5, 10, 20, 60], stock_id, context=context)
     elif 'diamond_cross' in rule_name:
         check_func = getattr(module, f'check_{rule_name.replace("breakthrough_", "")}', None)
         if check_func is None:
             return 'Error: Function not found'
         
-        # 鑽石劍需要轉折點數據
-        from src.baseRule.turning_point_identification import identify_turning_points
-        if 'ma5' not in df.columns:
-            df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
-        turning_points_df = identify_turning_points(df)
-        rule_df = check_func(df, turning_points_df)
+        # 鑽石劍需要轉折點數據 (取自 context)
+        compute = lambda: check_func(df, context=context)
     elif 'resistance_line' in rule_name:
         # 處理壓力線突破規則
         check_func = getattr(module, 'check_resistance_line_breakthrough', None)
         if check_func is None:
             return 'Error: Function not found'
         
-        # 壓力線突破也需要轉折點數據
-        from src.baseRule.turning_point_identification import identify_turning_points
-        if 'ma5' not in df.columns:
-            df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
-        turning_points_df = identify_turning_points(df)
-        rule_df = check_func(df, turning_points_df)
+        # 壓力線突破也需要轉折點數據 (取自 context)
+        compute = lambda: check_func(df, context=context)
     elif 'impulse_macd_buy_rule' == rule_name:
         # Impulse MACD 規則使用綜合買入檢查
         check_func = getattr(module, 'check_impulse_macd_combined_buy', None)
@@ -67,7 +67,8 @@ def get_latest_result(df, rule_name, stock_id):
             except Exception as exc:
                 return f"Error: {exc}"
 
-        rule_df = check_func(df, require_positive_histo=True)
+        params = {'require_positive_histo': True}
+        compute = lambda: check_func(df, require_positive_histo=True, context=context)
     else:
         check_func = getattr(module, f'check_{rule_name.replace("breakthrough_", "")}', None)
         # 嘗試標準命名 check_rule_name
@@ -76,7 +77,9 @@ def get_latest_result(df, rule_name, stock_id):
              
         if check_func is None:
             return 'Error: Function not found'
-        rule_df = check_func(df)
+        compute = lambda: check_func(df, context=context)
+
+    rule_df = context.rule_result(rule_name, compute, params, cache=cache)
     
     if rule_df.empty:
         return 'No data'
@@ -126,8 +129,8 @@ def get_rule_display_name(rule_name):
     }
     return name_mapping.get(rule_name, rule_name)
 
-def main():
-    stock_list_file = 'config/stklist.cfg'
+def get_stock_names(stock_list_file='config/stklist.cfg'):
+    """讀取股票清單，回傳 (股票代碼列表, {股票代碼: 名稱})"""
     stock_ids = []
     stock_names = {}
     
@@ -141,53 +144,91 @@ def main():
                 if stock_id:
                     stock_ids.append(stock_id)
                     stock_names[stock_id] = stock_name
+    return stock_ids, stock_names
+
+def summarize_stock(df, stock_id, stock_name='', rules=None, context=None, cache=None):
+    """
+    產生單一股票的匯總列 (趨勢與各規則最新一天的結果)。
+
+    validate_buy_rule 合併模式會傳入驗證時使用的 context，
+    已計算過的規則結果直接沿用，不必重新載入資料與計算。
+    """
+    if rules is None:
+        rules = get_buy_rules()
+    # 每檔股票建立一次分析上下文，趨勢與各規則共用轉折點等基礎結構
+    if context is None:
+        context = AnalysisContext(df, stock_id)
+
+    row = {
+        'StockID': stock_id,
+        'StockName': stock_name
+    }
+
+    # Calculate Trend
+    try:
+        trend_result = context.rule_result(
+            'trend_analyzer',
+            lambda: calculate_trend(df, stock_id, context=context),
+            params=(stock_id,),
+            cache=cache,
+        )
+        row['Trend'] = trend_result.status.value
+        # row['TrendDetail'] = trend_result.details # Optional: Add details if needed
+        print(f"  Trend: {trend_result.status.value}")
+    except Exception as e:
+        print(f"  Trend Calculation Error: {e}")
+        row['Trend'] = 'Error'
+    
+    for rule in rules:
+        try:
+            result = get_latest_result(df, rule, stock_id, context=context, cache=cache)
+            
+            # Check for dictionary result (multiple columns)
+            if isinstance(result, dict):
+                for col_name, val in result.items():
+                    rule_display_name = get_rule_display_name(col_name)
+                    row[rule_display_name] = val
+                    print(f"  {rule_display_name}: {val}")
+            else:
+                rule_display_name = get_rule_display_name(rule)
+                row[rule_display_name] = result
+                print(f"  {rule_display_name}: {result}")
+        except Exception as e:
+            print(f"  {rule} 處理錯誤: {e}")
+            row[get_rule_display_name(rule)] = 'Error'
+    return row
+
+def main(summary_rows=None):
+    """
+    匯總所有股票的買入規則結果並輸出 output/buy_rules_summary.csv。
+
+    summary_rows: 合併模式下 run_validate_buy_rules 已產生的 {stock_id: 匯總列}，
+        有結果的股票不再重新載入與計算
+    """
+    stock_ids, stock_names = get_stock_names()
     
     rules = get_buy_rules()
     print(f"找到的買入規則: {rules}")
+    cache = RuleResultCache()
     
     summary_data = []
     
     for i, stock_id in enumerate(stock_ids):
         print(f"處理股票 {i+1}/{len(stock_ids)}: {stock_id} ({stock_names.get(stock_id, '')})")
+
+        if summary_rows is not None and summary_rows.get(stock_id) is not None:
+            row = dict(summary_rows[stock_id])
+            row['StockName'] = stock_names.get(stock_id, "")
+            summary_data.append(row)
+            print(f"  {stock_id} 沿用驗證階段結果")
+            continue
         
         df = load_stock_data(stock_id, 'D')
         if df is None:
             print(f"  無法載入 {stock_id} 的數據，跳過")
             continue
         
-        row = {
-            'StockID': stock_id,
-            'StockName': stock_names.get(stock_id, "")
-        }
-        
-        # Calculate Trend
-        try:
-            trend_result = calculate_trend(df, stock_id)
-            row['Trend'] = trend_result.status.value
-            # row['TrendDetail'] = trend_result.details # Optional: Add details if needed
-            print(f"  Trend: {trend_result.status.value}")
-        except Exception as e:
-            print(f"  Trend Calculation Error: {e}")
-            row['Trend'] = 'Error'
-        
-        for rule in rules:
-            try:
-                result = get_latest_result(df, rule, stock_id)
-                
-                # Check for dictionary result (multiple columns)
-                if isinstance(result, dict):
-                    for col_name, val in result.items():
-                        rule_display_name = get_rule_display_name(col_name)
-                        row[rule_display_name] = val
-                        print(f"  {rule_display_name}: {val}")
-                else:
-                    rule_display_name = get_rule_display_name(rule)
-                    row[rule_display_name] = result
-                    print(f"  {rule_display_name}: {result}")
-            except Exception as e:
-                print(f"  {rule} 處理錯誤: {e}")
-                row[get_rule_display_name(rule)] = 'Error'
-        
+        row = summarize_stock(df, stock_id, stock_names.get(stock_id, ""), rules, cache=cache)
         summary_data.append(row)
         print(f"  {stock_id} 處理完成")
         print("-" * 50)
@@ -239,6 +280,11 @@ def main():
     
     print(f'\n匯總結果已保存至: {output_path}')
     print(f'共處理 {len(summary_data)} 支股票')
+    if cache.enabled:
+        removed = cache.evict()
+        if cache.hits or cache.misses:
+            print(f'規則快取命中 {cache.hits} 次、重新計算 {cache.misses} 次')
+        print(f'規則快取淘汰 {removed} 個過期項目')
     
     # 統計各規則的觸發情況
     print("\n=== 各規則觸發統計 ===")
@@ -6,11 +6,11 @@ import mplfinance as mpf
 import numpy as np
 import pandas as pd
 
-from src.data_initial.calculate_impulse_macd import calculate_impulse_macd
-from src.data_initial.calculate_kd import calculate_kd
-from src.data_initial.calculate_macd import calculate_macd
-from src.data_initial.calculate_ma import calculate_ma
+from src.analysis.analysis_context import AnalysisContext
+from src.analysis.result_cache import RuleResultCache
+from src.data_initial.indicator_engine import append_indicators, indicator_columns
 from src.data_initial.kbar_downloader import process_kbars
+from src.data_initial.kbar_store import kbar_exists, kbar_path, read_kbar, write_kbar
 plt.rcParams['font.family'] = 'sans-serif'
 plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
@@ -50,40 +50,24 @@ def _append_indicators_inline(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
 
-    # 如果 ma5 已存在，視為已附加過主要指標，直接返回
+    # 如果 ma5 已存在且完整，視為已附加過主要指標，直接返回
     if 'ma5' in df.columns:
-        return df
-
-    kd_df = calculate_kd(df.copy())
-    macd_df = calculate_macd(df.copy())
-    ma_df = calculate_ma(df.copy())
-    impulse_df = calculate_impulse_macd(df.copy())
+        if df['ma5'].notna().all():
+            return df
+        # 增量模式下新 K 棒的指標尚未計算，移除舊指標欄位後整批重算
+        df = df.drop(columns=[col for col in indicator_columns() if col in df.columns])
 
-    for col in ['RSV', '%K', '%D']:
-        if col in kd_df.columns:
-            kd_df[col] = kd_df[col].round(2)
-    for col in ['MACD', 'Signal', 'Histogram']:
-        if col in macd_df.columns:
-            macd_df[col] = macd_df[col].round(2)
-    for col in ma_df.columns:
-        ma_df[col] = ma_df[col].round(2)
-    for col in impulse_df.columns:
-        impulse_df[col] = impulse_df[col].round(2)
-
-    merged = pd.concat([df, kd_df, macd_df, ma_df, impulse_df], axis=1)
-    # 去除重複欄位，保留首個出現的基礎欄位
-    merged = _dedup_columns(merged)
-    return merged
+    # 單次計算所有指標；df 已有的同名欄位保留原值
+    return append_indicators(df)
 
 
 def _rebuild_from_raw(stock_id: str):
     """若 D/W 不存在且有 Raw，從 Raw 重建後回傳 (daily, weekly)。"""
-    raw_path = f'Data/kbar/{stock_id}_Raw.csv'
-    if not os.path.exists(raw_path):
+    if not kbar_exists(stock_id, 'Raw'):
         return None, None
 
     try:
-        raw_df = pd.read_csv(raw_path, index_col='ts', parse_dates=True)
+        raw_df = read_kbar(stock_id, 'Raw')
         column_mapping = {
             '開盤價': 'Open',
             '最高價': 'High',
@@ -100,25 +84,20 @@ def _rebuild_from_raw(stock_id: str):
 
     daily_k, weekly_k = process_kbars(raw_df)
     if daily_k is not None:
-        daily_k.index.name = 'ts'
-        daily_path = f'Data/kbar/{stock_id}_D.csv'
-        daily_k.to_csv(daily_path)
+        daily_path = write_kbar(daily_k, stock_id, 'D')
         print(f"  已重建日線: {daily_path}")
     if weekly_k is not None:
-        weekly_k.index.name = 'ts'
-        weekly_path = f'Data/kbar/{stock_id}_W.csv'
-        weekly_k.to_csv(weekly_path)
+        weekly_path = write_kbar(weekly_k, stock_id, 'W')
         print(f"  已重建週線: {weekly_path}")
     return daily_k, weekly_k
 
 
 def load_stock_data(stock_id, data_type='D'):
     """載入股票數據；若 D/W 缺少且有 Raw，會先自動重建。"""
-    file_path = f'Data/kbar/{stock_id}_{data_type}.csv'
     df = None
 
-    if not os.path.exists(file_path):
-        print(f"找不到文件: {file_path}")
+    if not kbar_exists(stock_id, data_type):
+        print(f"找不到文件: {kbar_path(stock_id, data_type)}")
         daily_k, weekly_k = _rebuild_from_raw(stock_id)
         if data_type == 'D':
             df = daily_k
@@ -128,7 +107,7 @@ def load_stock_data(stock_id, data_type='D'):
             return None
     else:
         try:
-            df = pd.read_csv(file_path, index_col='ts', parse_dates=True)
+            df = read_kbar(stock_id, data_type)
         except Exception as e:
             print(f"載入數據時發生錯誤: {e}")
             return None
@@ -443,8 +422,19 @@ def get_stock_list(file_path='config/stklist.cfg'):
         print(f"讀取股票列表時發生錯誤: {e}")
     return stock_list
 
-def validate_buy_rule(stock_id):
+def validate_buy_rule(stock_id, cache=None, summarize=False):
+    """
+    驗證單一股票的買入規則並輸出規則檔與 K 線圖。
+
+    cache (RuleResultCache) 未提供時依 .env 設定建立；資料與程式皆未變更的規則直接讀回快取，
+    全部命中且圖表未被改動時略過重繪。
+
+    summarize=True (合併模式) 時以本次載入的資料與規則結果產生並回傳匯總列，
+    供 summarize_buy_rules.main(summary_rows=...) 使用，不必再載入與計算一次。
+    """
     print(f"正在驗證股票 {stock_id} 的買入規則...")
+    if cache is None:
+        cache = RuleResultCache()
     
     # 載入數據
     df = load_stock_data(stock_id, 'D')
@@ -460,56 +450,43 @@ def validate_buy_rule(stock_id):
     from .buyRule.macd_golden_cross_above_zero import check_macd_golden_cross_above_zero
     from .buyRule.macd_golden_cross_above_zero_positive_histogram import check_macd_golden_cross_above_zero_positive_histogram
     from .buyRule.diamond_cross import check_diamond_cross
-    from .baseRule.turning_point_identification import check_turning_points
-    from .baseRule.wave_point_identification import check_wave_points
     from .buyRule.breakthrough_resistance_line import check_resistance_line_breakthrough
     from .buyRule.breakthrough_descending_trendline import check_descending_trendline
     from .buyRule.td_sequential_buy_rule import check_td_sequential_buy_rule
-    san_yang_rule_df = check_san_yang_kai_tai(df)
-    four_seas_dragon_rule_df = check_four_seas_dragon(df, [5, 10, 20, 60], stock_id)
-    macd_rule_df = check_macd_golden_cross_above_zero(df)
-    macd_positive_hist_rule_df = check_macd_golden_cross_above_zero_positive_histogram(df)
-    diamond_cross_rule_df = check_diamond_cross(df)
-    turning_points_rule_df = check_turning_points(df)
-
-    # 準備波段高低點資料，將轉折點資訊合併後計算波段高低點
-    df_for_wave_points = df.sort_index().copy()
-    df_for_wave_points_reset = df_for_wave_points.reset_index()
-    date_col_name = df_for_wave_points_reset.columns[0]
-    df_for_wave_points_reset[date_col_name] = pd.to_datetime(
-        df_for_wave_points_reset[date_col_name], errors='coerce'
-    )
-
-    turning_points_aligned = turning_points_rule_df.copy()
-    turning_points_aligned['date'] = pd.to_datetime(
-        turning_points_aligned['date'], errors='coerce'
+    # 轉折點 / 波段點 / 趨勢線等基礎結構由 context 計算一次，供各規則共用
+    context = AnalysisContext(df, stock_id)
+    misses_before = cache.misses
+
+    def cached(rule_name, compute, params=()):
+        # 規則名稱與 summarize_buy_rules 相同 (模組名稱)，兩邊可共用 context 與快取結果
+        return context.rule_result(rule_name, compute, params, cache=cache)
+
+    san_yang_rule_df = cached('breakthrough_san_yang_kai_tai', lambda: check_san_yang_kai_tai(df, context=context))
+    four_seas_dragon_rule_df = cached(
+        'breakthrough_four_seas_dragon',
+        lambda: check_four_seas_dragon(df, [5, 10, 20, 60], stock_id, context=context),
+        params=([5, 10, 20, 60], stock_id),
     )
-
-    df_with_turning_points = pd.merge(
-        df_for_wave_points_reset,
-        turning_points_aligned,
-        left_on=date_col_name,
-        right_on='date',
-        how='left'
+    macd_rule_df = cached('macd_golden_cross_above_zero', lambda: check_macd_golden_cross_above_zero(df, context=context))
+    macd_positive_hist_rule_df = cached(
+        'macd_golden_cross_above_zero_positive_histogram',
+        lambda: check_macd_golden_cross_above_zero_positive_histogram(df, context=context),
     )
+    turning_points_rule_df = cached('turning_point_identification', lambda: context.turning_points)
+    # 下方會改寫 date 欄位格式，複製一份避免影響 context 與快取結果
+    wave_points_rule_df = cached('wave_point_identification', lambda: context.wave_points).copy()
 
-    df_with_turning_points['turning_high_point'] = df_with_turning_points['turning_high_point'].fillna('')
-    df_with_turning_points['turning_low_point'] = df_with_turning_points['turning_low_point'].fillna('')
-    df_with_turning_points.set_index(date_col_name, inplace=True)
-
-    wave_points_rule_df = check_wave_points(df_with_turning_points)
-
-    # 將轉折點結果傳遞給鑽石叉規則，修改 check_diamond_cross 來接受 turning_points_df 參數
-    diamond_cross_rule_df = check_diamond_cross(df, turning_points_rule_df)  # 假設我們修改了函數簽名
+    diamond_cross_rule_df = cached('diamond_cross', lambda: check_diamond_cross(df, context=context))
 
     # 添加壓力線突破規則
-    resistance_breakthrough_df = check_resistance_line_breakthrough(df, turning_points_rule_df)
-    descending_trendline_df = check_descending_trendline(
-        df,
-        turning_points_df=turning_points_rule_df,
-        wave_points_df=wave_points_rule_df,
+    resistance_breakthrough_df = cached(
+        'breakthrough_resistance_line', lambda: check_resistance_line_breakthrough(df, context=context)
+    )
+    descending_trendline_df = cached(
+        'breakthrough_descending_trendline', lambda: check_descending_trendline(df, context=context)
     )
-    td_sequential_df = check_td_sequential_buy_rule(df)
+    td_sequential_df = cached('td_sequential_buy_rule', lambda: check_td_sequential_buy_rule(df, context=context))
+    all_cached = cache.enabled and cache.misses == misses_before
 
     # 合併規則結果
     rule_df = pd.merge(san_yang_rule_df, four_seas_dragon_rule_df, on='date', how='outer')
@@ -627,13 +604,22 @@ def validate_buy_rule(stock_id):
     buy_signals_dict['TD 九轉買訊'] = td_buy_dates
 
 
-    plot_candlestick_chart(
-        df,
-        stock_id,
-        buy_signals_dict,
-        turning_points_df=turning_points_rule_df,
-        wave_points_df=wave_points_rule_df
-    )
+    # 規則結果全數命中且圖表仍是上次產出的檔案時，圖表內容不會改變，略過重繪
+    chart_path = f'output/chart/{stock_id}_validation_chart.png'
+    chart_key = cache.make_key('validation_chart', context.fingerprint) if cache.enabled else None
+    chart_mtime = os.path.getmtime(chart_path) if os.path.exists(chart_path) else None
+    if all_cached and chart_mtime is not None and cache.load(chart_key) == chart_mtime:
+        print(f"圖表未變更，沿用 {chart_path}")
+    else:
+        plot_candlestick_chart(
+            df,
+            stock_id,
+            buy_signals_dict,
+            turning_points_df=turning_points_rule_df,
+            wave_points_df=wave_points_rule_df
+        )
+        if chart_key is not None and os.path.exists(chart_path):
+            cache.save(chart_key, os.path.getmtime(chart_path))
     
     # 保存規則結果
     output_dir = 'output/buy_rules'
@@ -641,6 +627,81 @@ def validate_buy_rule(stock_id):
     rule_df.to_csv(f'{output_dir}/{stock_id}_D_Rule.csv', index=False)
     print(f'已生成規則文件: {output_dir}/{stock_id}_D_Rule.csv')
 
+    if summarize:
+        # 延遲匯入：summarize_buy_rules 於模組層級匯入本模組
+        from src.summarize_buy_rules import summarize_stock
+        return summarize_stock(df, stock_id, context=context, cache=cache)
+
+
+def _validate_buy_rule_worker(stock_id, summarize=False):
+    """子程序進入點：驗證單一股票，回傳 (stock_id, 錯誤訊息, 匯總列)；成功時錯誤訊息為 None。"""
+    # 子程序不需要互動式視窗，固定使用 Agg 後端避免 GUI 資源競爭
+    plt.switch_backend('Agg')
+    try:
+        row = validate_buy_rule(stock_id, summarize=summarize)
+        return stock_id, None, row
+    except Exception as e:
+        return stock_id, str(e), None
+
+
+def run_validate_buy_rules(stock_ids, max_workers=1, summary_rows=None):
+    """
+    驗證整份股票清單的買入規則。
+
+    Args:
+        stock_ids (list): 股票代碼列表
+        max_workers (int): 平行程序數；1 (預設) 為逐一執行，None 代表使用全部 CPU 核心
+        summary_rows (dict): 提供時啟用合併模式，驗證同時把各股票的匯總列填入
+            {stock_id: row}，交給 summarize_buy_rules.main(summary_rows=...) 輸出
+
+    Returns:
+        dict: {stock_id: 錯誤訊息}，成功處理的股票對應 None
+    """
+    results = {}
+    total = len(stock_ids)
+    if not stock_ids:
+        return results
+    summarize = summary_rows is not None
+
+    if max_workers == 1:
+        for i, stock_id in enumerate(stock_ids, 1):
+            print(f"\n處理進度: {i}/{total} - {stock_id}")
+            try:
+                row = validate_buy_rule(stock_id, summarize=summarize)
+                results[stock_id] = None
+                if row is not None:
+                    summary_rows[stock_id] = row
+            except Exception as e:
+                print(f"處理股票 {stock_id} 時發生錯誤: {e}")
+                results[stock_id] = str(e)
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_validate_buy_rule_worker, stock_id, summarize): stock_id
+            for stock_id in stock_ids
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            stock_id = futures[future]
+            row = None
+            try:
+                _, error, row = future.result()
+            except Exception as e:
+                # 子程序異常終止 (例如記憶體不足) 時仍記錄於該股票
+                error = str(e)
+            results[stock_id] = error
+            if row is not None:
+                summary_rows[stock_id] = row
+            if error is None:
+                print(f"處理進度: {i}/{total} - {stock_id} 完成")
+            else:
+                print(f"處理進度: {i}/{total} - 處理股票 {stock_id} 時發生錯誤: {error}")
+
+    # 依原始清單順序回傳，便於後續彙整
+    return {stock_id: results[stock_id] for stock_id in stock_ids}
+
 def debug_csv_structure(stock_id='00631L', data_type='D'):
     """調試CSV文件結構"""
     file_path = f'Data/kbar/{stock_id}_{data_type}.csv'
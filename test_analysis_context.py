@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AnalysisContext 共用基礎結構測試
+
+驗證傳入 context 時各買入規則結果與各自計算時一致，
+且同一檔股票的轉折點 / Supertrend 只計算一次。
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from kbar_samples import make_random_kbars
+import src.analysis.analysis_context as analysis_context
+from src.analysis.analysis_context import AnalysisContext
+from src.analysis.trend_analyzer import calculate_trend
+from src.buyRule.bottom_fractal_higher_low import check_bottom_fractal_higher_low
+from src.buyRule.breakthrough_descending_trendline import check_descending_trendline
+from src.buyRule.breakthrough_resistance_line import check_resistance_line_breakthrough
+from src.buyRule.diamond_cross import check_diamond_cross
+from src.buyRule.triple_supertrend import check_triple_supertrend
+from src.data_initial.indicator_engine import append_indicators
+from src.summarize_buy_rules import summarize_stock
+
+
+def _make_kbars(n: int = 400, seed: int = 0) -> pd.DataFrame:
+    return append_indicators(make_random_kbars(n, seed))
+
+
+def test_rules_with_context_match_standalone():
+    df = _make_kbars(seed=1)
+    context = AnalysisContext(df, '9999')
+
+    pairs = [
+        (check_diamond_cross(df.copy()), check_diamond_cross(df, context=context)),
+        (check_resistance_line_breakthrough(df.copy()), check_resistance_line_breakthrough(df, context=context)),
+        (check_descending_trendline(df.copy()), check_descending_trendline(df, context=context)),
+        (check_bottom_fractal_higher_low(df.copy()), check_bottom_fractal_higher_low(df, context=context)),
+        (check_triple_supertrend(df.copy()), check_triple_supertrend(df, context=context)),
+    ]
+    for expected, actual in pairs:
+        pd.testing.assert_frame_equal(actual, expected)
+
+    assert calculate_trend(df, '9999', context=context) == calculate_trend(df.copy(), '9999')
+
+
+def test_base_structures_computed_once(monkeypatch):
+    calls = {'turning_points': 0, 'supertrend': 0}
+    original_turning_points = analysis_context.identify_turning_points
+    original_supertrends = analysis_context.calculate_supertrends
+
+    def counting_turning_points(*args, **kwargs):
+        calls['turning_points'] += 1
+        return original_turning_points(*args, **kwargs)
+
+    def counting_supertrends(df, params):
+        # 以計算的參數組數計次，批次計算三組 Supertrend 算 3 次
+        calls['supertrend'] += len(params)
+        return original_supertrends(df, params)
+
+    monkeypatch.setattr(analysis_context, 'identify_turning_points', counting_turning_points)
+    monkeypatch.setattr(analysis_context, 'calculate_supertrends', counting_supertrends)
+
+    df = _make_kbars(seed=2)
+    context = AnalysisContext(df)
+    for _ in range(2):
+        check_diamond_cross(df, context=context)
+        check_resistance_line_breakthrough(df, context=context)
+        check_descending_trendline(df, context=context)
+        check_bottom_fractal_higher_low(df, context=context)
+        check_triple_supertrend(df, context=context)
+        calculate_trend(df, context=context)
+
+    assert calls == {'turning_points': 1, 'supertrend': 3}
+
+
+def test_summary_row_reuses_validation_results():
+    df = _make_kbars(seed=3)
+    context = AnalysisContext(df, '9999')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return check_diamond_cross(df, context=context)
+
+    # 驗證階段已計算的規則結果，匯總時不再重算
+    context.rule_result('diamond_cross', compute)
+    context.rule_result('diamond_cross', compute)
+    assert len(calls) == 1
+
+    expected = summarize_stock(df.copy(), '9999')
+    assert summarize_stock(df, '9999', context=context) == expected
+    assert list(expected)[:3] == ['StockID', 'StockName', 'Trend']
@@ -153,6 +153,41 @@ def run_break_base_case():
     print("✅ 通過：未標記信號")
 
 
+def test_identify_bottom_fractals_window_and_context():
+    """分型在右窗口末日確立，並依最近轉折點過濾"""
+    dates = pd.date_range("2024-03-01", periods=5, freq="D")
+    df = pd.DataFrame(
+        {
+            "Open": [10.0, 10.0, 9.2, 9.0, 10.6],
+            "High": [11.0, 10.5, 9.8, 10.8, 11.0],
+            "Low": [9.5, 9.0, 8.5, 8.8, 10.2],
+            "Close": [10.0, 9.2, 9.0, 10.6, 10.8],
+        },
+        index=dates,
+    )
+    result = identify_bottom_fractals(df, left=2, right=2)
+    assert result["bottom_fractal"].tolist() == ["", "", "", "O", ""]
+    signal_row = result.iloc[3]
+    assert signal_row["fractal_low"] == 8.5
+    assert signal_row["fractal_low_date"] == "2024-03-03"
+    assert signal_row["fractal_left_date"] == "2024-03-02"
+    assert signal_row["fractal_right_date"] == "2024-03-04"
+
+    def marks(tp_date, tp_type):
+        turning_points_df = pd.DataFrame([{
+            "date": tp_date,
+            "turning_high_point": "O" if tp_type == "high" else "",
+            "turning_low_point": "O" if tp_type == "low" else "",
+        }])
+        return identify_bottom_fractals(df, turning_points_df=turning_points_df)["bottom_fractal"].eq("O").sum()
+
+    # 最近為轉折高點：分型低點不早於高點才標記；最近為轉折低點：分型低點需就是該低點
+    assert marks("2024-03-01", "high") == 1
+    assert marks("2024-03-04", "high") == 0
+    assert marks("2024-03-02", "low") == 0
+    assert marks("2024-03-03", "low") == 1
+
+
 def run_real_data(stock_id: str, days: int, left: int, right: int, tol: float):
     print(f"\n=== 實際資料模式：{stock_id} (最近 {days} 天) ===")
     df = load_stock_data(stock_id, "D")
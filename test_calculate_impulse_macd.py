@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Impulse MACD 計算模組等價性測試
+
+以 v1.0 逐筆 .iloc 寫法作為參考實作，驗證 ndarray 版本的
+calc_smma / calculate_impulse_macd 輸出完全一致 (含 NaN 位置)。
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.data_initial.calculate_impulse_macd import (
+    calc_smma,
+    calc_zlema,
+    calculate_impulse_macd,
+)
+
+
+def _reference_smma(src: pd.Series, length: int) -> pd.Series:
+    """v1.0 參考實作"""
+    smma = pd.Series(index=src.index, dtype=float)
+    if len(src) < length:
+        return smma
+    smma.iloc[length - 1] = src.iloc[:length].mean()
+    for i in range(length, len(src)):
+        smma.iloc[i] = (smma.iloc[i - 1] * (length - 1) + src.iloc[i]) / length
+    return smma
+
+
+def _reference_impulse_macd(df: pd.DataFrame, length_ma: int = 34, length_signal: int = 9) -> pd.DataFrame:
+    """v1.0 參考實作"""
+    df = df.copy()
+    src = (df['High'] + df['Low'] + df['Close']) / 3
+    hi = _reference_smma(df['High'], length_ma)
+    lo = _reference_smma(df['Low'], length_ma)
+    mi = calc_zlema(src, length_ma)
+
+    impulse_macd = pd.Series(index=df.index, dtype=float)
+    for i in range(len(df)):
+        if pd.notna(mi.iloc[i]) and pd.notna(hi.iloc[i]) and pd.notna(lo.iloc[i]):
+            mi_val = mi.iloc[i]
+            hi_val = hi.iloc[i]
+            lo_val = lo.iloc[i]
+            if mi_val > hi_val:
+                impulse_macd.iloc[i] = mi_val - hi_val
+            elif mi_val < lo_val:
+                impulse_macd.iloc[i] = mi_val - lo_val
+            else:
+                impulse_macd.iloc[i] = 0.0
+        else:
+            impulse_macd.iloc[i] = np.nan
+
+    impulse_signal = impulse_macd.rolling(window=length_signal).mean()
+    impulse_histogram = impulse_macd - impulse_signal
+    df['ImpulseMACD'] = impulse_macd.round(2)
+    df['ImpulseSignal'] = impulse_signal.round(2)
+    df['ImpulseHistogram'] = impulse_histogram.round(2)
+    return df
+
+
+def _build_sample_dataframe(n: int = 2500, seed: int = 7) -> pd.DataFrame:
+    """隨機漫步樣本 (約 10 年日線)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-05', periods=n)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, n))
+    high = close + np.abs(rng.normal(0, 1, n))
+    low = close - np.abs(rng.normal(0, 1, n))
+    return pd.DataFrame({'High': high, 'Low': low, 'Close': close}, index=dates)
+
+
+def test_calc_smma_matches_reference():
+    df = _build_sample_dataframe()
+    for length in (1, 3, 34):
+        expected = _reference_smma(df['High'], length)
+        actual = calc_smma(df['High'], length)
+        pd.testing.assert_series_equal(actual, expected, check_exact=True)
+
+
+def test_calc_smma_short_and_nan_input():
+    df = _build_sample_dataframe(n=40)
+    # 長度不足時全為 NaN
+    pd.testing.assert_series_equal(
+        calc_smma(df['High'].head(10), 34), _reference_smma(df['High'].head(10), 34), check_exact=True
+    )
+    # 中間有 NaN 時的傳遞行為一致
+    high = df['High'].copy()
+    high.iloc[5] = np.nan
+    high.iloc[36] = np.nan
+    pd.testing.assert_series_equal(calc_smma(high, 34), _reference_smma(high, 34), check_exact=True)
+
+
+def test_calculate_impulse_macd_matches_reference():
+    df = _build_sample_dataframe()
+    expected = _reference_impulse_macd(df)
+    actual = calculate_impulse_macd(df)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+
+def main():
+    df = _build_sample_dataframe()
+
+    start = time.perf_counter()
+    expected = _reference_impulse_macd(df)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = calculate_impulse_macd(df)
+    vectorized_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    test_calc_smma_matches_reference()
+    test_calc_smma_short_and_nan_input()
+
+    print(f"✓ 輸出完全一致 ({len(df)} 筆)")
+    print(f"  參考實作: {reference_seconds * 1000:.1f} ms")
+    print(f"  新版實作: {vectorized_seconds * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
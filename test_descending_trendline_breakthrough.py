@@ -505,6 +505,55 @@ def descending_trendline_test(stock_id='00631L', days=360):
         return False
 
 
+def test_fast_line_check_matches_bar_by_bar():
+    """稀疏表剪枝的有效性驗證需與逐根檢查結果一致（含剛好貼齊誤差邊界的趨勢線）"""
+    from src.buyRule.long_term_descending_trendline import (
+        _RangeMax,
+        _line_clears_highs,
+        _segment_respects_line,
+    )
+
+    rng = np.random.default_rng(0)
+    highs = np.round(200 - 0.05 * np.arange(800) + np.abs(rng.normal(0, 3, 800)), 2)
+    highs[rng.integers(0, 800, 10)] = np.nan
+    df = pd.DataFrame({'High': highs})
+    range_max = _RangeMax(highs)
+
+    for _ in range(2000):
+        start_idx, end_idx = sorted(rng.integers(0, 800, 2))
+        slope = -abs(rng.normal(0, 0.1))
+        tolerance_pct = float(rng.choice([0.0, 0.1, 0.5]))
+        # 讓趨勢線通過區間內某根 K 線的最高價 + 誤差，測試邊界情況
+        touch = int(rng.integers(start_idx, end_idx + 1))
+        if np.isnan(highs[touch]):
+            continue
+        intercept = highs[touch] / (1 + tolerance_pct / 100.0) - slope * touch
+        intercept += float(rng.choice([0.0, 1e-12, -1e-12, 0.5, -0.5]))
+        expected = _segment_respects_line(df, start_idx, end_idx, slope, intercept, tolerance_pct)
+        actual = _line_clears_highs(highs, range_max, start_idx, end_idx, slope, intercept, tolerance_pct)
+        assert actual == expected
+
+
+def test_breakthrough_one_signal_per_line():
+    """同一根 K 線多條線突破時水平壓力線優先，已發出信號的線 (含相同 key 的重複線) 不再觸發"""
+    from src.buyRule.breakthrough_descending_trendline import check_breakthrough_descending_trendline
+
+    df = pd.DataFrame(
+        {'Close': [10.0, 10.0, 12.0, 9.0, 12.0, 9.0, 12.0], 'Volume': [1000] * 7},
+        index=pd.bdate_range('2024-01-02', periods=7),
+    )
+    horizontal = {'type': 'horizontal_resistance', 'start_idx': 0, 'end_idx': 6, 'slope': 0.0, 'intercept': 11.0}
+    diagonal = {'type': 'diagonal_descending', 'start_idx': 0, 'end_idx': 1, 'slope': 0.0, 'intercept': 11.5}
+    result = check_breakthrough_descending_trendline(
+        df, {'all_lines': [diagonal, horizontal, dict(horizontal)]}
+    )
+
+    assert result['breakthrough_check'].tolist() == ['', '', 'O', '', 'O', '', '']
+    assert result['breakthrough_type'].tolist()[2] == 'horizontal_resistance'
+    assert result['breakthrough_type'].tolist()[4] == 'diagonal_descending'
+    assert result['trendline_price'].tolist()[4] == 11.5
+
+
 def main():
     """主程式"""
     print("收盤站上下降趨勢線買入規則測試程式（規格書版本）")
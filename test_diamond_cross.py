@@ -189,6 +189,36 @@ def _run_test(stock_id: Optional[str] = None, days: int = 180) -> Tuple[pd.DataF
     return result_df, hits
 
 
+def test_breakout_above_high_before_golden_cross() -> None:
+    """第 6 根 ma20 上穿 ma60，第 7 根收盤突破交叉前轉折高點 14"""
+    dates = pd.bdate_range("2024-01-01", periods=8)
+    df = pd.DataFrame(
+        {
+            "High": [10, 14, 12, 11, 12, 13, 15, 16],
+            "Low": 9,
+            "Close": [9, 13, 11, 10, 11, 12, 14.5, 15.5],
+            "ma5": 1.0,
+            "ma20": [1, 1, 1, 1, 2, 3, 3, 3],
+            "ma60": 2,
+        },
+        index=dates,
+    )
+    turning_points_df = pd.DataFrame(
+        {
+            "date": dates.strftime("%Y-%m-%d"),
+            "turning_high_point": ["", "O", "", "", "", "", "", ""],
+            "turning_low_point": "",
+        }
+    )
+
+    result = check_diamond_cross(df, turning_points_df)
+    assert result["diamond_cross_check"].tolist() == ["", "", "", "", "", "", "O", ""]
+
+    # 使用傳入的轉折點，無轉折高點時不觸發
+    turning_points_df["turning_high_point"] = ""
+    assert (check_diamond_cross(df, turning_points_df)["diamond_cross_check"] == "").all()
+
+
 def main() -> None:
     print("鑽石叉 (diamond_cross) 測試工具")
     print("=" * 50)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技術指標增量計算測試
+
+驗證 indicator_state 的逐筆遞推與 indicator_engine 全量計算位元一致，
+並模擬 kbar_collector 追加 / 改寫 K 棒後 append_indicator 的增量流程。
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from kbar_samples import make_random_kbars
+from src.data_initial.append_indicator import append_indicators_to_csv
+from src.data_initial.indicator_engine import append_indicators, compute_indicators
+from src.data_initial.indicator_state import (
+    COLUMNS,
+    IndicatorState,
+    carry_over_indicators,
+    load_state,
+    save_state,
+    state_path,
+    update_indicators,
+)
+from src.data_initial.kbar_store import read_kbar, write_kbar
+
+
+def _make_kbars(n: int = 600, seed: int = 0) -> pd.DataFrame:
+    df = make_random_kbars(n, seed)
+    # 平盤與連續相同價格，檢查 RSV 與滾動平均的邊界處理
+    df.iloc[100:130, :4] = 50.0
+    return df
+
+
+def test_stream_matches_engine():
+    df = _make_kbars()
+    expected = compute_indicators(df, round_digits=None)[list(COLUMNS)].to_numpy()
+    actual = IndicatorState().advance(df['High'], df['Low'], df['Close'], df.index)
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+def test_state_roundtrip_continues_exactly():
+    df = _make_kbars(seed=1)
+    state = IndicatorState()
+    state.advance(df['High'].iloc[:400], df['Low'].iloc[:400], df['Close'].iloc[:400], df.index[:400])
+    restored = IndicatorState.from_dict(state.to_dict())
+    rest = df.iloc[400:]
+    actual = restored.advance(rest['High'], rest['Low'], rest['Close'], rest.index)
+    expected = compute_indicators(df, round_digits=None)[list(COLUMNS)].to_numpy()[400:]
+    assert np.array_equal(actual, expected, equal_nan=True)
+
+
+def test_update_indicators_after_new_and_revised_bars():
+    full = _make_kbars(seed=2)
+    old = full.iloc[:590].copy()
+    # 舊檔最後一根為盤中 K 棒，之後被改寫
+    old.iloc[-1, old.columns.get_loc('Close')] += 0.5
+    old_with_ind = compute_indicators(old).pipe(lambda ind: pd.concat([old, ind], axis=1))
+    state = IndicatorState.from_history(old_with_ind)
+
+    carried = carry_over_indicators(full, old_with_ind)
+    assert carried['ma5'].iloc[:589].notna().all()
+    assert carried['ma5'].iloc[589:].isna().all()
+
+    result = update_indicators(carried, IndicatorState.from_dict(state.to_dict()))
+    assert result is not None
+    updated, new_state, n_rows = result
+    assert n_rows == 11
+    expected = pd.concat([full, compute_indicators(full)], axis=1)
+    pd.testing.assert_frame_equal(updated, expected, check_exact=True)
+    assert new_state.ts == full.index[-2].isoformat()
+
+
+def test_update_indicators_rejects_revised_history():
+    full = _make_kbars(seed=3)
+    old = pd.concat([full.iloc[:590], compute_indicators(full.iloc[:590])], axis=1)
+    state = IndicatorState.from_history(old)
+
+    revised = old.copy()
+    revised.iloc[585, revised.columns.get_loc('High')] += 1.0
+    assert update_indicators(revised, state) is None
+
+
+def test_append_indicators_incremental_files():
+    full = _make_kbars(seed=4)
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_kbar(full.iloc[:580].copy(), '9999', 'D', data_dir, fmt='csv')
+        append_indicators_to_csv(data_dir, data_dir, incremental=True)
+        assert load_state(state_path('9999', 'D', data_dir)) is not None
+
+        # 模擬 kbar_collector 以 Raw 重建日線並保留舊指標欄位
+        old = read_kbar('9999', 'D', data_dir)
+        write_kbar(carry_over_indicators(full.copy(), old), '9999', 'D', data_dir, fmt='csv')
+        append_indicators_to_csv(data_dir, data_dir, incremental=True)
+        incremental = read_kbar('9999', 'D', data_dir)
+
+        write_kbar(full.copy(), '9999', 'D', data_dir, fmt='csv')
+        append_indicators_to_csv(data_dir, data_dir, incremental=False)
+        recomputed = read_kbar('9999', 'D', data_dir)
+
+    pd.testing.assert_frame_equal(incremental, recomputed, check_exact=True)
+
+
+def test_update_indicators_over_several_chunks():
+    full = _make_kbars(seed=5)
+    df = append_indicators(full.iloc[:300].copy())
+    state = IndicatorState.from_history(df)
+
+    # 每次追加不同長度的新 K 棒 (含單根)，結果須與 append_indicators 全量計算相同
+    for end in (301, 308, 340, 341, 420, 600):
+        new_rows = pd.DataFrame(np.nan, index=full.index[len(df):end], columns=df.columns)
+        new_rows[full.columns] = full.iloc[len(df):end]
+        result = update_indicators(pd.concat([df, new_rows]), state)
+        assert result is not None
+        df, state, _ = result
+        expected = append_indicators(full.iloc[:end].copy())
+        pd.testing.assert_frame_equal(df, expected, check_exact=True)
+
+
+def test_state_from_other_pandas_version_is_ignored():
+    df = append_indicators(_make_kbars(n=100, seed=6))
+    with tempfile.TemporaryDirectory() as data_dir:
+        path = state_path('9999', 'D', data_dir)
+        save_state(IndicatorState.from_history(df), path)
+        assert load_state(path) is not None
+
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['pandas_version'] = '0.0.0'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        assert load_state(path) is None
+
+
+def main():
+    df = _make_kbars(n=2500)
+    with_ind = pd.concat([df.iloc[:-1], compute_indicators(df.iloc[:-1])], axis=1)
+    state = IndicatorState.from_history(with_ind)
+    target = pd.concat([df, pd.DataFrame(np.nan, index=df.index, columns=list(COLUMNS))], axis=1)
+    target.iloc[:-1, -len(COLUMNS):] = with_ind[list(COLUMNS)].to_numpy()
+
+    start = time.perf_counter()
+    for _ in range(20):
+        compute_indicators(df)
+    full_ms = (time.perf_counter() - start) / 20 * 1000
+
+    start = time.perf_counter()
+    for _ in range(20):
+        update_indicators(target, IndicatorState.from_dict(state.to_dict()))
+    incremental_ms = (time.perf_counter() - start) / 20 * 1000
+
+    print(f"全量計算 {len(df)} 筆: {full_ms:.2f} ms")
+    print(f"增量計算 1 筆: {incremental_ms:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K 線並行抓取排程測試
+
+使用 FakeShioaji 離線驗證 kbar_fetcher 的並行數、每秒請求數限制與失敗處理，
+以及 kbar_collector 透過共用 session 並行抓取後的存檔流程。
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from fake_shioaji import FakeShioaji
+from src.data_initial.kbar_collector import collect_and_save_kbars
+from src.data_initial.kbar_downloader import get_stock_kbars
+from src.data_initial.kbar_fetcher import FetchJob, fetch_kbars_concurrently
+from src.data_initial.kbar_store import read_kbar
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 5)
+
+
+def _jobs(stock_ids):
+    return [FetchJob(stock_id, START, END) for stock_id in stock_ids]
+
+
+def test_requests_run_concurrently_on_one_session():
+    api = FakeShioaji(latency=0.2)
+    stock_ids = ['2330', '2317', '0050', '2454', '2603', '1101']
+
+    results = dict(
+        (job.stock_id, df)
+        for job, df in fetch_kbars_concurrently(api, _jobs(stock_ids), max_workers=3, requests_per_second=0)
+    )
+
+    assert set(results) == set(stock_ids)
+    assert api.max_in_flight == 3
+    assert all(len(df) == 5 * 270 for df in results.values())
+    # 相同區間重複請求得到相同資料
+    again = next(fetch_kbars_concurrently(api, _jobs(['2330']), max_workers=1, requests_per_second=0))[1]
+    assert again.equals(results['2330'])
+
+
+def test_requests_per_second_limit():
+    api = FakeShioaji()
+    list(fetch_kbars_concurrently(api, _jobs([str(i) for i in range(6)]), max_workers=6, requests_per_second=10))
+
+    # 第 k 次請求至少在第一次之後 k 個間隔才開始 (保留 10% 容許執行緒喚醒誤差)，連發會被抓到
+    starts = np.sort([call[3] for call in api.calls])
+    for k in range(1, len(starts)):
+        assert starts[k] - starts[0] >= k * 0.1 * 0.9
+
+
+def test_failed_fetch_yields_none():
+    api = FakeShioaji(missing={'9999'})
+    fetch = partial(get_stock_kbars, max_retries=1)
+    results = dict(
+        (job.stock_id, df)
+        for job, df in fetch_kbars_concurrently(api, _jobs(['2330', '9999']), max_workers=2,
+                                                requests_per_second=0, fetch=fetch)
+    )
+    assert results['9999'] is None
+    assert not results['2330'].empty
+
+
+def test_collect_and_save_kbars_with_fake_api():
+    api = FakeShioaji(latency=0.05)
+    with tempfile.TemporaryDirectory() as tmp:
+        stk_list_path = os.path.join(tmp, 'StkList.cfg')
+        with open(stk_list_path, 'w', encoding='utf-8') as f:
+            f.write('Stock ID, 中文名稱\n2330, 台積電\n2317, 鴻海\n')
+        data_dir = os.path.join(tmp, 'kbar')
+
+        collect_and_save_kbars(api=api, stk_list_path=stk_list_path, data_output_dir=data_dir,
+                               max_workers=2, requests_per_second=0)
+
+        assert api.max_in_flight == 2
+        for stock_id in ('2330', '2317'):
+            daily_k = read_kbar(stock_id, 'D', data_dir)
+            assert daily_k is not None and not daily_k.empty
+            assert read_kbar(stock_id, 'W', data_dir) is not None
+
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K 線儲存測試 (摘要側檔與 Raw 月分區)
+
+驗證 write_kbar 同步更新 {檔名}.meta.json，read_kbar_summary 在側檔有效時不解析資料檔，
+側檔過期或遺失時退回完整讀取，以及 kbar_collector 以摘要判斷收盤 K 棒是否已存在；
+並驗證 Raw 月分區只改寫涉及的月份，增量重算的日K / 週K 與全量重算一致。
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, time
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import src.data_initial.kbar_store as kbar_store
+from src.data_initial.kbar_collector import _get_last_raw_timestamp, _save_fetched_kbars, has_latest_closing_bar
+from src.data_initial.kbar_downloader import process_kbars
+from src.data_initial.kbar_store import (
+    append_raw,
+    find_raw,
+    list_kbar_stock_ids,
+    meta_path,
+    raw_dir,
+    read_kbar,
+    read_kbar_summary,
+    write_kbar,
+)
+
+
+def _make_raw(days):
+    index = pd.DatetimeIndex(
+        [ts for day in days for ts in pd.date_range(f"{day} 09:01", f"{day} 13:30", freq='min')],
+        name='ts',
+    )
+    return pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 1}, index=index)
+
+
+def _no_full_read(path):
+    raise AssertionError(f"不應完整讀取 {path}")
+
+
+def test_summary_from_sidecar_without_parsing(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_kbar(_make_raw(['2024-01-02', '2024-01-03']), '2330', 'Raw', tmp, fmt='csv')
+        assert os.path.exists(meta_path(path))
+
+        monkeypatch.setattr(kbar_store, 'read_kbar_file', _no_full_read)
+        summary = read_kbar_summary(path)
+        assert summary.rows == 2 * 270
+        assert summary.first_ts == pd.Timestamp('2024-01-02 09:01')
+        assert summary.last_ts == pd.Timestamp('2024-01-03 13:30')
+        assert summary.last_day_first_ts == pd.Timestamp('2024-01-03 09:01')
+        assert summary.last_day_bars == 270
+        assert _get_last_raw_timestamp(path) == pd.Timestamp('2024-01-03 13:30')
+        assert has_latest_closing_bar(path, date(2024, 1, 3), time(13, 30))
+        assert not has_latest_closing_bar(path, date(2024, 1, 4), time(13, 30))
+
+
+def test_stale_or_missing_sidecar_falls_back_to_full_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_kbar(_make_raw(['2024-01-02']), '2330', 'Raw', tmp, fmt='csv')
+        # 不經 write_kbar 直接改寫資料檔，側檔簽章不符
+        _make_raw(['2024-01-02', '2024-01-03']).iloc[:-10].to_csv(path)
+        summary = read_kbar_summary(path)
+        assert summary.last_ts == pd.Timestamp('2024-01-03 13:20')
+        assert summary.last_day_bars == 260
+        assert not has_latest_closing_bar(path, date(2024, 1, 3), time(13, 30))
+
+        os.remove(meta_path(path))
+        assert read_kbar_summary(path).rows == 530
+        assert os.path.exists(meta_path(path))
+
+
+def test_closing_bar_check_for_earlier_trading_date():
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = _make_raw(['2024-01-02', '2024-01-03'])
+        raw = raw[~((raw.index.date == date(2024, 1, 2)) & (raw.index.hour >= 13))]
+        path = write_kbar(raw, '2330', 'Raw', tmp, fmt='csv')
+        assert not has_latest_closing_bar(path, date(2024, 1, 2), time(13, 30))
+        assert has_latest_closing_bar(path, date(2024, 1, 3), time(13, 30))
+
+
+def test_empty_file_summary():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_kbar(_make_raw([]), '2330', 'D', tmp, fmt='csv')
+        summary = read_kbar_summary(path)
+        assert summary.rows == 0 and summary.last_ts is None
+        assert _get_last_raw_timestamp(path) is None
+
+
+def _mtimes(path):
+    return {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in os.listdir(path)}
+
+
+def test_append_raw_rewrites_only_touched_months():
+    with tempfile.TemporaryDirectory() as tmp:
+        history = _make_raw(pd.bdate_range('2024-01-02', '2024-03-14').strftime('%Y-%m-%d'))
+        path = append_raw(history, '2330', tmp, fmt='csv')
+        assert sorted(f for f in os.listdir(path) if f.endswith('.csv')) == ['2024-01.csv', '2024-02.csv', '2024-03.csv']
+        before = _mtimes(path)
+
+        # 盤中改寫 3/14 並新增 3/15
+        update = _make_raw(['2024-03-14', '2024-03-15'])
+        append_raw(update, '2330', tmp, start_date=pd.Timestamp('2024-03-14'), fmt='csv')
+        after = _mtimes(path)
+        assert after['2024-01.csv'] == before['2024-01.csv']
+        assert after['2024-02.csv'] == before['2024-02.csv']
+        assert after['2024-03.csv'] != before['2024-03.csv']
+
+        raw = read_kbar('2330', 'Raw', tmp)
+        assert raw.index.is_unique and len(raw) == len(history) + 270
+        assert list_kbar_stock_ids('Raw', tmp) == ['2330']
+        assert has_latest_closing_bar(path, date(2024, 3, 15), time(13, 30))
+
+
+def test_legacy_raw_file_split_into_partitions():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = write_kbar(_make_raw(['2024-01-30', '2024-01-31']), '2330', 'Raw', tmp, fmt='csv')
+        assert find_raw('2330', tmp) == legacy
+
+        append_raw(_make_raw(['2024-02-01']), '2330', tmp, start_date=pd.Timestamp('2024-02-01'), fmt='csv')
+        assert not os.path.exists(legacy) and not os.path.exists(meta_path(legacy))
+        assert find_raw('2330', tmp) == raw_dir('2330', tmp)
+        assert len(read_kbar('2330', 'Raw', tmp)) == 3 * 270
+
+
+def test_incremental_daily_weekly_match_full_rebuild():
+    days = pd.bdate_range('2024-01-02', '2024-04-05').strftime('%Y-%m-%d')
+    full = _make_raw(days)
+    full['Close'] = range(len(full))
+    with tempfile.TemporaryDirectory() as tmp:
+        history = full[full.index < '2024-03-28']
+        _save_fetched_kbars(history, '2330', None, tmp)
+        # 3/28 (週四) 起的新資料跨月，週K 需從 3/25 (週一) 重算
+        _save_fetched_kbars(full[full.index >= '2024-03-28'], '2330', pd.Timestamp('2024-03-28'), tmp)
+
+        daily_k, weekly_k = process_kbars(full)
+        for suffix, expected in (('D', daily_k), ('W', weekly_k)):
+            actual = read_kbar('2330', suffix, tmp)
+            assert actual.index.equals(expected.index)
+            assert np.array_equal(actual[expected.columns].to_numpy(dtype=float), expected.to_numpy(dtype=float))
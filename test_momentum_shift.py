@@ -121,6 +121,26 @@ def test_momentum_shift_logic(stock_id='2330', days=120):
     print(f"✅ 測試圖表已存至: {output_path}")
     plt.close()
 
+def test_nearest_gap_boundary_matches_scan():
+    """單調堆疊找到的邊界 K 線與逐根往回掃描一致 (含 NaN 與 lookback 邊界)"""
+    from src.buyRule.momentum_shift import _nearest_index_above
+
+    rng = np.random.default_rng(0)
+    values = np.round(rng.normal(100, 5, 400), 1)
+    values[[10, 50, 51]] = np.nan
+    queries = np.round(rng.normal(100, 5, 400), 1)
+    queries[20] = np.nan
+
+    for lookback in (1, 5, 20, 1000):
+        expected = np.full(len(values), -1)
+        for i in range(len(values)):
+            for k in range(i - 1, max(0, i - lookback) - 1, -1):
+                if values[k] > queries[i]:
+                    expected[i] = k
+                    break
+        assert np.array_equal(_nearest_index_above(values, queries, lookback), expected)
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Momentum Shift 系統測試與視覺化')
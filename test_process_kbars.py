@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+process_kbars 日K / 週K 重採樣測試
+
+驗證開盤價取當日第一筆有成交量的分K，週K 以 ISO 年週分組並以該週第一個交易日為時間戳。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.data_initial.kbar_downloader import process_kbars
+
+
+def _make_minute_bars(days, per_day=4):
+    index = pd.DatetimeIndex(
+        [day + pd.Timedelta(hours=9, minutes=m) for day in days for m in range(1, per_day + 1)],
+        name='ts',
+    )
+    price = np.arange(len(index), dtype=float) + 100
+    return pd.DataFrame(
+        {'Open': price, 'High': price + 0.5, 'Low': price - 0.5, 'Close': price + 0.2, 'Volume': 10},
+        index=index,
+    )
+
+
+def test_daily_open_skips_zero_volume_bars():
+    df = _make_minute_bars(pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04']))
+    df.iloc[0:2, df.columns.get_loc('Volume')] = 0   # 1/2 前兩筆無成交
+    df.iloc[4:8, df.columns.get_loc('Volume')] = 0   # 1/3 整天無成交
+
+    daily_k, _ = process_kbars(df)
+
+    assert list(daily_k.columns) == ['Open', 'High', 'Low', 'Close', 'Volume']
+    assert daily_k.index.strftime('%Y-%m-%d').tolist() == ['2024-01-02', '2024-01-04']
+    assert daily_k['Open'].tolist() == [102.0, 108.0]
+    assert daily_k['Close'].tolist() == [103.2, 111.2]
+    assert daily_k['Volume'].tolist() == [20, 40]
+
+
+def test_weekly_bars_grouped_by_iso_week_across_year_end():
+    # 2024-12-31 與 2025-01-02 同屬 ISO 2025 年第 1 週，1/1 休市
+    days = pd.to_datetime(['2024-12-27', '2024-12-31', '2025-01-02', '2025-01-03', '2025-01-06'])
+    daily_k, weekly_k = process_kbars(_make_minute_bars(days, per_day=2))
+
+    assert weekly_k.index.strftime('%Y-%m-%d').tolist() == ['2024-12-27', '2024-12-31', '2025-01-06']
+    week = weekly_k.loc['2024-12-31']
+    assert week['Open'] == daily_k.loc['2024-12-31', 'Open']
+    assert week['Close'] == daily_k.loc['2025-01-03', 'Close']
+    assert week['High'] == daily_k.loc['2024-12-31':'2025-01-03', 'High'].max()
+    assert week['Low'] == daily_k.loc['2024-12-31', 'Low']
+    assert week['Volume'] == 60.0
@@ -528,6 +528,33 @@ def create_simple_chart(stock_id, recent_df, turning_points_df, resistance_resul
         traceback.print_exc()
 
 
+def test_breakthrough_on_slope_and_horizontal_lines():
+    """最近兩個轉折高點連線與最近轉折高點水平線的向上穿越"""
+    dates = pd.bdate_range('2024-01-01', periods=8)
+    df = pd.DataFrame({
+        'High': [10, 20, 12, 16, 11, 11, 13, 17.5],
+        'Low': [8, 17, 10, 14, 9, 9, 11, 14],
+        'Close': [9, 18, 11, 15, 10, 10, 12.5, 17],
+    }, index=dates)
+    turning_points_df = pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'turning_high_point': ['', 'O', '', 'O', '', '', '', ''],
+        'turning_low_point': '',
+    })
+
+    result = check_resistance_line_breakthrough(df, turning_points_df)
+    # 第 6 根突破下降切線 (20 -> 16，當日壓力 10)，第 7 根突破水平壓力 16
+    assert result['resistance_line_breakthrough_check'].tolist() == ['', '', '', '', '', '', 'O', 'O']
+
+    data = get_resistance_line_data(df, turning_points_df).set_index('date')
+    row = data.loc['2024-01-09']
+    assert row['resistance_price'] == 10
+    assert row['horizontal_resistance_price'] == 16
+    assert (row['point1_date'], row['point2_date']) == ('2024-01-02', '2024-01-04')
+    assert data.loc['2024-01-03', 'last_high_point_date'] == '2024-01-02'
+    assert np.isnan(data.loc['2024-01-03', 'resistance_price'])
+
+
 def main():
     """主程式"""
     print("修正版壓力線測試程式 - 標記所有轉折點，只畫被突破的壓力線")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+規則結果快取測試
+
+驗證資料指紋變動時失效、命中時不重算，以及依時間與容量淘汰。
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.analysis.result_cache import RuleResultCache, data_fingerprint
+
+
+def _make_df(seed: int = 0, n: int = 50) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1, n)), 2)
+    return pd.DataFrame(
+        {'Close': close, 'Volume': rng.integers(100, 5000, n)},
+        index=pd.bdate_range('2024-01-02', periods=n, name='ts'),
+    )
+
+
+def test_data_fingerprint_tracks_content():
+    df = _make_df()
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+
+    changed = df.copy()
+    changed.iloc[-1, 0] += 0.01
+    assert data_fingerprint(changed) != data_fingerprint(df)
+
+    appended = pd.concat([df, _make_df(seed=1, n=1).set_axis([df.index[-1] + pd.offsets.BDay()])])
+    assert data_fingerprint(appended) != data_fingerprint(df)
+
+
+def test_get_or_compute_hits_and_invalidates():
+    df = _make_df()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return pd.DataFrame({'date': df.index.strftime('%Y-%m-%d'), 'rule_check': ''})
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RuleResultCache(cache_dir=cache_dir, enabled=True)
+        first = cache.get_or_compute('rule', data_fingerprint(df), compute)
+        second = RuleResultCache(cache_dir=cache_dir, enabled=True).get_or_compute(
+            'rule', data_fingerprint(df), compute)
+        pd.testing.assert_frame_equal(first, second)
+        assert len(calls) == 1
+
+        # 參數或資料不同時重新計算
+        cache.get_or_compute('rule', data_fingerprint(df), compute, params=(5,))
+        cache.get_or_compute('rule', data_fingerprint(df.iloc[:-1]), compute)
+        assert len(calls) == 3
+        assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_disabled_cache_always_computes():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RuleResultCache(cache_dir=cache_dir, enabled=False)
+        for _ in range(2):
+            cache.get_or_compute('rule', 'fp', lambda: pd.DataFrame())
+        assert os.listdir(cache_dir) == []
+
+
+def test_evict_by_age_and_size():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RuleResultCache(cache_dir=cache_dir, enabled=True, max_age_days=1, max_size_mb=1)
+        payload = np.zeros(50_000)  # 約 0.4 MB
+        now = time.time()
+        for i in range(4):
+            key = cache.make_key('rule', f'fp{i}')
+            cache.save(key, payload)
+            # fp0 已兩天未使用，其餘依序較新
+            mtime = now - 2 * 86400 if i == 0 else now - (4 - i) * 60
+            os.utime(os.path.join(cache_dir, f'{key}.pkl'), (mtime, mtime))
+
+        assert cache.evict() == 2
+        remaining = sorted(os.listdir(cache_dir))
+        expected = sorted(f"{cache.make_key('rule', f'fp{i}')}.pkl" for i in (2, 3))
+        assert remaining == expected
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易日曆測試
+
+使用 FakeShioaji 離線驗證 TradingCalendar 從 TAIEX 學習交易日與休市日、
+跨連假的前一交易日、expected_bars、日曆已知時不再查詢 API，以及 TAIEX 空回應時不記錄休市。
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date, datetime
+
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from fake_shioaji import FakeKbars, FakeShioaji
+from src.data_initial.trading_calendar import CALENDAR_FILENAME, TradingCalendar
+
+# 2024 春節連假：2/8 ~ 2/14 休市
+LUNAR_NEW_YEAR = pd.bdate_range('2024-02-08', '2024-02-14')
+
+
+def test_learn_from_taiex_and_answer_offline():
+    api = FakeShioaji(holidays=LUNAR_NEW_YEAR)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, CALENDAR_FILENAME)
+        calendar = TradingCalendar.load(path)
+        assert calendar.check_market_open(api, date(2024, 2, 15), now=datetime(2024, 2, 15, 14, 0))
+        assert len(api.calls) == 1
+        calendar.save()
+
+        calendar = TradingCalendar.load(path)
+        assert calendar.index_category == 1
+        assert calendar.check_market_open(api, date(2024, 2, 15))
+        assert not calendar.check_market_open(api, date(2024, 2, 12))
+        assert not calendar.check_market_open(api, date(2024, 2, 17))
+        assert len(api.calls) == 1
+
+        assert calendar.is_trading_day(date(2024, 2, 7))
+        assert calendar.is_trading_day(date(2024, 2, 13)) is False
+        assert calendar.previous_trading_day(date(2024, 2, 15)) == date(2024, 2, 7)
+        assert calendar.previous_trading_day(date(2024, 2, 19)) == date(2024, 2, 16)
+        assert calendar.expected_bars(date(2024, 2, 15)) == 270
+        assert calendar.expected_bars(date(2024, 2, 13)) == 0
+
+
+def test_today_before_open_is_not_marked_closed():
+    api = FakeShioaji(holidays=[date(2024, 3, 5)])
+    calendar = TradingCalendar()
+    assert not calendar.check_market_open(api, date(2024, 3, 5), now=datetime(2024, 3, 5, 8, 30))
+    assert calendar.is_trading_day(date(2024, 3, 5)) is None
+    # 日曆涵蓋到 3/4，之後查無任何 K 棒時無法判斷，預設為開盤且不記錄
+    assert calendar.check_market_open(api, date(2024, 3, 5), now=datetime(2024, 3, 5, 10, 0))
+    assert calendar.is_trading_day(date(2024, 3, 5)) is None
+
+    calendar = TradingCalendar()
+    assert not calendar.check_market_open(api, date(2024, 3, 5), now=datetime(2024, 3, 5, 10, 0))
+    assert calendar.is_trading_day(date(2024, 3, 5)) is False
+    # 盤中查詢的當日 K 棒數不完整，不作為 expected_bars
+    assert calendar.check_market_open(api, date(2024, 3, 6), now=datetime(2024, 3, 6, 10, 0))
+    assert calendar.trading_days[date(2024, 3, 6)] is None
+    assert calendar.expected_bars(date(2024, 3, 6)) == 270
+    # 收盤後再查詢一次當日 K 棒數，之後不再查詢
+    calls = len(api.calls)
+    assert calendar.check_market_open(api, date(2024, 3, 6), now=datetime(2024, 3, 6, 14, 0))
+    assert calendar.trading_days[date(2024, 3, 6)] == 270
+    assert calendar.check_market_open(api, date(2024, 3, 6), now=datetime(2024, 3, 6, 15, 0))
+    assert len(api.calls) == calls + 1
+
+
+def test_empty_taiex_reply_records_nothing():
+    api = FakeShioaji()
+    api.kbars = lambda contract, start, end: FakeKbars()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, CALENDAR_FILENAME)
+        calendar = TradingCalendar.load(path)
+        # 空回應無法判斷市場狀態，預設為開盤，且不把查詢區間記為休市
+        assert calendar.check_market_open(api, date(2024, 6, 4), now=datetime(2024, 6, 4, 14, 0))
+        assert not calendar.trading_days and not calendar.closed_days
+        assert calendar.previous_trading_day(date(2024, 6, 4)) == date(2024, 6, 3)
+        calendar.save()
+
+        # 隔日 API 恢復正常時重新學習
+        calendar = TradingCalendar.load(path)
+        api = FakeShioaji()
+        assert calendar.check_market_open(api, date(2024, 6, 5), now=datetime(2024, 6, 5, 14, 0))
+        assert calendar.trading_days[date(2024, 6, 4)] == 270
+
+
+def test_stock_bars_extend_calendar():
+    calendar = TradingCalendar()
+    days = ['2024-01-02', '2024-01-03', '2024-01-05']
+    index = pd.DatetimeIndex([f"{day} 13:30" for day in days])
+    calendar.record_kbars(pd.DataFrame({'Close': 1.0}, index=index))
+
+    assert calendar.is_trading_day(date(2024, 1, 5))
+    assert calendar.is_trading_day(date(2024, 1, 4)) is None
+    # 未知的平日視為交易日
+    assert calendar.previous_trading_day(date(2024, 1, 5)) == date(2024, 1, 4)
+    assert calendar.previous_trading_day(date(2024, 1, 8)) == date(2024, 1, 5)
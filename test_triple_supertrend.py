@@ -17,6 +17,7 @@ sys.path.append(os.path.dirname(__file__))
 from src.validate_buy_rule import load_stock_data
 from src.buyRule.triple_supertrend import check_triple_supertrend
 from src.baseRule.supertrend import calculate_supertrend
+import src.baseRule.supertrend as supertrend_module
 
 def plot_triple_supertrend(stock_id='00631L', days=180):
     print(f"\n{'='*60}")
@@ -176,6 +177,77 @@ def plot_triple_supertrend(stock_id='00631L', days=180):
     print(f"Chart saved to {fpath}")
     # plt.show() # Interactive mode often not avail
 
+def _reference_supertrend(df, period, factor):
+    """Bar-by-bar Supertrend used to check the batch kernel"""
+    atr = supertrend_module.calculate_atr(df, period)
+    hl2 = (df['High'] + df['Low']) / 2
+    upper, lower = (hl2 + factor * atr).tolist(), (hl2 - factor * atr).tolist()
+    close = df['Close'].tolist()
+    direction, line = [1.0], [lower[0]]
+    for i in range(1, len(df)):
+        if not (upper[i] < upper[i-1] or close[i-1] > upper[i-1]):
+            upper[i] = upper[i-1]
+        if not (lower[i] > lower[i-1] or close[i-1] < lower[i-1]):
+            lower[i] = lower[i-1]
+        if direction[-1] == -1:
+            direction.append(1.0 if close[i] > upper[i-1] else -1.0)
+        else:
+            direction.append(-1.0 if close[i] < lower[i-1] else 1.0)
+        line.append(lower[i] if direction[-1] == 1 else upper[i])
+    return np.array(line), np.array(direction)
+
+
+def test_batch_kernel_matches_reference(monkeypatch):
+    rng = np.random.default_rng(0)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1.5, 600)), 2)
+    df = pd.DataFrame({
+        'High': close + np.abs(rng.normal(0, 1, 600)),
+        'Low': close - np.abs(rng.normal(0, 1, 600)),
+        'Close': close,
+    }, index=pd.bdate_range('2022-01-03', periods=600))
+
+    atr_periods = []
+    original_atr = supertrend_module.calculate_atr
+
+    def counting_atr(data, period):
+        atr_periods.append(period)
+        return original_atr(data, period)
+
+    monkeypatch.setattr(supertrend_module, 'calculate_atr', counting_atr)
+    params = [(10, 1.0), (11, 2.0), (12, 3.0), (10, 2.5)]
+    lines, directions = supertrend_module.supertrend_matrix(df, params)
+
+    # ATR is computed once per distinct period
+    assert sorted(atr_periods) == [10, 11, 12]
+    for k, (period, factor) in enumerate(params):
+        expected_line, expected_direction = _reference_supertrend(df, period, factor)
+        assert np.array_equal(lines[k], expected_line)
+        assert np.array_equal(directions[k], expected_direction)
+        single = calculate_supertrend(df, period, factor)
+        assert np.array_equal(single['Direction'].to_numpy(), expected_direction)
+
+
+def test_signal_priority(monkeypatch):
+    dates = pd.bdate_range('2024-01-02', periods=6)
+    directions = {
+        (10, 1.0): [-1, 1, -1, 1, -1, 1],
+        (11, 2.0): [-1, -1, -1, 1, 1, 1],
+        (12, 3.0): [-1, -1, -1, -1, 1, 1],
+    }
+    monkeypatch.setattr(
+        'src.buyRule.triple_supertrend.calculate_supertrends',
+        lambda df, params: {p: pd.DataFrame({'Direction': directions[p]}, index=df.index) for p in params},
+    )
+    result = check_triple_supertrend(pd.DataFrame({'Close': 1.0}, index=dates))
+
+    assert result.index.tolist() == dates.strftime('%Y-%m-%d').tolist()
+    assert result['date'].tolist() == result.index.tolist()
+    # bar 1: g1 break; bar 3: g2 break beats g1; bar 5: all up beats the g1 break
+    assert result['triple_supertrend_g1_check'].tolist() == ['', 'O', '', '', '', '']
+    assert result['triple_supertrend_g2_check'].tolist() == ['', '', '', 'O', '', '']
+    assert result['triple_supertrend_all_check'].tolist() == ['', '', '', '', '', 'O']
+
+
 def main():
     while True:
         sid = input("Stock ID (default 00631L, q to quit): ").strip()
@@ -419,6 +419,51 @@ def create_turning_point_chart(stock_id, recent_df, turning_points_df, days):
         traceback.print_exc()
 
 
+def _reference_turning_points(df):
+    """逐次切片搜尋區間極值的參考實作 (規格書定義)"""
+    from src.baseRule.turning_point_identification import detect_cross_events
+
+    df_cross = detect_cross_events(df)
+    high_mask = np.zeros(len(df), dtype=bool)
+    low_mask = np.zeros(len(df), dtype=bool)
+    last_high_idx = last_low_idx = -1
+    for i in range(len(df)):
+        if pd.isna(df_cross['ma5'].iloc[i]):
+            continue
+        if df_cross['cross_up'].iloc[i]:
+            start = last_high_idx + 1
+            last_low_idx = start + int(np.argmin(df_cross['Low'].to_numpy()[start:i + 1]))
+            low_mask[last_low_idx] = True
+        elif df_cross['cross_down'].iloc[i]:
+            start = last_low_idx + 1
+            last_high_idx = start + int(np.argmax(df_cross['High'].to_numpy()[start:i + 1]))
+            high_mask[last_high_idx] = True
+    return high_mask, low_mask
+
+
+def test_linear_scan_matches_reference():
+    """單調佇列版本需與切片搜尋結果一致 (含同價與 MA5 前段 NaN)"""
+    from src.baseRule.turning_point_identification import identify_turning_points
+
+    for seed in range(20):
+        rng = np.random.default_rng(seed)
+        n = 300
+        close = np.round(100 + np.cumsum(rng.normal(0, 1.5, n)), 0)
+        high = close + np.round(np.abs(rng.normal(0, 1, n)), 0)
+        low = close - np.round(np.abs(rng.normal(0, 1, n)), 0)
+        df = pd.DataFrame(
+            {'High': high, 'Low': low, 'Close': close},
+            index=pd.bdate_range('2023-01-02', periods=n),
+        )
+        df['ma5'] = df['Close'].rolling(window=5, min_periods=1 if seed % 2 else None).mean()
+
+        result = identify_turning_points(df)
+        high_mask, low_mask = _reference_turning_points(df)
+        assert list(result['date']) == list(df.index.strftime('%Y-%m-%d'))
+        assert np.array_equal(result['turning_high_point'].to_numpy() == 'O', high_mask)
+        assert np.array_equal(result['turning_low_point'].to_numpy() == 'O', low_mask)
+
+
 def main():
     """主程式"""
     print("轉折點識別測試程式")
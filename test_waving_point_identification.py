@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+趨勢波識別測試
+
+以手工構造的轉折點序列驗證波段高低點與趨勢標記，
+並確認轉折點表的列順序與日期型別不影響結果，以及快照還原後增量處理與全量計算一致。
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 添加 src 目錄到路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.baseRule.turning_point_identification import identify_turning_points
+from src.baseRule.waving_point_identification import WavingPointIdentifier, identify_waving_points
+
+# 初始下降 → 突破前高且底底高確認上升 → 跌破前低但頭頭高進入等待 → 頭頭低確認下降
+POINTS = [
+    ('high', 110), ('low', 100), ('high', 105), ('low', 95),
+    ('high', 108), ('low', 98), ('high', 112), ('low', 90), ('high', 100),
+]
+
+
+def _make_inputs():
+    dates = pd.bdate_range('2024-01-02', periods=len(POINTS), name='ts')
+    df = pd.DataFrame({
+        'High': [price if kind == 'high' else price + 5 for kind, price in POINTS],
+        'Low': [price if kind == 'low' else price - 5 for kind, price in POINTS],
+    }, index=dates)
+    turning_points = pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'turning_high_point': ['O' if kind == 'high' else '' for kind, _ in POINTS],
+        'turning_low_point': ['O' if kind == 'low' else '' for kind, _ in POINTS],
+    })
+    return df, turning_points
+
+
+def test_wave_points_and_trend():
+    df, turning_points = _make_inputs()
+    result = identify_waving_points(df, turning_points)
+
+    assert result.loc[result['wave_low_point'] == 'O', 'date'].tolist() == ['2024-01-05']
+    assert result.loc[result['wave_high_point'] == 'O', 'date'].tolist() == ['2024-01-10']
+    assert result['trend_type'].tolist() == [
+        '', '', '', '', 'down', 'down', 'up', 'up', 'down',
+    ]
+    assert result['pending_reversal'].tolist() == [
+        '', '', '', '', '', '', '', 'up_to_down', '',
+    ]
+
+
+def test_row_order_and_date_dtype_do_not_matter():
+    df, turning_points = _make_inputs()
+    expected = identify_waving_points(df, turning_points)
+
+    shuffled = turning_points.sample(frac=1, random_state=0)
+    actual = identify_waving_points(df, shuffled).sort_index()
+    pd.testing.assert_frame_equal(actual, expected)
+
+    as_datetime = turning_points.assign(date=pd.to_datetime(turning_points['date']))
+    actual = identify_waving_points(df, as_datetime)
+    pd.testing.assert_frame_equal(actual.drop(columns='date'), expected.drop(columns='date'))
+
+
+def test_snapshot_restore_continues_exactly():
+    rng = np.random.default_rng(0)
+    close = np.round(100 + np.cumsum(rng.normal(0, 1.5, 800)), 2)
+    df = pd.DataFrame({
+        'High': close + np.round(np.abs(rng.normal(0, 1, 800)), 2),
+        'Low': close - np.round(np.abs(rng.normal(0, 1, 800)), 2),
+        'Close': close,
+    }, index=pd.bdate_range('2022-01-03', periods=800, name='ts'))
+    df['ma5'] = df['Close'].rolling(window=5, min_periods=1).mean()
+    turning_points = identify_turning_points(df)
+    expected = identify_waving_points(df, turning_points)
+
+    for cut in (150, 500):
+        identifier = WavingPointIdentifier()
+        previous = identifier.update(df, turning_points.iloc[:cut])
+        snapshot = json.loads(json.dumps(identifier.to_dict()))
+        # 快照只保留 label_floor 之後尚未定案的標記
+        assert all(date >= snapshot['label_floor'] for date in snapshot['labels'])
+        assert len(snapshot['labels']) < (previous[list(WavingPointIdentifier.LABEL_COLUMNS)] != '').any(axis=1).sum()
+
+        restored = WavingPointIdentifier.from_dict(snapshot)
+        # 輸入沿用上次結果的標記欄位，加上新的轉折點列
+        resumed = restored.update(df, pd.concat([previous, turning_points.iloc[cut:]], ignore_index=True))
+        pd.testing.assert_frame_equal(resumed, expected)
+        # 已處理的轉折點不會重複處理
+        pd.testing.assert_frame_equal(restored.update(df, resumed), expected)